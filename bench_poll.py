@@ -0,0 +1,57 @@
+# bench_poll.py - Ukur RTT satu poll action=check oleh client
+#
+# Bandingkan kos satu poll:
+#   sebelum : requests.get(...)            — sambungan TCP (+ TLS) baru setiap poll
+#   selepas : make_http_session().get(...) — sambungan keep-alive dikongsi (client.py)
+#
+# Jalankan: python bench_poll.py [server_url] [bilangan_poll]
+#   tanpa server_url : server.py dijalankan setempat (http, tiada TLS — beza lebih kecil)
+#   dengan server_url: cth. https://labsentinel.xyz — ukur handshake TLS sebenar melalui Cloudflare
+# Nota: import client.py perlukan library client (qrcode, pillow) seperti biasa.
+
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+import requests
+
+from client import make_http_session
+
+def start_local_server(port=5099):
+    import server
+    from werkzeug.serving import WSGIRequestHandler
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"  # dev server: benarkan keep-alive
+    threading.Thread(target=lambda: server.app.run(port=port, threaded=True), daemon=True).start()
+    time.sleep(1)
+    return f"http://127.0.0.1:{port}"
+
+def measure(get, server_url, number):
+    samples = []
+    for _ in range(number):
+        # UUID unik setiap poll — jawapan segera (tiada long-poll) dan tidak kena rate limit per-sesi
+        url = f"{server_url}/api.php?action=check&uuid=bench-{uuid.uuid4()}"
+        started = time.perf_counter()
+        get(url, timeout=10).raise_for_status()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def main():
+    server_url = sys.argv[1].rstrip('/') if len(sys.argv) > 1 else start_local_server()
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    session = make_http_session()
+    session.get(f"{server_url}/api.php?action=check&uuid=bench-warmup", timeout=10)
+
+    results = {}
+    for label, get in (('requests.get', requests.get), ('keep-alive session', session.get)):
+        samples = sorted(measure(get, server_url, number))
+        results[label] = statistics.median(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"{label:<20} median {results[label]:8.1f} ms   p95 {p95:8.1f} ms")
+
+    before, after = results['requests.get'], results['keep-alive session']
+    print(f"{'speedup':<20} {before / after:8.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# bench_render.py - Micro-benchmark render halaman unlock (setiap imbasan QR)
+#
+# Bandingkan kos satu render:
+#   sebelum : render_template_string(UNLOCK_HTML, ...)  — parse + kompil setiap request
+#   selepas : render_page(UNLOCK_TEMPLATE, ...)         — template dikompil sekali
+#
+# Jalankan: python bench_render.py [bilangan_render]
+# Nota: import server.py akan cipta/migrate lab_system.db seperti biasa.
+
+import sys
+import timeit
+
+from flask import render_template_string
+
+import server
+
+CONTEXT = {
+    'message': '',
+    'error': 'Format No. ID tidak sah. Pelajar: AB123456, Staf: 01234',
+    'pc': {'pc_hostname': 'PC-CS01', 'status': 'LOCKED', 'nama_penuh': None},
+}
+
+def render_before():
+    return render_template_string(server.UNLOCK_HTML, **CONTEXT)
+
+def render_after():
+    return server.render_page(server.UNLOCK_TEMPLATE, **CONTEXT)
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with server.app.test_request_context('/unlock.php?uuid=bench'):
+        assert render_before() == render_after(), "Output render tidak sama"
+        results = {}
+        for label, fn in (('render_template_string', render_before), ('compiled template', render_after)):
+            # Ambil masa terbaik daripada 5 pusingan untuk kurangkan hingar
+            best = min(timeit.repeat(fn, number=number, repeat=5))
+            results[label] = best / number * 1e6
+            print(f"{label:<24} {results[label]:10.1f} us/render")
+
+    before, after = results['render_template_string'], results['compiled template']
+    print(f"{'speedup':<24} {before / after:10.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -24,7 +24,7 @@ echo [INFO] Python versi OK. Memulakan proses...
 echo.
 
 echo [1/5] Installing Dependencies (PyInstaller, etc)...
-pip install pyinstaller pillow requests qrcode
+pip install pyinstaller pillow requests qrcode websocket-client
 if %errorlevel% neq 0 (
     color 0C
     echo [ERROR] Gagal install library. Check internet connection.
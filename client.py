@@ -4,6 +4,12 @@ import qrcode # pip install qrcode[pil]
 from PIL import Image, ImageTk # pip install pillow
 import uuid
 import requests # pip install requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    import websocket # pip install websocket-client (pilihan - control channel)
+except ImportError:
+    websocket = None
 import time
 import socket
 import threading
@@ -14,6 +20,7 @@ import re as _re
 import random
 import subprocess
 import ctypes
+from collections import deque
 from datetime import datetime
 
 # Set AppUserModelID supaya Windows guna ikon app, bukan ikon Python
@@ -25,6 +32,138 @@ except:
 # --- CONFIGURATION ---
 CONFIG_FILE = "config.json"
 SESSION_TIME_LIMIT = 3 * 60 * 60  # 3 jam dalam saat (10800 saat)
+POLL_WAIT = 25  # saat - had long-poll action=check; hanya jika server lapor max_wait > 0
+# Jarak minimum antara poll (ms) — penting bila server jawab serta-merta (tanpa long-poll /
+# slot long-poll penuh). Server boleh override per makmal (jawapan register/check: "poll").
+POLL_INTERVAL_LOCKED = 2000  # QR dipaparkan — imbasan boleh berlaku bila-bila masa
+POLL_INTERVAL_UNLOCKED = 15000  # sesi aktif — hanya arahan admin yang penting
+POLL_OFFLINE_MAX = 60000  # had exponential backoff bila server tidak dapat dihubungi
+OFFLINE_MODE_AFTER = 10  # saat gagal berturut-turut sebelum butang offline dipaparkan
+CHANNEL_IDLE_CHECK = 5000  # ms - semak semula bila control channel aktif (HTTP poll digantung)
+CHANNEL_HEARTBEAT = 20  # saat - heartbeat melalui control channel
+CHANNEL_RETRY_MIN = 5  # saat - backoff sambung semula control channel
+CHANNEL_RETRY_MAX = 300
+REGISTER_BOOT_JITTER = 10  # saat - lengah rawak semasa boot (elak semua PC makmal register serentak)
+REGISTER_RETRY_JITTER = 2  # saat - lengah rawak bila register semula (sesi hilang di server)
+REGISTER_RETRY_MIN = 2  # saat - backoff register yang gagal
+REGISTER_RETRY_MAX = 120
+COMMAND_HISTORY = 50  # id arahan terakhir yang diingat — arahan yang dihantar semula tidak dilaksana dua kali
+HTTP_POOL_SIZE = 4  # sambungan keep-alive serentak (poll + register + ack + admin)
+HTTP_GET_RETRIES = 2  # cubaan semula GET (idempotent) untuk ralat sambungan / 502-504 Cloudflare
+
+def retry_after_seconds(response, default):
+    """Nilai header Retry-After (saat) dari jawapan 429, atau default"""
+    try:
+        return max(1, int(response.headers.get('Retry-After', default)))
+    except ValueError:
+        return default
+
+def make_http_session():
+    """requests.Session dikongsi sepanjang hayat client — sambungan TCP/TLS dikekalkan
+    (keep-alive) supaya setiap poll tidak perlu handshake baru.
+
+    Hanya GET (action=check) dicuba semula oleh adapter; POST (register/ack/verify_admin)
+    tidak idempotent dan ada backoff/retry sendiri. Read timeout long-poll tidak dicuba
+    semula — poll seterusnya sudah dijadualkan.
+    """
+    retry = Retry(
+        total=HTTP_GET_RETRIES, connect=HTTP_GET_RETRIES, read=0, status=HTTP_GET_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class ControlChannel:
+    """Saluran WebSocket kekal ke server (pilihan).
+
+    Server tolak status/arahan melalui saluran ini dan client hantar heartbeat
+    melalui socket yang sama. Selagi `connected` False, LockScreenApp terus
+    guna HTTP long-poll — jadi kegagalan saluran tidak pernah memutuskan client.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.connected = False
+        self._ws = None
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _url(self, session_uuid):
+        base = self.app.server_url
+        if base.startswith("https://"):
+            base = "wss://" + base[len("https://"):]
+        elif base.startswith("http://"):
+            base = "ws://" + base[len("http://"):]
+        return f"{base}/ws/channel?uuid={session_uuid}&acks=1"
+
+    def send(self, frame):
+        """Hantar frame ke server. Return False jika saluran tidak bersambung."""
+        if not self.connected:
+            return False
+        try:
+            self._ws.send(json.dumps(frame))
+            return True
+        except Exception as e:
+            print(f"[CHANNEL] Send failed: {e}")
+            return False
+
+    def _run(self):
+        delay = CHANNEL_RETRY_MIN
+        while True:
+            session_uuid = self.app.session_uuid
+            try:
+                self._ws = websocket.create_connection(self._url(session_uuid), timeout=10)
+            except Exception as e:
+                # Server tanpa WebSocket (cth. 404) — kekal HTTP polling, cuba lagi kemudian
+                print(f"[CHANNEL] Connect failed: {e}")
+                time.sleep(delay + random.uniform(0, delay / 2))
+                delay = min(delay * 2, CHANNEL_RETRY_MAX)
+                continue
+
+            print("[CHANNEL] Connected")
+            try:
+                self._serve(session_uuid)
+                delay = CHANNEL_RETRY_MIN
+            except Exception as e:
+                print(f"[CHANNEL] Disconnected: {e}")
+                time.sleep(delay + random.uniform(0, delay / 2))
+                delay = min(delay * 2, CHANNEL_RETRY_MAX)
+            finally:
+                self.connected = False
+                try:
+                    self._ws.close()
+                except Exception:
+                    pass
+
+    def _serve(self, session_uuid):
+        self._ws.settimeout(1)
+        last_heartbeat = time.time()
+        # Sambung semula dengan UUID baru bila PC dikunci semula
+        while session_uuid == self.app.session_uuid:
+            if time.time() - last_heartbeat >= CHANNEL_HEARTBEAT:
+                self._ws.send(json.dumps({"type": "heartbeat"}))
+                last_heartbeat = time.time()
+            try:
+                raw = self._ws.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            if not raw:
+                raise ConnectionError("channel closed by server")
+            frame = json.loads(raw)
+            if frame.get("type") == "error":
+                if frame.get("code") == "session_not_found":
+                    # Server tidak kenal sesi ini — daftar semula (sama seperti HTTP poll)
+                    self.app.root.after(0, lambda: self.app.register_session(initial_delay=REGISTER_RETRY_JITTER))
+                raise ConnectionError(frame.get("error"))
+            self.connected = True
+            self.app.root.after(0, lambda f=frame: self.app.handle_channel_frame(session_uuid, f))
 
 class LockScreenApp:
     def __init__(self, root):
@@ -40,6 +179,8 @@ class LockScreenApp:
         self.pc_name = self.config.get("pc_name", socket.gethostname())
         self.lab_name = self.config.get("lab_name", "General Lab")
         self.admin_password = self.config.get("admin_password", "admin")
+        self.admin_username = self.config.get("admin_username", "")  # Isian awal dialog admin
+        self.http = make_http_session()
         
         self.session_uuid = str(uuid.uuid4())
         self.is_unlocked = False
@@ -61,7 +202,16 @@ class LockScreenApp:
 
         # Fail-Safe State
         self.fail_count = 0
+        self.fail_since = 0  # time.time() kegagalan pertama berturut-turut
         self.offline_mode_triggered = False
+        self.poll_generation = 0  # Dinaikkan bila UUID bertukar — rantai poll lama berhenti
+        self.poll_overrides = {}  # Kadar polling dari server (locked/unlocked/offline_max, ms)
+        self.server_max_wait = 0  # Long-poll maksimum yang disokong server (saat); 0 = poll biasa
+        self.handled_commands = deque(maxlen=COMMAND_HISTORY)
+        self.registering = False  # Hanya satu thread register pada satu masa
+        self.register_uuid = None  # UUID yang sedang cuba didaftarkan
+        self.register_lock = threading.Lock()
+        self.register_wakeup = threading.Event()  # Kejut backoff bila UUID bertukar
 
         # UI Styling
         self.bg_color = "#0f172a" # Deep Blue/Black Slate
@@ -75,10 +225,19 @@ class LockScreenApp:
         self.matrix_running = False
         self.root.after(200, self.init_matrix_rain)  # Tunggu window render dulu
 
+        # Control channel (pilihan) — fallback automatik ke HTTP long-poll.
+        # Mesti wujud sebelum check_status_loop() pertama.
+        self.channel = None
+        if websocket is not None and self.config.get("control_channel", True):
+            self.channel = ControlChannel(self)
+
         # Start Logic
-        self.register_session()
+        self.register_session(initial_delay=REGISTER_BOOT_JITTER)
         self.check_status_loop()
+        self.watchdog_loop()
         self.update_clock()
+        if self.channel is not None:
+            self.channel.start()
 
     def load_config(self):
         # Cari config.json — prioriti: exe directory > current dir > Program Files
@@ -285,23 +444,79 @@ class LockScreenApp:
         except:
             return "00:00:00:00:00:00"
 
-    def register_session(self):
+    def register_session(self, initial_delay=0):
+        """Daftar sesi semasa dengan server — cuba semula dengan exponential backoff + jitter
+        sehingga berjaya. Register untuk UUID yang sama adalah idempotent di server."""
+        with self.register_lock:
+            if self.registering:
+                if self.register_uuid != self.session_uuid:
+                    self.register_wakeup.set()  # UUID baru — thread sedia ada ambil alih segera
+                return
+            self.registering = True
+            self.register_wakeup.clear()
+
         def thread():
-            try:
-                payload = {
-                    "uuid": self.session_uuid,
-                    "lab_name": self.lab_name,
-                    "pc_name": self.pc_name,
-                    "mac_address": self.get_mac_address()
-                }
-                response = requests.post(f"{self.server_url}/api.php?action=register", data=payload, timeout=5)
-                
-                if response.status_code != 200:
-                    print(f"Registration Failed: {response.text}")
-                    self.status_label.config(text=f"● CONNECTION ERROR: {response.status_code}", fg="#f59e0b")
-            except Exception as e:
-                print(f"Connection Error: {e}")
-                self.status_label.config(text="● SERVER CONNECTION FAILED", fg="#ef4444")
+            delay = REGISTER_RETRY_MIN
+            wait = random.uniform(0, initial_delay)
+            saved_label = {}  # Teks label sebelum ralat — hanya disentuh dalam thread Tk (root.after)
+
+            def show_error(text, fg):
+                if self.is_unlocked:
+                    return
+                saved_label.setdefault('text', self.status_label.cget("text"))
+                self.status_label.config(text=text, fg=fg)
+
+            def restore_label():
+                if 'text' in saved_label and not self.is_unlocked:
+                    self.status_label.config(text=saved_label['text'], fg="#ef4444")
+
+            while True:
+                self.register_wakeup.wait(wait)
+                self.register_wakeup.clear()
+                session_uuid = self.register_uuid = self.session_uuid
+                wait = None
+                try:
+                    payload = {
+                        "uuid": session_uuid,
+                        "lab_name": self.lab_name,
+                        "pc_name": self.pc_name,
+                        "mac_address": self.get_mac_address()
+                    }
+                    response = self.http.post(f"{self.server_url}/api.php?action=register", data=payload, timeout=5)
+
+                    if response.status_code == 429:
+                        # Server hadkan kadar — cuba semula selepas Retry-After
+                        wait = retry_after_seconds(response, delay)
+                        print(f"Registration throttled, retry in {wait}s")
+                    elif response.status_code != 200:
+                        print(f"Registration Failed: {response.text}")
+                        error = (f"● CONNECTION ERROR: {response.status_code}", "#f59e0b")
+                    else:
+                        print(f"Registered session {session_uuid[:8]}...")
+                        data = response.json()
+                        self.set_poll_overrides(data.get('poll'))
+                        self.server_max_wait = self.parse_max_wait(data)
+                except Exception as e:
+                    print(f"Connection Error: {e}")
+                    response = None
+                    error = ("● SERVER CONNECTION FAILED", "#ef4444")
+
+                if response is not None and response.status_code == 200:
+                    with self.register_lock:
+                        # UUID bertukar semasa request — daftar yang baru pula
+                        if session_uuid == self.session_uuid:
+                            self.registering = False
+                            break
+                    wait = 0
+                    continue
+
+                if wait is None:
+                    self.root.after(0, lambda e=error: show_error(*e))
+                    wait = delay + random.uniform(0, delay / 2)
+                    delay = min(delay * 2, REGISTER_RETRY_MAX)
+                    print(f"Registration retry in {wait:.1f}s")
+
+            self.root.after(0, restore_label)
         threading.Thread(target=thread, daemon=True).start()
 
     def set_offline_mode(self):
@@ -343,7 +558,7 @@ class LockScreenApp:
             # Schedule next update
             self.root.after(1000, self.update_clock)
 
-    def check_status_loop(self):
+    def watchdog_loop(self):
         # Watchdog: semak session expired sebagai failsafe
         # (jika countdown chain putus kerana exception/sleep/hibernate)
         if self.is_unlocked and hasattr(self, 'unlock_timestamp'):
@@ -351,31 +566,128 @@ class LockScreenApp:
             if elapsed >= SESSION_TIME_LIMIT:
                 print(f"[WATCHDOG] Session expired (elapsed={elapsed:.0f}s). Locking PC.")
                 self.lock_pc()
-                return
+        self.root.after(2000, self.watchdog_loop)
+
+    def check_status_loop(self, generation=0):
+        """Poll status PC (long-poll jika server sokong). Poll seterusnya dijadualkan selepas poll semasa selesai."""
+        if generation != self.poll_generation:
+            return  # Rantai poll untuk UUID lama
+        if self.channel is not None and self.channel.connected:
+            # Status/arahan datang melalui control channel — gantung HTTP poll
+            self.root.after(CHANNEL_IDLE_CHECK, lambda: self.check_status_loop(generation))
+            return
 
         def check_thread():
+            uuid_at_start = self.session_uuid
+            known_status = 'UNLOCKED' if self.is_unlocked else 'LOCKED'
+            started = time.time()
+            delay_ms = 0
+            # Long-poll hanya bila server melaporkan sokongan (worker boleh ditahan)
+            wait = min(POLL_WAIT, self.server_max_wait)
+            wait_param = f"&wait={wait:g}" if wait > 0 else ""
             try:
-                res = requests.get(f"{self.api_url}?action=check&uuid={self.session_uuid}", timeout=3)
-                if res.status_code == 200:
+                res = self.http.get(
+                    f"{self.api_url}?action=check&uuid={uuid_at_start}{wait_param}&status={known_status}&acks=1",
+                    timeout=(3, wait + 10)
+                )
+                if res.status_code == 429:
+                    # Server hadkan kadar — tunggu seperti diminta (bukan kegagalan sambungan)
+                    delay_ms = retry_after_seconds(res, 5) * 1000
+                elif res.status_code != 200:
+                    # Origin down di belakang Cloudflare = 502/521/522/530 yang pantas, bukan exception
+                    raise ConnectionError(f"HTTP {res.status_code}")
+                else:
+                    self.fail_count = 0
+                # Abaikan jawapan untuk sesi lama (PC dikunci semula semasa poll ditahan)
+                if res.status_code == 200 and uuid_at_start == self.session_uuid:
                     data = res.json()
-                    command = data.get('command')
-                    if command:
-                        # Remote command dari admin — dispatch
-                        self.root.after(0, lambda: self.handle_remote_command(command))
-                    elif not self.is_unlocked and data.get('status') == 'UNLOCKED':
-                        # QR unlock biasa
-                        self.root.after(0, self.unlock_pc)
-                    # Reset fail count on success
-                    if self.fail_count > 0:
-                        self.fail_count = 0
+                    self.set_poll_overrides(data.get('poll'))
+                    if 'max_wait' in data:
+                        self.server_max_wait = self.parse_max_wait(data)
+                    if data.get('code') == 'session_not_found' or data.get('error') == 'Session not found':
+                        # Server tidak kenal sesi ini (restart/DB dipulihkan) — daftar semula
+                        self.root.after(0, lambda: self.register_session(initial_delay=REGISTER_RETRY_JITTER))
+                    self.root.after(0, lambda: self.apply_server_state(uuid_at_start, data.get('status'),
+                                                                       data.get('command'), data.get('command_id')))
             except Exception as e:
+                if self.fail_count == 0:
+                    self.fail_since = time.time()
                 self.fail_count += 1
                 print(f"Connection failed: {e}")
-                if self.fail_count >= 5:
-                     self.root.after(0, self.set_offline_mode)
+                # Ikut masa, bukan bilangan — backoff menjarakkan percubaan
+                if time.time() - self.fail_since >= OFFLINE_MODE_AFTER:
+                    self.root.after(0, self.set_offline_mode)
+            finally:
+                # Poll seterusnya serta-merta selepas long-poll; jarak minimum untuk
+                # jawapan segera (server tanpa long-poll / ralat rangkaian)
+                elapsed_ms = int((time.time() - started) * 1000)
+                self.root.after(max(delay_ms, self.poll_interval() - elapsed_ms), lambda: self.check_status_loop(generation))
 
         threading.Thread(target=check_thread, daemon=True).start()
-        self.root.after(2000, self.check_status_loop)
+
+    @staticmethod
+    def parse_max_wait(data):
+        """max_wait (saat) dari jawapan server; tiada / tidak sah = 0 (tiada long-poll)"""
+        value = data.get('max_wait')
+        return max(0.0, float(value)) if isinstance(value, (int, float)) else 0.0
+
+    def set_poll_overrides(self, poll):
+        """Simpan kadar polling dari server (ganti sepenuhnya — override yang dibuang kembali ke lalai)"""
+        if not isinstance(poll, dict):
+            return  # Server lama tanpa "poll"
+        self.poll_overrides = {key: int(value) for key, value in poll.items()
+                               if key in ('locked', 'unlocked', 'offline_max')
+                               and isinstance(value, (int, float)) and value > 0}
+
+    def poll_interval(self):
+        """Jarak minimum (ms) sebelum poll seterusnya: cepat bila QR dipaparkan, perlahan bila
+        sesi aktif, exponential backoff + jitter bila server tidak dapat dihubungi."""
+        if self.is_unlocked:
+            interval = self.poll_overrides.get('unlocked', POLL_INTERVAL_UNLOCKED)
+        else:
+            interval = self.poll_overrides.get('locked', POLL_INTERVAL_LOCKED)
+        if self.fail_count:
+            # Kegagalan pertama cuba semula pada kadar biasa, kemudian 2x, 4x, ... sehingga had
+            interval = min(interval * 2 ** min(self.fail_count - 1, 10),
+                           self.poll_overrides.get('offline_max', POLL_OFFLINE_MAX))
+            interval += random.uniform(0, interval / 2)
+        return int(interval)
+
+    def apply_server_state(self, session_uuid, status, command=None, command_id=None):
+        """Proses status/arahan dari server (HTTP poll atau control channel)"""
+        if session_uuid != self.session_uuid:
+            return  # Jawapan untuk sesi lama
+        if command:
+            # Remote command dari admin — ack dahulu (LOCK/SHUTDOWN tukar sesi), kemudian dispatch
+            if command_id is not None:
+                self.ack_command(session_uuid, command_id)
+                if command_id in self.handled_commands:
+                    return  # Dihantar semula kerana ack sebelum ini hilang
+                self.handled_commands.append(command_id)
+            self.handle_remote_command(command)
+        elif not self.is_unlocked and status == 'UNLOCKED':
+            # QR unlock biasa
+            self.unlock_pc()
+
+    def handle_channel_frame(self, session_uuid, frame):
+        """Frame dari control channel"""
+        if frame.get('type') == 'command':
+            self.apply_server_state(session_uuid, None, frame.get('command'), frame.get('id'))
+        elif frame.get('type') == 'status':
+            self.apply_server_state(session_uuid, frame.get('status'))
+
+    def ack_command(self, session_uuid, command_id):
+        """Maklumkan server arahan telah diterima (melalui channel jika ada, jika tidak HTTP)"""
+        if self.channel is not None and self.channel.send({"type": "ack", "id": command_id}):
+            return
+
+        def thread():
+            try:
+                self.http.post(f"{self.api_url}?action=ack", data={"uuid": session_uuid, "id": command_id}, timeout=5)
+            except Exception as e:
+                # Server akan hantar semula arahan — handled_commands elak ia dilaksana dua kali
+                print(f"[REMOTE CMD] Ack failed: {e}")
+        threading.Thread(target=thread, daemon=True).start()
 
     def handle_remote_command(self, command):
         """Proses arahan jauh dari admin dashboard"""
@@ -458,17 +770,38 @@ class LockScreenApp:
             else:
                 subprocess.run(['shutdown', '/s', '/t', '0'], creationflags=subprocess.CREATE_NO_WINDOW)
 
-    def verify_admin_password(self, password):
-        """Sahkan password admin melalui server. Fallback ke config jika offline."""
+    def ask_admin_credentials(self, title, prompt):
+        """Dialog username + password admin. Return (username, password) atau None jika dibatalkan."""
+        username = simpledialog.askstring(title, "Username Admin:", initialvalue=self.admin_username, parent=self.root)
+        if username is None:
+            return None
+        password = simpledialog.askstring(title, prompt, show="*", parent=self.root)
+        if password is None:
+            return None
+        return username.strip(), password
+
+    def verify_admin_password(self, password, username=''):
+        """Sahkan password admin melalui server. Fallback ke config jika offline.
+
+        Dengan username, server hanya semak satu akaun (kos hash tetap).
+        Return None jika server menolak cubaan (429) — mesej sudah dipaparkan.
+        """
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.server_url}/api.php?action=verify_admin",
-                data={'password': password, 'lab_name': self.lab_name},
+                data={'password': password, 'lab_name': self.lab_name, 'username': username},
                 timeout=5
             )
             if response.status_code == 200:
                 data = response.json()
+                if data.get('verified') and username:
+                    self.admin_username = username
                 return data.get('verified', False)
+            if response.status_code == 429:
+                # Server dalam talian tetapi hadkan cubaan — jangan fallback ke password lokal
+                messagebox.showwarning("Admin", f"Terlalu banyak cubaan. Sila cuba lagi dalam "
+                                                f"{retry_after_seconds(response, 10)} saat.")
+                return None
         except Exception:
             pass
         # Fallback: password lokal dari config (offline sahaja)
@@ -476,33 +809,39 @@ class LockScreenApp:
 
     def open_admin_panel(self):
         """Buka Admin Panel di browser (perlu password)"""
-        pwd = simpledialog.askstring("Admin Panel", "Masukkan Admin Password:", show="*", parent=self.root)
-        if pwd is None:
+        credentials = self.ask_admin_credentials("Admin Panel", "Masukkan Admin Password:")
+        if credentials is None:
             return
-        if self.verify_admin_password(pwd):
+        username, pwd = credentials
+        verified = self.verify_admin_password(pwd, username)
+        if verified:
             import webbrowser
             webbrowser.open(f"{self.server_url}/admin")
-        else:
+        elif verified is not None:
             messagebox.showerror("Error", "Password salah.")
 
     def open_settings(self):
         """Buka config.json untuk edit settings (perlu password)"""
-        pwd = simpledialog.askstring("Settings", "Masukkan Admin Password:", show="*", parent=self.root)
-        if pwd is None:
+        credentials = self.ask_admin_credentials("Settings", "Masukkan Admin Password:")
+        if credentials is None:
             return
-        if self.verify_admin_password(pwd):
+        username, pwd = credentials
+        verified = self.verify_admin_password(pwd, username)
+        if verified:
             config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), CONFIG_FILE)
             os.startfile(config_path)
-        else:
+        elif verified is not None:
             messagebox.showerror("Error", "Password salah.")
 
     def admin_unlock(self, event=None):
-        pwd = simpledialog.askstring("Admin Unlock", "Enter Admin Password:", show="*", parent=self.root)
-        if pwd is None:
+        credentials = self.ask_admin_credentials("Admin Unlock", "Enter Admin Password:")
+        if credentials is None:
             return
-        if self.verify_admin_password(pwd):
+        username, pwd = credentials
+        verified = self.verify_admin_password(pwd, username)
+        if verified:
             self.unlock_pc(admin=True)
-        else:
+        elif verified is not None:
             messagebox.showerror("Error", "Incorrect Password")
 
     def unlock_pc(self, admin=False):
@@ -640,8 +979,10 @@ class LockScreenApp:
         # Mulakan semula matrix rain
         self.init_matrix_rain()
 
-        # Daftar sesi baru
+        # Daftar sesi baru + mulakan rantai poll baru (poll lama masih ditahan untuk UUID lama)
         self.register_session()
+        self.poll_generation += 1
+        self.check_status_loop(self.poll_generation)
         self.update_clock()
 
 if __name__ == "__main__":
@@ -1,21 +1,130 @@
 # server.py - LabSentinel Python Backend
 # Menggantikan PHP backend dengan Flask
 
-from flask import Flask, request, jsonify, render_template_string, session, redirect, url_for, Response, send_file
+from flask import Flask, request, jsonify, session, redirect, url_for, Response, send_file, g, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
 import os
-from datetime import datetime, timedelta
+import queue
+import threading
+import time
+import atexit
+import heapq
+import math
+import random
+from collections import OrderedDict
+import json
+import csv
+import io
+import zlib
+import hmac
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Pilihan: WebSocket control channel (pip install flask-sock)
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+# Pilihan: saiz semula logo (pip install pillow)
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
 app = Flask(__name__)
 
 # Lokasi fail logo
 LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logo.png')
 
+# ==================== STATIC ASSETS (LOGO) ====================
+# logo.png asal ~660 KB tetapi dipapar 60/120 px. Varian saiz sebenar (1x/2x,
+# PNG + WebP) dan favicon dijana sekali semasa import, disimpan dalam memori,
+# dan di-serve dengan URL berfingerprint (/assets/logo-120.<hash>.webp) supaya
+# browser boleh cache selama-lamanya.
+
+LOGO_SIZES = (32, 60, 120, 240)  # 32 = favicon; 240 = 120 px pada skrin 2x
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+_assets = {}      # nama fail berfingerprint -> (bytes, mimetype)
+_asset_urls = {}  # (saiz, format) -> URL
+
+def _add_asset(stem, ext, data, mimetype):
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    filename = f"{stem}.{digest}.{ext}"
+    _assets[filename] = (data, mimetype)
+    return f"/assets/{filename}"
+
+def _build_logo_assets():
+    """Jana varian logo. Tanpa Pillow, semua saiz guna logo.png asal (masih berfingerprint)."""
+    try:
+        with open(LOGO_PATH, 'rb') as f:
+            original = f.read()
+    except OSError as e:
+        # Server tetap berjalan tanpa logo (sama seperti sebelum ini — imej 404 sahaja)
+        print(f"[ASSETS] Logo tidak dapat dibaca: {e}")
+        for size in LOGO_SIZES:
+            _asset_urls[(size, 'png')] = '/static/logo.png'
+        return
+    if Image is None:
+        print("[ASSETS] Pillow tiada — logo asal di-serve untuk semua saiz")
+        url = _add_asset('logo', 'png', original, 'image/png')
+        for size in LOGO_SIZES:
+            _asset_urls[(size, 'png')] = url
+        return
+
+    try:
+        source = Image.open(io.BytesIO(original)).convert('RGBA')
+    except OSError as e:
+        # logo.png rosak — jangan halang server bermula; serve fail asal seperti tanpa Pillow
+        print(f"[ASSETS] Logo tidak dapat dibuka: {e}")
+        url = _add_asset('logo', 'png', original, 'image/png')
+        for size in LOGO_SIZES:
+            _asset_urls[(size, 'png')] = url
+        return
+    for size in LOGO_SIZES:
+        img = source.resize((size, size), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, 'PNG', optimize=True)
+        _asset_urls[(size, 'png')] = _add_asset(f'logo-{size}', 'png', buf.getvalue(), 'image/png')
+        try:
+            buf = io.BytesIO()
+            img.save(buf, 'WEBP', quality=85, method=6)
+            _asset_urls[(size, 'webp')] = _add_asset(f'logo-{size}', 'webp', buf.getvalue(), 'image/webp')
+        except (OSError, KeyError):
+            pass  # Pillow tanpa sokongan WebP — PNG sahaja
+
+def logo_url(size, fmt='png'):
+    """URL varian logo untuk template. WebP tiada → None (template guna PNG)."""
+    return _asset_urls.get((size, fmt))
+
+_build_logo_assets()
+app.jinja_env.globals['logo_url'] = logo_url
+
+@app.route('/assets/<filename>')
+@app.route('/lab-system/assets/<filename>')
+def serve_asset(filename):
+    """Serve aset berfingerprint — cache immutable + ETag/304"""
+    asset = _assets.get(filename)
+    if asset is None:
+        return "Not found", 404
+    data, mimetype = asset
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(filename.split('.')[-2])
+    response.cache_control.public = True
+    response.cache_control.max_age = ASSET_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
 @app.route('/static/logo.png')
 def serve_logo():
-    """Serve logo sebagai static file"""
-    return send_file(LOGO_PATH, mimetype='image/png')
+    """Serve logo sebagai static file (URL lama — template kini guna /assets/)"""
+    return send_file(LOGO_PATH, mimetype='image/png', max_age=86400, conditional=True, etag=True)
 app.secret_key = os.environ.get('SECRET_KEY', 'labsentinel-s3cret-key-2026')
 
 # Database path - detect PythonAnywhere environment
@@ -26,16 +135,60 @@ if 'PYTHONANYWHERE_DOMAIN' in os.environ:
 else:
     DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lab_system.db')
 
-def get_db():
-    """Dapatkan connection ke SQLite database"""
-    conn = sqlite3.connect(DB_PATH, timeout=10)  # 10 saat timeout untuk elak lock
+# Connection pool - connection dipinjam per app context dan dipulangkan semasa teardown
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+
+_db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_db_stats_lock = threading.Lock()
+DB_STATS = {'opened': 0, 'reused': 0, 'closed': 0}
+
+def _db_stat(key):
+    with _db_stats_lock:
+        DB_STATS[key] += 1
+
+def _open_db():
+    """Buka connection baru ke SQLite dan tetapkan PRAGMA (sekali per connection)"""
+    # check_same_thread=False: connection berpindah antara thread melalui pool,
+    # tetapi hanya digunakan oleh satu app context pada satu masa
+    conn = sqlite3.connect(DB_PATH, timeout=10, check_same_thread=False)  # 10 saat timeout untuk elak lock
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL")  # Better concurrency
     return conn
 
-def init_db():
-    """Initialize database jika belum wujud"""
-    conn = get_db()
+def get_db():
+    """Dapatkan connection SQLite untuk app context semasa (guna semula dari pool)"""
+    conn = g.get('_db')
+    if conn is None:
+        try:
+            conn = _db_pool.get_nowait()
+            _db_stat('reused')
+        except queue.Empty:
+            conn = _open_db()
+            _db_stat('opened')
+        g._db = conn
+    return conn
+
+@app.teardown_appcontext
+def release_db(exc):
+    """Pulangkan connection ke pool pada akhir request / app context"""
+    conn = g.pop('_db', None)
+    if conn is None:
+        return
+    try:
+        if conn.in_transaction:
+            conn.rollback()  # Buang transaksi yang tidak di-commit
+        _db_pool.put_nowait(conn)
+    except (queue.Full, sqlite3.Error):
+        conn.close()
+        _db_stat('closed')
+
+# ==================== SCHEMA MIGRATIONS ====================
+# Setiap langkah dijalankan sekali sahaja, dalam transaksi sendiri, dan direkod
+# dalam jadual schema_version. Langkah yang sudah dikeluarkan JANGAN diubah —
+# tambah langkah baru di hujung senarai MIGRATIONS.
+
+def _migrate_base_schema(conn):
+    """v1: Jadual asas sessions + admin_users (termasuk DB lama sebelum migration runner)"""
     conn.execute('''
         CREATE TABLE IF NOT EXISTS sessions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -51,12 +204,12 @@ def init_db():
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    # Migrate: tambah kolum jika belum wujud
-    for col in ['ip_address TEXT', 'mac_address TEXT', 'lab_name TEXT', 'last_seen DATETIME', 'pending_command TEXT']:
-        try:
-            conn.execute(f"ALTER TABLE sessions ADD COLUMN {col}")
-        except:
-            pass
+    # DB lama: tambah kolum yang belum wujud sahaja
+    existing = {r['name'] for r in conn.execute("PRAGMA table_info(sessions)")}
+    for col, decl in [('ip_address', 'TEXT'), ('mac_address', 'TEXT'), ('lab_name', 'TEXT'),
+                      ('last_seen', 'DATETIME'), ('pending_command', 'TEXT')]:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE sessions ADD COLUMN {col} {decl}")
 
     # Admin users table
     conn.execute('''
@@ -79,34 +232,1475 @@ def init_db():
         )
         print("[DB] Default superadmin created: admin/admin")
 
-    conn.commit()
-    conn.close()
-    print("[DB] Database initialized")
+def _migrate_session_indexes(conn):
+    """v2: Index untuk dashboard (sesi terkini per PC), register dan filter log"""
+    # Dashboard: GROUP BY lab_name, pc_hostname + MAX(id) — covering index
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_lab_pc ON sessions (lab_name, pc_hostname, id)")
+    # Register: DELETE FROM sessions WHERE pc_hostname = ?
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_pc ON sessions (pc_hostname)")
+    # Log Pengguna / CSV export: rekod pengguna sahaja, terkini dahulu, per makmal
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_log ON sessions (lab_name, id) WHERE nama_penuh IS NOT NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_unlock_time ON sessions (unlock_time) WHERE nama_penuh IS NOT NULL")
+    # Online/offline
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions (last_seen)")
+
+def _migrate_split_sessions(conn):
+    """v3: Pecah sessions kepada pcs (status semasa) + unlock_events (log append-only)"""
+    # Satu baris per PC — dikemas kini semasa register/check/unlock
+    conn.execute('''
+        CREATE TABLE pcs (
+            lab_name TEXT NOT NULL DEFAULT '',
+            pc_hostname TEXT NOT NULL,
+            session_uuid TEXT UNIQUE NOT NULL,
+            status TEXT DEFAULT 'LOCKED',
+            nama_penuh TEXT,
+            no_id TEXT,
+            no_telefon TEXT,
+            ip_address TEXT,
+            mac_address TEXT,
+            unlock_time DATETIME,
+            registered_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_seen DATETIME,
+            pending_command TEXT,
+            PRIMARY KEY (lab_name, pc_hostname)
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_pcs_hostname ON pcs (pc_hostname)")
+
+    # Satu baris per unlock pengguna — tidak dipadam semasa PC register semula
+    conn.execute('''
+        CREATE TABLE unlock_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_uuid TEXT NOT NULL,
+            lab_name TEXT NOT NULL DEFAULT '',
+            pc_hostname TEXT NOT NULL,
+            nama_penuh TEXT NOT NULL,
+            no_id TEXT,
+            no_telefon TEXT,
+            ip_address TEXT,
+            mac_address TEXT,
+            unlock_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+            created_at DATETIME
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_unlock_events_lab ON unlock_events (lab_name, id)")
+    conn.execute("CREATE INDEX idx_unlock_events_time ON unlock_events (unlock_time)")
+
+    # Salin data lama: rekod pengguna -> unlock_events (kekalkan id), sesi terkini -> pcs
+    conn.execute('''
+        INSERT INTO unlock_events (id, session_uuid, lab_name, pc_hostname, nama_penuh, no_id, no_telefon,
+                                   ip_address, mac_address, unlock_time, created_at)
+        SELECT id, session_uuid, COALESCE(lab_name, ''), pc_hostname, nama_penuh, no_id, no_telefon,
+               ip_address, mac_address, unlock_time, created_at
+        FROM sessions
+        WHERE nama_penuh IS NOT NULL
+        ORDER BY id
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO pcs (lab_name, pc_hostname, session_uuid, status, nama_penuh, no_id, no_telefon,
+                                   ip_address, mac_address, unlock_time, registered_at, last_seen, pending_command)
+        SELECT COALESCE(s.lab_name, ''), s.pc_hostname, s.session_uuid, s.status, s.nama_penuh, s.no_id, s.no_telefon,
+               s.ip_address, s.mac_address, s.unlock_time, s.created_at, s.last_seen, s.pending_command
+        FROM sessions s
+        INNER JOIN (
+            SELECT MAX(id) as max_id FROM sessions GROUP BY lab_name, pc_hostname
+        ) latest ON s.id = latest.max_id
+        ORDER BY s.id DESC
+    ''')
+    conn.execute("DROP TABLE sessions")
+
+def _migrate_lab_stats(conn):
+    """v4: Jadual lab_stats (bilangan PC + rekod per makmal) diselenggara oleh trigger"""
+    conn.execute('''
+        CREATE TABLE lab_stats (
+            lab_name TEXT PRIMARY KEY,
+            pc_count INTEGER NOT NULL DEFAULT 0,
+            record_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    # Baris dengan kedua-dua kiraan 0 dibuang supaya makmal yang dipadam hilang dari senarai
+    conn.execute('''
+        CREATE TRIGGER trg_pcs_insert_stats AFTER INSERT ON pcs BEGIN
+            INSERT OR IGNORE INTO lab_stats (lab_name) VALUES (NEW.lab_name);
+            UPDATE lab_stats SET pc_count = pc_count + 1 WHERE lab_name = NEW.lab_name;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER trg_pcs_delete_stats AFTER DELETE ON pcs BEGIN
+            UPDATE lab_stats SET pc_count = pc_count - 1 WHERE lab_name = OLD.lab_name;
+            DELETE FROM lab_stats WHERE lab_name = OLD.lab_name AND pc_count <= 0 AND record_count <= 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER trg_pcs_move_stats AFTER UPDATE OF lab_name ON pcs
+        WHEN OLD.lab_name != NEW.lab_name BEGIN
+            INSERT OR IGNORE INTO lab_stats (lab_name) VALUES (NEW.lab_name);
+            UPDATE lab_stats SET pc_count = pc_count + 1 WHERE lab_name = NEW.lab_name;
+            UPDATE lab_stats SET pc_count = pc_count - 1 WHERE lab_name = OLD.lab_name;
+            DELETE FROM lab_stats WHERE lab_name = OLD.lab_name AND pc_count <= 0 AND record_count <= 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER trg_unlock_events_insert_stats AFTER INSERT ON unlock_events BEGIN
+            INSERT OR IGNORE INTO lab_stats (lab_name) VALUES (NEW.lab_name);
+            UPDATE lab_stats SET record_count = record_count + 1 WHERE lab_name = NEW.lab_name;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER trg_unlock_events_delete_stats AFTER DELETE ON unlock_events BEGIN
+            UPDATE lab_stats SET record_count = record_count - 1 WHERE lab_name = OLD.lab_name;
+            DELETE FROM lab_stats WHERE lab_name = OLD.lab_name AND pc_count <= 0 AND record_count <= 0;
+        END
+    ''')
+    # Kiraan awal dari data sedia ada
+    conn.execute('''
+        INSERT INTO lab_stats (lab_name, pc_count, record_count)
+        SELECT lab_name, SUM(pcs), SUM(records) FROM (
+            SELECT lab_name, COUNT(*) AS pcs, 0 AS records FROM pcs GROUP BY lab_name
+            UNION ALL
+            SELECT lab_name, 0, COUNT(*) FROM unlock_events GROUP BY lab_name
+        ) GROUP BY lab_name
+    ''')
+
+def _migrate_labs_table(conn):
+    """v5: Jadual labs + admin_labs (ganti CSV admin_users.assigned_labs)"""
+    conn.execute('''
+        CREATE TABLE labs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE admin_labs (
+            admin_id INTEGER NOT NULL REFERENCES admin_users (id),
+            lab_id INTEGER NOT NULL REFERENCES labs (id),
+            PRIMARY KEY (admin_id, lab_id)
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_admin_labs_lab ON admin_labs (lab_id)")
+
+    # Makmal sedia ada: dari PC/rekod (lab_stats) + CSV assigned_labs
+    conn.execute("INSERT INTO labs (name) SELECT lab_name FROM lab_stats WHERE lab_name != '' ORDER BY lab_name")
+    for row in conn.execute("SELECT id, assigned_labs FROM admin_users").fetchall():
+        for lab in (row[1] or '').split(','):
+            lab = lab.strip()
+            if not lab:
+                continue
+            conn.execute("INSERT OR IGNORE INTO labs (name) VALUES (?)", (lab,))
+            conn.execute("INSERT OR IGNORE INTO admin_labs (admin_id, lab_id) SELECT ?, id FROM labs WHERE name = ?",
+                         (row[0], lab))
+    # Kolum assigned_labs dibiarkan (SQLite lama tiada DROP COLUMN) — tidak digunakan lagi
+
+def _migrate_command_queue(conn):
+    """v6: Jadual commands (baris gilir arahan per PC + ack) ganti pcs.pending_command"""
+    conn.execute('''
+        CREATE TABLE commands (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_uuid TEXT NOT NULL,
+            lab_name TEXT,
+            pc_hostname TEXT,
+            command TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            ack_required INTEGER NOT NULL DEFAULT 0,
+            queued_by TEXT,
+            queued_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+            delivered_at TEXT,
+            acked_at TEXT
+        )
+    ''')
+    # FIFO per PC: arahan 'queued' tertua dahulu
+    conn.execute("CREATE INDEX idx_commands_session ON commands (session_uuid, state, id)")
+    # Sapuan retry/tamat tempoh hanya imbas arahan yang belum selesai
+    conn.execute('''
+        CREATE INDEX idx_commands_open ON commands (state, queued_at)
+        WHERE state IN ('queued', 'delivered')
+    ''')
+    conn.execute('''
+        INSERT INTO commands (session_uuid, lab_name, pc_hostname, command)
+        SELECT session_uuid, lab_name, pc_hostname, pending_command FROM pcs
+        WHERE pending_command IS NOT NULL AND pending_command != ''
+    ''')
+    # Kolum pending_command dibiarkan (SQLite lama tiada DROP COLUMN) — tidak digunakan lagi
+    conn.execute("UPDATE pcs SET pending_command = NULL WHERE pending_command IS NOT NULL")
+
+def _migrate_scheduler(conn):
+    """v7: Jadual scheduled_jobs (arahan berjadual per makmal) + lease scheduler"""
+    conn.execute('''
+        CREATE TABLE scheduled_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            lab_name TEXT NOT NULL,
+            command TEXT NOT NULL,
+            status_filter TEXT,
+            cron TEXT,
+            next_run TEXT,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            last_run TEXT,
+            last_result TEXT,
+            created_by TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_scheduled_jobs_due ON scheduled_jobs (enabled, next_run)")
+    # Satu baris per lease — pemegang yang belum tamat tempoh ialah leader
+    conn.execute('''
+        CREATE TABLE scheduler_lease (
+            name TEXT PRIMARY KEY,
+            holder TEXT,
+            expires_at REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("INSERT INTO scheduler_lease (name) VALUES ('scheduler')")
+
+def _migrate_command_waves(conn):
+    """v8: Penghantaran berperingkat (gelombang) — commands.not_before/batch_id + command_batches"""
+    conn.execute('''
+        CREATE TABLE command_batches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lab_name TEXT,
+            command TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            wave_size INTEGER NOT NULL,
+            wave_interval INTEGER NOT NULL,
+            jitter INTEGER NOT NULL DEFAULT 0,
+            created_by TEXT,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+    ''')
+    conn.execute("ALTER TABLE commands ADD COLUMN not_before TEXT")  # NULL = boleh dihantar serta-merta
+    conn.execute("ALTER TABLE commands ADD COLUMN batch_id INTEGER REFERENCES command_batches (id)")
+    conn.execute("CREATE INDEX idx_commands_batch ON commands (batch_id) WHERE batch_id IS NOT NULL")
+
+def _migrate_lab_polling(conn):
+    """v9: Override kadar polling client per makmal (NULL = lalai client)"""
+    conn.execute("ALTER TABLE labs ADD COLUMN poll_locked_ms INTEGER")
+    conn.execute("ALTER TABLE labs ADD COLUMN poll_unlocked_ms INTEGER")
+    conn.execute("ALTER TABLE labs ADD COLUMN poll_offline_max_ms INTEGER")
+
+def _migrate_admin_version(conn):
+    """v10: Pembilang perubahan admin_users/admin_labs/labs — cache admin setiap worker
+    disahkan terhadapnya (dinaikkan oleh trigger, jadi tiada caller yang terlepas)"""
+    conn.execute('''
+        CREATE TABLE admin_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("INSERT INTO admin_version (id) VALUES (1)")
+    for table, events in (('admin_users', ('INSERT', 'UPDATE', 'DELETE')),
+                          ('admin_labs', ('INSERT', 'UPDATE', 'DELETE')),
+                          ('labs', ('DELETE',))):
+        for event in events:
+            conn.execute(f'''
+                CREATE TRIGGER trg_{table}_{event.lower()}_version AFTER {event} ON {table} BEGIN
+                    UPDATE admin_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
+def _migrate_unlock_time_index(conn):
+    """v11: Index (lab_name, unlock_time, id) — Log Pengguna bertapis tarikh untuk satu
+    makmal dibaca mengikut turutan index tanpa sort (idx_unlock_events_time untuk semua makmal)"""
+    conn.execute("CREATE INDEX idx_unlock_events_lab_time ON unlock_events (lab_name, unlock_time, id)")
+
+MIGRATIONS = [
+    (1, 'Jadual asas sessions + admin_users', _migrate_base_schema),
+    (2, 'Index sessions untuk dashboard dan log', _migrate_session_indexes),
+    (3, 'Pecah sessions kepada pcs + unlock_events', _migrate_split_sessions),
+    (4, 'Jadual lab_stats + trigger', _migrate_lab_stats),
+    (5, 'Jadual labs + admin_labs', _migrate_labs_table),
+    (6, 'Jadual commands (baris gilir arahan + ack)', _migrate_command_queue),
+    (7, 'Jadual scheduled_jobs + scheduler_lease', _migrate_scheduler),
+    (8, 'Gelombang arahan: commands.not_before/batch_id + command_batches', _migrate_command_waves),
+    (9, 'Kadar polling client per makmal: labs.poll_*_ms', _migrate_lab_polling),
+    (10, 'Pembilang admin_version untuk cache admin merentas worker', _migrate_admin_version),
+    (11, 'Index unlock_events (lab_name, unlock_time, id) untuk log bertapis tarikh', _migrate_unlock_time_index),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def _schema_version(conn):
+    """Versi schema semasa (0 jika DB baru / sebelum migration runner)"""
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+
+def init_db():
+    """Initialize database dan jalankan migration yang belum dijalankan"""
+    conn = _open_db()  # Bukan dari pool - dijalankan semasa import, sebelum worker fork
+    try:
+        # Cold start biasa: satu semakan versi sahaja
+        if _schema_version(conn) >= SCHEMA_VERSION:
+            return
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+
+        for version, description, step in MIGRATIONS:
+            # BEGIN IMMEDIATE: worker lain yang start serentak akan menunggu di sini
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if _schema_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                step(conn)
+                conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                             (version, description))
+                conn.commit()
+                print(f"[DB] Migration v{version} applied: {description}")
+            except Exception:
+                conn.rollback()
+                raise
+        print(f"[DB] Database initialized (schema v{SCHEMA_VERSION})")
+    finally:
+        conn.close()
 
 # Initialize database on startup
 init_db()
 
+# ==================== PRESENCE REGISTRY ====================
+# Status online/offline PC dalam memori: dict session_uuid -> masa heartbeat
+# terakhir (time.monotonic) + heap tamat tempoh. Dikemas kini O(1) oleh
+# action=check. Setiap worker process ada registry sendiri, jadi ia diselaraskan
+# dari pcs.last_seen setiap PRESENCE_SYNC_INTERVAL saat (dan semasa mula).
+
+ONLINE_THRESHOLD = 120  # saat tanpa heartbeat = offline
+PRESENCE_SYNC_INTERVAL = float(os.environ.get('PRESENCE_SYNC_INTERVAL', '30'))
+
+class PresenceRegistry:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._last_seen = {}   # session_uuid -> monotonic
+        self._expiry = []      # heap (expires_at, session_uuid)
+        self._synced_at = None
+
+    def touch(self, uuid, seen_at=None):
+        """Rekod heartbeat. seen_at (monotonic) untuk heartbeat lama dari DB."""
+        if seen_at is None:
+            seen_at = time.monotonic()
+        with self._lock:
+            if seen_at <= self._last_seen.get(uuid, float('-inf')):
+                return
+            self._last_seen[uuid] = seen_at
+            heapq.heappush(self._expiry, (seen_at + self.threshold, uuid))
+
+    def is_online(self, uuid):
+        with self._lock:
+            last = self._last_seen.get(uuid)
+        return last is not None and time.monotonic() - last < self.threshold
+
+    def online_uuids(self):
+        """Set session_uuid yang sedang online"""
+        now = time.monotonic()
+        with self._lock:
+            return {u for u, last in self._last_seen.items() if now - last < self.threshold}
+
+    def sweep(self):
+        """Buang PC yang tamat tempoh. Return senarai session_uuid yang baru offline."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, uuid = heapq.heappop(self._expiry)
+                last = self._last_seen.get(uuid)
+                # Entri heap lama (heartbeat lebih baru sudah ditolak masuk) diabaikan
+                if last is not None and now - last >= self.threshold:
+                    del self._last_seen[uuid]
+                    expired.append(uuid)
+        return expired
+
+    def sync(self, conn, force=False):
+        """Selaraskan dari pcs.last_seen (heartbeat yang diterima worker lain)"""
+        now = time.monotonic()
+        if not force and self._synced_at is not None and now - self._synced_at < PRESENCE_SYNC_INTERVAL:
+            return
+        self._synced_at = now
+        rows = conn.execute("""
+            SELECT session_uuid, (julianday('now') - julianday(last_seen)) * 86400.0 AS age
+            FROM pcs
+            WHERE last_seen >= datetime('now', ?)
+        """, (f'-{self.threshold} seconds',)).fetchall()
+        for r in rows:
+            self.touch(r['session_uuid'], now - max(r['age'], 0.0))
+
+    def __len__(self):
+        return len(self._last_seen)
+
+presence = PresenceRegistry(ONLINE_THRESHOLD)
+
+def _rebuild_presence():
+    """Bina semula registry dari pcs.last_seen semasa server bermula"""
+    conn = _open_db()  # Bukan dari pool - dijalankan semasa import (seperti init_db)
+    try:
+        presence.sync(conn, force=True)
+    finally:
+        conn.close()
+
+_rebuild_presence()
+
+# ==================== HEARTBEAT BUFFER ====================
+# action=check tidak menulis last_seen terus ke DB. Heartbeat disimpan dalam
+# buffer (per worker process) dan di-flush sebagai satu transaksi executemany
+# setiap HEARTBEAT_FLUSH_INTERVAL saat. Penghantaran pending command kekal segerak.
+
+HEARTBEAT_FLUSH_INTERVAL = float(os.environ.get('HEARTBEAT_FLUSH_INTERVAL', '5'))
+
+_heartbeat_lock = threading.Lock()
+_heartbeat_buffer = {}  # session_uuid -> last_seen (UTC, format CURRENT_TIMESTAMP)
+_heartbeat_thread = None
+_heartbeat_pid = None
+HEARTBEAT_STATS = {'flushes': 0, 'rows_flushed': 0, 'errors': 0,
+                   'last_batch': 0, 'last_flush_ms': 0.0, 'max_flush_ms': 0.0}
+
+def record_heartbeat(uuid):
+    """Rekod heartbeat PC dalam buffer (ditulis ke DB oleh flusher) dan presence registry"""
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    with _heartbeat_lock:
+        _heartbeat_buffer[uuid] = now
+    presence.touch(uuid)
+    _ensure_heartbeat_flusher()
+
+def flush_heartbeats():
+    """Tulis semua heartbeat dalam buffer ke pcs.last_seen dalam satu transaksi"""
+    with _heartbeat_lock:
+        if not _heartbeat_buffer:
+            return 0
+        batch = [(ts, uuid) for uuid, ts in _heartbeat_buffer.items()]
+        _heartbeat_buffer.clear()
+
+    started = time.perf_counter()
+    try:
+        with app.app_context():
+            conn = get_db()
+            conn.executemany("UPDATE pcs SET last_seen = ? WHERE session_uuid = ?", batch)
+            conn.commit()
+    except sqlite3.Error as e:
+        # Pulangkan ke buffer tanpa menindih heartbeat yang lebih baru
+        with _heartbeat_lock:
+            for ts, uuid in batch:
+                _heartbeat_buffer.setdefault(uuid, ts)
+            HEARTBEAT_STATS['errors'] += 1
+        print(f"[HEARTBEAT] Flush failed ({len(batch)} rows): {e}")
+        return 0
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _heartbeat_lock:
+        HEARTBEAT_STATS['flushes'] += 1
+        HEARTBEAT_STATS['rows_flushed'] += len(batch)
+        HEARTBEAT_STATS['last_batch'] = len(batch)
+        HEARTBEAT_STATS['last_flush_ms'] = round(elapsed_ms, 2)
+        HEARTBEAT_STATS['max_flush_ms'] = round(max(HEARTBEAT_STATS['max_flush_ms'], elapsed_ms), 2)
+    return len(batch)
+
+def _heartbeat_flusher():
+    while True:
+        time.sleep(HEARTBEAT_FLUSH_INTERVAL)
+        try:
+            flush_heartbeats()
+            presence.sweep()
+            sweep_commands()
+        except Exception as e:
+            print(f"[HEARTBEAT] Flusher error: {e}")
+
+def _ensure_heartbeat_flusher():
+    """Mulakan thread flusher sekali per process (thread tidak diwarisi selepas fork)"""
+    global _heartbeat_thread, _heartbeat_pid
+    if _heartbeat_pid == os.getpid() and _heartbeat_thread.is_alive():
+        return
+    with _heartbeat_lock:
+        if _heartbeat_pid == os.getpid() and _heartbeat_thread.is_alive():
+            return
+        _heartbeat_thread = threading.Thread(target=_heartbeat_flusher, name='heartbeat-flusher', daemon=True)
+        _heartbeat_thread.start()
+        _heartbeat_pid = os.getpid()
+
+# Jangan hilang heartbeat terakhir bila worker berhenti
+atexit.register(flush_heartbeats)
+
+# ==================== PC STATE & LONG-POLL ====================
+# action=check&wait=N menahan request sehingga status PC berubah atau ada
+# pending command. Perubahan dalam worker yang sama membangunkan penunggu
+# serta-merta (notify_pc_change); perubahan dari worker lain dikesan dengan
+# semakan semula DB setiap LONGPOLL_RECHECK saat.
+#
+# Pilihan (LONGPOLL_MAX_WAIT=0 = mati): setiap long-poll memegang satu worker WSGI
+# sehingga LONGPOLL_MAX_WAIT saat. Pada hosting dengan worker segerak yang sedikit
+# (PythonAnywhere: 3) beberapa PC sudah cukup untuk menyekat admin UI dan borang
+# unlock. Hidupkan hanya pada server berthread/async. Nilai semasa dihantar kepada
+# client sebagai "max_wait" dalam jawapan register/check — client hanya hantar
+# wait= bila server menyokongnya.
+
+LONGPOLL_MAX_WAIT = float(os.environ.get('LONGPOLL_MAX_WAIT', '0'))  # saat; 0 = jawab serta-merta
+LONGPOLL_RECHECK = 1.0
+LONGPOLL_MAX_WAITERS = int(os.environ.get('LONGPOLL_MAX_WAITERS', '32'))  # per worker; lebih = jawab serta-merta
+
+# Kadar polling client per makmal (labs.poll_*_ms, NULL = lalai client) — dihantar
+# dalam jawapan register/check sebagai "poll" supaya beban request seluruh makmal
+# boleh diubah tanpa deploy semula client. (kunci JSON, lajur labs, min ms, max ms)
+LAB_POLL_SETTINGS = (
+    ('locked', 'poll_locked_ms', 1000, 60000),  # QR dipaparkan
+    ('unlocked', 'poll_unlocked_ms', 2000, 600000),  # sesi aktif
+    ('offline_max', 'poll_offline_max_ms', 10000, 3600000),  # had backoff bila server gagal
+)
+
+def lab_poll_overrides(row):
+    """Dict override polling dari baris yang ada lajur labs.poll_*_ms (hanya yang ditetapkan)"""
+    return {key: row[column] for key, column, _, _ in LAB_POLL_SETTINGS if row[column] is not None}
+
+def lab_poll_settings(conn, lab_name):
+    """Override polling untuk satu makmal ({} jika tiada / makmal tidak wujud)"""
+    row = conn.execute("SELECT poll_locked_ms, poll_unlocked_ms, poll_offline_max_ms FROM labs WHERE name = ?",
+                       (lab_name,)).fetchone()
+    return lab_poll_overrides(row) if row else {}
+
+_pc_changed = threading.Condition()
+_pc_change_seq = 0
+_longpoll_slots = threading.BoundedSemaphore(LONGPOLL_MAX_WAITERS)
+
+def notify_pc_change():
+    """Bangunkan long-poll yang sedang menunggu dalam worker ini"""
+    global _pc_change_seq
+    with _pc_changed:
+        _pc_change_seq += 1
+        _pc_changed.notify_all()
+
+def wait_for_pc_change(seq, timeout):
+    """Tunggu notify_pc_change() selepas seq (atau timeout). Return seq terkini."""
+    with _pc_changed:
+        if _pc_change_seq == seq:
+            _pc_changed.wait(timeout)
+        return _pc_change_seq
+
+PC_COMMANDS = ('SHUTDOWN', 'RESTART', 'LOCK', 'UNLOCK')
+BULK_MAX_TARGETS = 500  # had uuid per bulk command (had pemboleh ubah SQLite lama = 999)
+
+# Gelombang (wave rollout): arahan pukal dihantar N PC setiap T saat (+ jitter)
+# supaya PC yang restart serentak tidak menyerbu register/check dalam saat yang sama.
+# LOCK/UNLOCK tukar status serta-merta, jadi gelombang hanya untuk RESTART/SHUTDOWN.
+WAVE_COMMANDS = ('RESTART', 'SHUTDOWN')
+WAVE_MAX_INTERVAL = 600  # saat
+
+# Baris gilir arahan (jadual commands): queued -> delivered -> acked.
+# Client yang hantar acks=1 mesti ack setiap arahan; arahan tanpa ack dalam
+# COMMAND_ACK_TIMEOUT saat dihantar semula (sehingga COMMAND_MAX_ATTEMPTS kali)
+# sebelum ditanda 'failed'. Arahan yang tidak dituntut dalam COMMAND_TTL saat
+# (PC offline) ditanda 'expired' — SHUTDOWN lama tidak dilaksana bila PC hidup semula.
+COMMAND_ACK_TIMEOUT = int(os.environ.get('COMMAND_ACK_TIMEOUT', '60'))
+COMMAND_MAX_ATTEMPTS = 3
+COMMAND_TTL = int(os.environ.get('COMMAND_TTL', '900'))
+COMMAND_RETENTION_DAYS = 30
+COMMAND_PRUNE_INTERVAL = 3600  # saat
+COMMAND_PAGE_SIZE = 100  # baris dalam tab Arahan
+COMMAND_STATS = {'queued': 0, 'delivered': 0, 'acked': 0, 'retried': 0, 'failed': 0, 'expired': 0, 'pruned': 0}
+_command_stats_lock = threading.Lock()
+_command_last_prune = 0.0
+
+# Format masa dengan milisaat supaya latency penghantaran boleh diukur
+SQL_NOW_MS = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+def _command_stat(key, delta=1):
+    with _command_stats_lock:
+        COMMAND_STATS[key] += delta
+
+def queue_pc_command(conn, command, uuids, queued_by=None, delays=None, batch_id=None):
+    """Masukkan arahan ke baris gilir PC (LOCK/UNLOCK juga tukar status). Caller commit.
+
+    delays: senarai saat (selari dengan uuids) sebelum arahan boleh dihantar — gelombang.
+    """
+    if command == 'UNLOCK':
+        conn.executemany("UPDATE pcs SET status = 'UNLOCKED' WHERE session_uuid = ?", [(u,) for u in uuids])
+    elif command == 'LOCK':
+        conn.executemany("UPDATE pcs SET status = 'LOCKED' WHERE session_uuid = ?", [(u,) for u in uuids])
+    # strftime(..., NULL) = NULL, jadi PC tanpa kelewatan terus layak dihantar
+    modifiers = [f'+{d:.3f} seconds' if d else None for d in delays] if delays else [None] * len(uuids)
+    # Nama makmal/PC disalin supaya sejarah arahan kekal selepas PC daftar semula
+    cur = conn.executemany("""
+        INSERT INTO commands (session_uuid, lab_name, pc_hostname, command, queued_by, batch_id, not_before)
+        SELECT session_uuid, lab_name, pc_hostname, ?, ?, ?, strftime('%Y-%m-%d %H:%M:%f', 'now', ?)
+        FROM pcs WHERE session_uuid = ?
+    """, [(command, queued_by, batch_id, modifier, uuid) for uuid, modifier in zip(uuids, modifiers)])
+    queued = max(cur.rowcount, 0)
+    _command_stat('queued', queued)
+    return queued
+
+def poll_pc_state(conn, uuid, acks=False):
+    """Baca status PC dan tuntut arahan tertua dalam baris gilir. Return dict atau None."""
+    row = conn.execute("""
+        SELECT p.status, c.id AS command_id, c.command,
+               l.poll_locked_ms, l.poll_unlocked_ms, l.poll_offline_max_ms
+        FROM pcs p
+        LEFT JOIN labs l ON l.name = p.lab_name
+        LEFT JOIN commands c ON c.id = (
+            SELECT id FROM commands WHERE session_uuid = p.session_uuid AND state = 'queued'
+            AND (not_before IS NULL OR not_before <= strftime('%Y-%m-%d %H:%M:%f', 'now'))
+            ORDER BY id LIMIT 1)
+        WHERE p.session_uuid = ?
+    """, (uuid,)).fetchone()
+    if not row:
+        return None
+    state = {'status': row['status'], 'poll': lab_poll_overrides(row)}
+    if row['command_id']:
+        # Tuntut secara atomik (compare-and-set pada state) — hanya satu poll menang.
+        # Bukan UPDATE ... RETURNING: poll tanpa arahan kekal baca sahaja (tiada write lock)
+        # dan SQLite < 3.35 di hosting tidak menyokong RETURNING.
+        cur = conn.execute(f"""
+            UPDATE commands SET state = 'delivered', delivered_at = {SQL_NOW_MS},
+                   attempts = attempts + 1, ack_required = ?
+            WHERE id = ? AND state = 'queued'
+        """, (1 if acks else 0, row['command_id']))
+        conn.commit()
+        if cur.rowcount:
+            _command_stat('delivered')
+            state['command'] = row['command']
+            state['command_id'] = row['command_id']
+    return state
+
+def next_deferred_command(conn, uuid):
+    """not_before (UTC) arahan gelombang seterusnya yang belum layak untuk PC ini, atau None"""
+    return conn.execute("""
+        SELECT MIN(not_before) FROM commands
+        WHERE session_uuid = ? AND state = 'queued' AND not_before > strftime('%Y-%m-%d %H:%M:%f', 'now')
+    """, (uuid,)).fetchone()[0]
+
+def ack_command(conn, uuid, command_id):
+    """Tanda arahan sebagai acked oleh PC. Return True jika baris dikemas kini."""
+    # Ack lewat tetap diterima (arahan mungkin sudah di-queue semula atau 'failed')
+    cur = conn.execute(f"""
+        UPDATE commands SET state = 'acked', acked_at = {SQL_NOW_MS}
+        WHERE id = ? AND session_uuid = ? AND state IN ('queued', 'delivered', 'failed')
+    """, (command_id, uuid))
+    conn.commit()
+    if cur.rowcount:
+        _command_stat('acked')
+    return cur.rowcount > 0
+
+def sweep_commands():
+    """Retry arahan tanpa ack, tamatkan arahan basi, buang sejarah lama (thread flusher)"""
+    global _command_last_prune
+    overdue = (f"state = 'delivered' AND ack_required = 1 "
+               f"AND delivered_at < strftime('%Y-%m-%d %H:%M:%f', 'now', '-{COMMAND_ACK_TIMEOUT} seconds')")
+    # Arahan gelombang: TTL dikira dari giliran gelombangnya, bukan masa queue
+    stale = (f"state = 'queued' AND COALESCE(not_before, queued_at) "
+             f"< strftime('%Y-%m-%d %H:%M:%f', 'now', '-{COMMAND_TTL} seconds')")
+
+    with app.app_context():
+        conn = get_db()
+        # Semakan baca sahaja dahulu — kebanyakan pusingan tiada apa untuk ditulis
+        pending = conn.execute(f"""
+            SELECT EXISTS (SELECT 1 FROM commands WHERE {overdue})
+                OR EXISTS (SELECT 1 FROM commands WHERE {stale})
+        """).fetchone()[0]
+        prune = time.monotonic() - _command_last_prune >= COMMAND_PRUNE_INTERVAL
+        if not pending and not prune:
+            return
+
+        retried = conn.execute(f"""
+            UPDATE commands SET state = 'queued'
+            WHERE {overdue} AND attempts < ? AND session_uuid IN (SELECT session_uuid FROM pcs)
+        """, (COMMAND_MAX_ATTEMPTS,)).rowcount
+        failed = conn.execute(f"UPDATE commands SET state = 'failed' WHERE {overdue}").rowcount
+        expired = conn.execute(f"UPDATE commands SET state = 'expired' WHERE {stale}").rowcount
+        pruned = 0
+        if prune:
+            pruned = conn.execute(f"""
+                DELETE FROM commands WHERE state NOT IN ('queued', 'delivered')
+                AND queued_at < strftime('%Y-%m-%d %H:%M:%f', 'now', '-{COMMAND_RETENTION_DAYS} days')
+            """).rowcount
+            conn.execute("""
+                DELETE FROM command_batches
+                WHERE id NOT IN (SELECT batch_id FROM commands WHERE batch_id IS NOT NULL)
+            """)
+            _command_last_prune = time.monotonic()
+        conn.commit()
+
+    for key, n in (('retried', retried), ('failed', failed), ('expired', expired), ('pruned', pruned)):
+        if n:
+            _command_stat(key, n)
+    if retried:
+        notify_pc_change()
+    if retried or failed or expired:
+        print(f"[COMMANDS] retried={retried} failed={failed} expired={expired}")
+
+def wait_pc_state(conn, uuid, since_status, wait, acks=False):
+    """Long-poll: tunggu sehingga status != since_status, ada command, atau tamat masa"""
+    deadline = time.monotonic() + wait
+    seq = _pc_change_seq
+    state = poll_pc_state(conn, uuid, acks)
+    while state and 'command' not in state and state['status'] == since_status:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        seq = wait_for_pc_change(seq, min(remaining, LONGPOLL_RECHECK))
+        state = poll_pc_state(conn, uuid, acks)
+    return state
+
+# ==================== CONTROL CHANNEL (WEBSOCKET) ====================
+# Saluran kekal /ws/channel?uuid=... antara client dan server (pilihan — perlu
+# flask-sock dan hosting yang menyokong WebSocket). Server tolak status/arahan
+# sebaik berubah; client hantar heartbeat melalui socket yang sama. Client
+# kembali ke HTTP long-poll secara automatik jika saluran tidak boleh dibuka.
+#
+# Frame (JSON teks):
+#   server -> client: {"type": "status", "status": "LOCKED"|"UNLOCKED"}
+#                     {"type": "command", "command": "SHUTDOWN"|..., "id": <command id>}
+#                     {"type": "error", "error": "..."}
+#   client -> server: {"type": "heartbeat"}
+#                     {"type": "ack", "id": <command id>}   (wajib jika buka dengan ?acks=1)
+
+CHANNEL_MAX_CONNECTIONS = int(os.environ.get('CHANNEL_MAX_CONNECTIONS', '256'))  # per worker
+CHANNEL_POLL_INTERVAL = 0.5  # saat - semak notify/data_version antara frame
+
+_channel_slots = threading.BoundedSemaphore(CHANNEL_MAX_CONNECTIONS)
+CHANNEL_STATS = {'connected': 0, 'opened': 0, 'frames_sent': 0, 'frames_received': 0}
+_channel_stats_lock = threading.Lock()
+
+def _channel_stat(key, delta=1):
+    with _channel_stats_lock:
+        CHANNEL_STATS[key] += delta
+
+def serve_control_channel(ws, uuid, acks=False):
+    """Gelung saluran kawalan untuk satu PC (satu thread per sambungan)"""
+    def send(frame):
+        ws.send(json.dumps(frame))
+        _channel_stat('frames_sent')
+
+    # Ambil slot dahulu — poll_pc_state() menuntut arahan, yang akan hilang jika
+    # sambungan kemudian ditolak kerana saluran penuh
+    if not _channel_slots.acquire(blocking=False):
+        send({'type': 'error', 'error': 'Channel full'})
+        return
+    connected = False
+    try:
+        conn = get_db()
+        state = poll_pc_state(conn, uuid, acks)
+        if not state:
+            send({'type': 'error', 'error': 'Session not found', 'code': 'session_not_found'})
+            return
+
+        _channel_stat('opened')
+        _channel_stat('connected')
+        connected = True
+        record_heartbeat(uuid)
+        send({'type': 'status', 'status': state['status']})
+        if 'command' in state:
+            send({'type': 'command', 'command': state['command'], 'id': state['command_id']})
+        known_status = state['status']
+        drain = 'command' in state  # Mungkin ada arahan lain di belakangnya dalam baris gilir
+        deferred = next_deferred_command(conn, uuid)
+
+        seq = _pc_change_seq
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        while True:
+            raw = ws.receive(timeout=CHANNEL_POLL_INTERVAL)
+            if raw:
+                _channel_stat('frames_received')
+                try:
+                    frame = json.loads(raw)
+                except ValueError:
+                    continue
+                if frame.get('type') == 'heartbeat':
+                    record_heartbeat(uuid)
+                elif frame.get('type') == 'ack' and isinstance(frame.get('id'), int):
+                    ack_command(conn, uuid, frame['id'])
+
+            # Semak DB hanya bila ada perubahan (worker ini atau connection lain)
+            # atau bila giliran gelombang arahan yang ditangguh sudah tiba
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            due = deferred is not None and datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')[:23] >= deferred
+            if _pc_change_seq == seq and version == data_version and not due and not drain:
+                continue
+            seq, data_version = _pc_change_seq, version
+
+            state = poll_pc_state(conn, uuid, acks)
+            if not state:
+                send({'type': 'error', 'error': 'Session not found', 'code': 'session_not_found'})
+                return
+            if 'command' in state:
+                send({'type': 'command', 'command': state['command'], 'id': state['command_id']})
+            drain = 'command' in state
+            deferred = next_deferred_command(conn, uuid)
+            if state['status'] != known_status:
+                known_status = state['status']
+                send({'type': 'status', 'status': known_status})
+    finally:
+        _channel_slots.release()
+        if connected:
+            _channel_stat('connected', -1)
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route('/ws/channel')
+    def control_channel(ws):
+        """WebSocket control channel untuk PCClient"""
+        serve_control_channel(ws, request.args.get('uuid', ''), request.args.get('acks') == '1')
+
+# ==================== SCHEDULER ====================
+# Arahan berjadual per makmal (jadual scheduled_jobs): sekali (cron NULL) atau
+# berulang dengan ungkapan cron 5 medan, cth. "55 17 * * 1-5" = LOCK 17:55
+# hari bekerja. Setiap worker ada thread scheduler, tetapi hanya pemegang lease
+# (baris scheduler_lease) yang melaksanakan job; lease diperbaharui setiap
+# SCHEDULER_INTERVAL saat dan diambil alih oleh worker lain selepas tamat tempoh.
+# Masa jadual dalam zon waktu makmal (LAB_TIMEZONE); next_run disimpan dalam UTC.
+
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', '1') == '1'
+SCHEDULER_INTERVAL = 10  # saat
+SCHEDULER_LEASE_TTL = 3 * SCHEDULER_INTERVAL
+SCHEDULER_MISFIRE_GRACE = 300  # saat - job yang lewat lebih dari ini dilangkau (cth. server down)
+SCHEDULER_STATS = {'leader': False, 'ticks': 0, 'runs': 0, 'missed': 0, 'commands': 0, 'errors': 0}
+_scheduler_stats_lock = threading.Lock()
+
+def _scheduler_stat(key, delta=1):
+    with _scheduler_stats_lock:
+        SCHEDULER_STATS[key] += delta
+
+try:
+    LAB_TZ = ZoneInfo(os.environ.get('LAB_TIMEZONE', 'Asia/Kuala_Lumpur'))
+except ZoneInfoNotFoundError:
+    # Tiada pangkalan data tz (cth. Windows tanpa pakej tzdata) — Malaysia tiada DST
+    LAB_TZ = timezone(timedelta(hours=8), 'MYT')
+
+_scheduler_lock = threading.Lock()
+_scheduler_thread = None
+_scheduler_pid = None
+_scheduler_holder = None
+
+CRON_FIELDS = (('minit', 0, 59), ('jam', 0, 23), ('hari', 1, 31), ('bulan', 1, 12), ('hari minggu', 0, 7))
+
+def parse_cron(expr):
+    """Parse cron 'minit jam hari bulan hari-minggu' (*, a-b, a,b, */n). ValueError jika tidak sah."""
+    parts = expr.split()
+    if len(parts) != 5:
+        raise ValueError('Cron perlu 5 medan: minit jam hari bulan hari-minggu')
+    fields = []
+    for part, (name, lo, hi) in zip(parts, CRON_FIELDS):
+        values = set()
+        for item in part.split(','):
+            base, _, step = item.partition('/')
+            try:
+                step = int(step) if step else 1
+                if base == '*':
+                    start, end = lo, hi
+                elif '-' in base:
+                    start, end = (int(x) for x in base.split('-', 1))
+                else:
+                    start = int(base)
+                    end = hi if '/' in item else start
+            except ValueError:
+                raise ValueError(f'Medan {name} tidak sah: {item}')
+            if step < 1 or not lo <= start <= end <= hi:
+                raise ValueError(f'Medan {name} di luar julat {lo}-{hi}: {item}')
+            values.update(range(start, end + 1, step))
+        fields.append(values)
+    fields[4] = {d % 7 for d in fields[4]}  # 7 = Ahad
+    # Cron standard: jika hari dan hari-minggu kedua-duanya dihadkan, padan salah satu
+    fields.append(parts[2] != '*' and parts[4] != '*')
+    return fields
+
+def cron_next(expr, after):
+    """Masa tempatan (naive) pertama selepas `after` yang sepadan dengan cron"""
+    minutes, hours, days, months, weekdays, either_day = parse_cron(expr)
+    start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    day = start.replace(hour=0, minute=0)
+    for _ in range(366 * 5):  # cukup untuk 29 Feb
+        weekday = (day.weekday() + 1) % 7  # cron: 0 = Ahad
+        if either_day:
+            day_match = day.day in days or weekday in weekdays
+        else:
+            day_match = day.day in days and weekday in weekdays
+        if day.month in months and day_match:
+            for hour in sorted(hours):
+                for minute in sorted(minutes):
+                    candidate = day.replace(hour=hour, minute=minute)
+                    if candidate >= start:
+                        return candidate
+        day += timedelta(days=1)
+    raise ValueError('Cron tidak pernah sepadan dengan mana-mana tarikh')
+
+def local_to_utc(local_dt):
+    """datetime tempatan makmal (naive) -> rentetan UTC format CURRENT_TIMESTAMP"""
+    return local_dt.replace(tzinfo=LAB_TZ).astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def utc_to_local(value):
+    """Rentetan UTC dari DB -> datetime tempatan makmal (naive)"""
+    utc_dt = datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return utc_dt.astimezone(LAB_TZ).replace(tzinfo=None)
+
+@app.template_filter('localtime')
+def localtime_filter(value):
+    """Papar masa UTC dari DB dalam zon waktu makmal"""
+    return utc_to_local(value).strftime('%Y-%m-%d %H:%M') if value else '-'
+
+def job_next_run(cron, after_utc):
+    """next_run (UTC) seterusnya untuk job berulang; None untuk job sekali"""
+    if not cron:
+        return None
+    after_local = after_utc.replace(tzinfo=timezone.utc).astimezone(LAB_TZ).replace(tzinfo=None)
+    return local_to_utc(cron_next(cron, after_local))
+
+def acquire_scheduler_lease(conn, holder):
+    """Ambil/perbaharui lease scheduler. Return True jika worker ini leader."""
+    now = time.time()
+    row = conn.execute("SELECT holder, expires_at FROM scheduler_lease WHERE name = 'scheduler'").fetchone()
+    if row['holder'] != holder and row['expires_at'] >= now:
+        return False  # Worker lain leader — tiada tulisan
+    # Compare-and-set: hanya satu worker berjaya ambil lease yang tamat
+    cur = conn.execute("""
+        UPDATE scheduler_lease SET holder = ?, expires_at = ?
+        WHERE name = 'scheduler' AND (holder = ? OR expires_at < ?)
+    """, (holder, now + SCHEDULER_LEASE_TTL, holder, now))
+    conn.commit()
+    return cur.rowcount == 1
+
+def run_due_jobs(conn):
+    """Laksana job yang sudah tiba masanya sebagai arahan pukal. Return bilangan job."""
+    now = datetime.utcnow()
+    now_str = now.strftime('%Y-%m-%d %H:%M:%S')
+    jobs = conn.execute("SELECT * FROM scheduled_jobs WHERE enabled = 1 AND next_run <= ? ORDER BY next_run",
+                        (now_str,)).fetchall()
+    ran = 0
+    for job in jobs:
+        late = (now - datetime.strptime(job['next_run'], '%Y-%m-%d %H:%M:%S')).total_seconds()
+        try:
+            next_run = job_next_run(job['cron'], now)
+        except ValueError:
+            next_run = None  # Cron rosak — hentikan job
+        uuids = []
+        if late > SCHEDULER_MISFIRE_GRACE:
+            result = f'Dilangkau - lewat {int(late)}s'
+        else:
+            query = "SELECT session_uuid FROM pcs WHERE lab_name = ?"
+            params = [job['lab_name']]
+            if job['status_filter']:
+                query += " AND status = ?"
+                params.append(job['status_filter'])
+            uuids = [r['session_uuid'] for r in conn.execute(query, params).fetchall()]
+            result = f'{job["command"]} -> {len(uuids)} PC'
+
+        # Compare-and-set pada next_run: job tidak dilaksana dua kali walaupun lease bertindih
+        cur = conn.execute("""
+            UPDATE scheduled_jobs SET next_run = ?, enabled = ?, last_run = ?, last_result = ?
+            WHERE id = ? AND next_run = ?
+        """, (next_run, 1 if next_run else 0, now_str, result, job['id'], job['next_run']))
+        if not cur.rowcount:
+            conn.rollback()
+            continue
+        # Satu transaksi executemany untuk semua PC makmal
+        queue_pc_command(conn, job['command'], uuids, f"jadual #{job['id']}")
+        conn.commit()
+        ran += 1
+        _scheduler_stat('missed' if late > SCHEDULER_MISFIRE_GRACE else 'runs')
+        _scheduler_stat('commands', len(uuids))
+        print(f"[SCHEDULER] Job #{job['id']} {job['lab_name']}: {result}")
+    if ran:
+        notify_pc_change()
+    return ran
+
+def _scheduler_loop(holder):
+    while True:
+        try:
+            with app.app_context():
+                conn = get_db()
+                leader = acquire_scheduler_lease(conn, holder)
+                with _scheduler_stats_lock:
+                    SCHEDULER_STATS['leader'] = leader
+                if leader:
+                    run_due_jobs(conn)
+            _scheduler_stat('ticks')
+        except Exception as e:
+            _scheduler_stat('errors')
+            print(f"[SCHEDULER] Error: {e}")
+        time.sleep(SCHEDULER_INTERVAL)
+
+def _ensure_scheduler():
+    """Mulakan thread scheduler sekali per process (thread tidak diwarisi selepas fork)"""
+    global _scheduler_thread, _scheduler_pid, _scheduler_holder
+    if not SCHEDULER_ENABLED or (_scheduler_pid == os.getpid() and _scheduler_thread.is_alive()):
+        return
+    with _scheduler_lock:
+        if _scheduler_pid == os.getpid() and _scheduler_thread.is_alive():
+            return
+        _scheduler_holder = f"{os.getpid()}-{os.urandom(4).hex()}"
+        _scheduler_thread = threading.Thread(target=_scheduler_loop, args=(_scheduler_holder,),
+                                             name='scheduler', daemon=True)
+        _scheduler_thread.start()
+        _scheduler_pid = os.getpid()
+
+@app.before_request
+def start_scheduler():
+    _ensure_scheduler()
+
+def _release_scheduler_lease():
+    """Lepaskan lease semasa worker berhenti supaya worker lain ambil alih serta-merta"""
+    if _scheduler_pid != os.getpid():
+        return
+    try:
+        conn = _open_db()
+        conn.execute("UPDATE scheduler_lease SET expires_at = 0 WHERE name = 'scheduler' AND holder = ?",
+                     (_scheduler_holder,))
+        conn.commit()
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+atexit.register(_release_scheduler_lease)
+
 # ==================== HELPERS ====================
 
+# Admin principal (baris admin_users + makmal) dicache per request dalam g dan
+# merentas request dalam LRU kecil — setiap klik admin_command tidak perlu
+# muat semula admin + makmal. Setiap entri disahkan terhadap admin_version
+# (satu baris, dinaikkan oleh trigger bila admin_users/admin_labs/labs berubah).
+# admin_version sendiri dibaca paling kerap sekali setiap ADMIN_VERSION_CHECK_INTERVAL
+# per proses, jadi perubahan dari worker lain berkuat kuasa dalam masa itu;
+# perubahan dalam worker yang sama berkuat kuasa serta-merta (clear_admin_caches).
+ADMIN_CACHE_TTL = 30  # saat
+ADMIN_VERSION_CHECK_INTERVAL = float(os.environ.get('ADMIN_VERSION_CHECK_INTERVAL', '2'))  # saat
+ADMIN_CACHE_MAX = 256
+_admin_cache = OrderedDict()  # admin_id -> (expires_at, admin_version, admin dict)
+_admin_cache_lock = threading.Lock()
+ADMIN_CACHE_STATS = {'hits': 0, 'misses': 0, 'version_reads': 0}
+_admin_version = (0.0, None)  # (dibaca pada - monotonic, nilai)
+
+def admin_cache_version(conn):
+    """Nilai admin_version, dibaca dari DB paling kerap sekali setiap ADMIN_VERSION_CHECK_INTERVAL"""
+    global _admin_version
+    now = time.monotonic()
+    with _admin_cache_lock:
+        checked_at, version = _admin_version
+        if version is not None and now - checked_at < ADMIN_VERSION_CHECK_INTERVAL:
+            return version
+    version = conn.execute("SELECT version FROM admin_version WHERE id = 1").fetchone()[0]
+    with _admin_cache_lock:
+        _admin_version = (now, version)
+        ADMIN_CACHE_STATS['version_reads'] += 1
+    return version
+
+def _load_admin(admin_id):
+    conn = get_db()
+    user = conn.execute("SELECT * FROM admin_users WHERE id = ?", (admin_id,)).fetchone()
+    if not user:
+        return None
+    admin = dict(user)
+    admin['labs'] = [] if admin['is_superadmin'] else fetch_admin_labs(conn, admin['id'])
+    return admin
+
 def get_current_admin():
     """Dapatkan maklumat admin dari session. Return dict atau None."""
     if 'admin_id' not in session:
         return None
-    conn = get_db()
-    user = conn.execute("SELECT * FROM admin_users WHERE id = ?", (session['admin_id'],)).fetchone()
-    conn.close()
-    if user:
-        return dict(user)
-    return None
+    if '_admin' in g:
+        return g._admin
+
+    admin_id = session['admin_id']
+    now = time.monotonic()
+    version = admin_cache_version(get_db())
+    with _admin_cache_lock:
+        hit = _admin_cache.get(admin_id)
+        if hit and hit[0] > now and hit[1] == version:
+            _admin_cache.move_to_end(admin_id)
+            ADMIN_CACHE_STATS['hits'] += 1
+            admin = hit[2]
+        else:
+            ADMIN_CACHE_STATS['misses'] += 1
+            admin = None
+
+    if admin is None:
+        admin = _load_admin(admin_id)
+        if admin is not None:
+            with _admin_cache_lock:
+                _admin_cache[admin_id] = (now + ADMIN_CACHE_TTL, version, admin)
+                _admin_cache.move_to_end(admin_id)
+                while len(_admin_cache) > ADMIN_CACHE_MAX:
+                    _admin_cache.popitem(last=False)
+
+    # Salinan per request — caller tidak boleh ubah entri cache
+    g._admin = dict(admin, labs=list(admin['labs'])) if admin else None
+    return g._admin
+
+def clear_admin_caches():
+    """Panggil selepas commit yang mengubah admin_users / admin_labs / labs"""
+    global _admin_version
+    with _admin_cache_lock:
+        _admin_cache.clear()
+        _admin_version = (0.0, None)  # Baca semula admin_version pada request seterusnya
+    g.pop('_admin', None)
+    clear_verify_cache()
+
+def fetch_admin_labs(conn, admin_id):
+    """Nama makmal yang ditugaskan kepada admin (admin_labs → labs)"""
+    rows = conn.execute("""
+        SELECT l.name FROM admin_labs al
+        JOIN labs l ON l.id = al.lab_id
+        WHERE al.admin_id = ?
+        ORDER BY l.name
+    """, (admin_id,)).fetchall()
+    return [r['name'] for r in rows]
 
 def get_admin_labs(admin):
     """Dapatkan senarai lab yang ditugaskan. None = semua (superadmin)."""
     if admin['is_superadmin']:
         return None
-    labs_str = admin.get('assigned_labs', '')
-    if not labs_str:
-        return []
-    return [l.strip() for l in labs_str.split(',') if l.strip()]
+    return admin['labs']
+
+def admin_lab_scope(admin, lab_column):
+    """JOIN untuk hadkan query kepada makmal admin. ('', []) untuk superadmin."""
+    if admin['is_superadmin']:
+        return '', []
+    return (f"JOIN labs scope_l ON scope_l.name = {lab_column} "
+            "JOIN admin_labs scope_al ON scope_al.lab_id = scope_l.id AND scope_al.admin_id = ?"), [admin['id']]
+
+def set_admin_labs(conn, admin_id, lab_names):
+    """Ganti senarai makmal admin (tanpa commit)"""
+    conn.execute("DELETE FROM admin_labs WHERE admin_id = ?", (admin_id,))
+    conn.executemany("INSERT OR IGNORE INTO labs (name) VALUES (?)", [(lab,) for lab in lab_names if lab])
+    conn.executemany("INSERT OR IGNORE INTO admin_labs (admin_id, lab_id) SELECT ?, id FROM labs WHERE name = ?",
+                     [(admin_id, lab) for lab in lab_names])
+
+def render_page(template, **context):
+    """Render template yang telah dikompil (*_TEMPLATE) dengan konteks Flask biasa.
+
+    render_template_string parse + kompil semula sumber HTML pada setiap request;
+    template halaman dikompil sekali semasa import melalui app.jinja_env.
+    """
+    app.update_template_context(context)
+    return template.render(context)
+
+LOG_PAGE_SIZE = 100
+
+def parse_log_date(value):
+    """'YYYY-MM-DD' → datetime, atau None jika kosong/tidak sah"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def unlock_event_filter(admin_labs, selected_lab, date_from=None, date_to=None):
+    """WHERE clause untuk unlock_events (Log Pengguna + CSV export).
+
+    Julat tarikh ditapis terus pada unlock_time (idx_unlock_events_time) — id
+    tidak semestinya menaik seiring unlock_time: baris yang dimigrasi oleh v3
+    kekal dengan sessions.id (turutan register, bukan turutan unlock).
+    """
+    clauses, params = [], []
+    if selected_lab:
+        clauses.append("e.lab_name = ?")
+        params.append(selected_lab)
+    elif admin_labs is not None:
+        if not admin_labs:
+            return "WHERE 0", []
+        clauses.append(f"e.lab_name IN ({','.join(['?' for _ in admin_labs])})")
+        params.extend(admin_labs)
+
+    if date_from:
+        clauses.append("e.unlock_time >= ?")
+        params.append(date_from.strftime('%Y-%m-%d %H:%M:%S'))
+    if date_to:
+        clauses.append("e.unlock_time < ?")
+        params.append((date_to + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S'))  # 'to' inklusif
+
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def unlock_event_order(date_from=None, date_to=None):
+    """ORDER BY yang sepadan dengan index untuk tapisan semasa.
+
+    Bertapis tarikh: (unlock_time, id) — idx_unlock_events_lab_time / idx_unlock_events_time
+    terus memberi turutan ini, jadi halaman pertama tidak perlu sort seluruh julat.
+    Tanpa tarikh: id sahaja (idx_unlock_events_lab).
+    """
+    return "e.unlock_time DESC, e.id DESC" if date_from or date_to else "e.id DESC"
+
+# ==================== PASSWORD HASHING POOL ====================
+# generate/check_password_hash sengaja perlahan (KDF). Jalankan dalam process
+# pool supaya burst login tidak menyekat thread yang layan heartbeat poll.
+# Slot terhad (worker + queue) — bila penuh, HashPoolBusy → caller pulangkan 429.
+
+HASH_POOL_WORKERS = int(os.environ.get('HASH_POOL_WORKERS', '2'))  # 0 = hash dalam thread request
+HASH_QUEUE_MAX = int(os.environ.get('HASH_QUEUE_MAX', '8'))        # request menunggu, per worker process
+HASH_TIMEOUT = 10  # saat
+
+_hash_slots = threading.BoundedSemaphore(max(1, HASH_POOL_WORKERS) + HASH_QUEUE_MAX)
+_hash_pool = None
+_hash_pool_pid = None
+_hash_pool_lock = threading.Lock()
+HASH_STATS = {'submitted': 0, 'inline': 0, 'rejected': 0, 'timeouts': 0,
+              'queue_wait_ms_total': 0.0, 'queue_wait_ms_max': 0.0,
+              'exec_ms_total': 0.0, 'exec_ms_max': 0.0}
+_hash_stats_lock = threading.Lock()
+
+class HashPoolBusy(Exception):
+    """Pool hashing penuh atau timeout"""
+
+def _hash_task(op, a, b):
+    """Dijalankan dalam child process. Return (masa mula, keputusan, masa proses)."""
+    started = time.time()
+    if op == 'generate':
+        result = generate_password_hash(a)
+    else:
+        result = check_password_hash(a, b)
+    return started, result, time.time() - started
+
+def _get_hash_pool():
+    """Pool dicipta lazily sekali per process. None = hash inline."""
+    global _hash_pool, _hash_pool_pid
+    if HASH_POOL_WORKERS <= 0:
+        return None
+    with _hash_pool_lock:
+        if _hash_pool_pid != os.getpid():
+            _hash_pool_pid = os.getpid()
+            try:
+                _hash_pool = ProcessPoolExecutor(max_workers=HASH_POOL_WORKERS)
+            except (OSError, NotImplementedError, ImportError) as e:
+                # Sesetengah hosting tiada sem_open/fork — kekal inline
+                print(f"[HASH] Process pool unavailable, hashing inline: {e}")
+                _hash_pool = None
+        return _hash_pool
+
+def _reset_hash_pool():
+    global _hash_pool_pid
+    with _hash_pool_lock:
+        _hash_pool_pid = None
+
+def _run_hash(op, a, b=None):
+    if not _hash_slots.acquire(blocking=False):
+        with _hash_stats_lock:
+            HASH_STATS['rejected'] += 1
+        raise HashPoolBusy('hash pool saturated')
+    slot_held = True  # Dilepaskan dalam finally, kecuali jika diserahkan kepada future
+    try:
+        submitted = time.time()
+        pool = _get_hash_pool()
+        if pool is None:
+            started, result, elapsed = _hash_task(op, a, b)
+            key = 'inline'
+        else:
+            try:
+                future = pool.submit(_hash_task, op, a, b)
+                # Slot dipegang sehingga child selesai — selepas timeout child masih
+                # hash, jadi kerja tertunggak kekal <= HASH_POOL_WORKERS + HASH_QUEUE_MAX
+                future.add_done_callback(lambda f: _hash_slots.release())
+                slot_held = False
+                started, result, elapsed = future.result(timeout=HASH_TIMEOUT)
+            except FutureTimeoutError:
+                with _hash_stats_lock:
+                    HASH_STATS['timeouts'] += 1
+                raise HashPoolBusy('hash timeout')
+            except BrokenProcessPool:
+                # Child mati (cth. OOM) — cipta semula pool pada panggilan seterusnya
+                _reset_hash_pool()
+                started, result, elapsed = _hash_task(op, a, b)
+                key = 'inline'
+            else:
+                key = 'submitted'
+        wait_ms = max(0.0, (started - submitted) * 1000)
+        exec_ms = elapsed * 1000
+        with _hash_stats_lock:
+            HASH_STATS[key] += 1
+            HASH_STATS['queue_wait_ms_total'] += wait_ms
+            HASH_STATS['queue_wait_ms_max'] = max(HASH_STATS['queue_wait_ms_max'], wait_ms)
+            HASH_STATS['exec_ms_total'] += exec_ms
+            HASH_STATS['exec_ms_max'] = max(HASH_STATS['exec_ms_max'], exec_ms)
+        return result
+    finally:
+        if slot_held:
+            _hash_slots.release()
+
+def hash_password(password):
+    """generate_password_hash melalui pool. Boleh raise HashPoolBusy."""
+    return _run_hash('generate', password)
+
+def check_password(pwhash, password):
+    """check_password_hash melalui pool. Boleh raise HashPoolBusy."""
+    return _run_hash('check', pwhash, password)
+
+# ==================== ADMIN VERIFICATION ====================
+# verify_admin dipanggil setiap kali Ctrl+Alt+L di PC — check_password_hash
+# sengaja perlahan, jadi calon disempitkan dahulu (username eksplisit, atau
+# admin makmal itu + superadmin) dan keputusan dicache seketika.
+
+VERIFY_CACHE_TTL = 60          # saat - keputusan berjaya
+VERIFY_CACHE_NEGATIVE_TTL = 10 # saat - password salah
+VERIFY_CACHE_MAX = 1024
+# Tanpa username (client lama), hanya N calon pertama disemak — kos hash setiap
+# cubaan gagal kekal kecil walaupun makmal ada ramai admin + superadmin
+VERIFY_MAX_CANDIDATES = int(os.environ.get('VERIFY_MAX_CANDIDATES', '3'))
+_verify_cache_salt = os.urandom(16)  # per-proses; digest tak boleh diguna semula di luar
+_verify_cache_lock = threading.Lock()
+_verify_cache = {}  # digest -> (expires_at, admin_version, username atau None)
+
+def _verify_cache_key(lab_name, username, password):
+    msg = '\0'.join((lab_name, username, password)).encode('utf-8')
+    return hmac.new(_verify_cache_salt, msg, hashlib.sha256).digest()
+
+def clear_verify_cache():
+    """Kosongkan cache — panggil bila admin_users berubah"""
+    with _verify_cache_lock:
+        _verify_cache.clear()
+
+def verify_admin_password(conn, lab_name, password, username=''):
+    """Sahkan password admin untuk makmal. Return username atau None."""
+    key = _verify_cache_key(lab_name, username, password)
+    now = time.monotonic()
+    version = admin_cache_version(conn)  # Admin/password diubah di worker lain → abaikan cache
+    with _verify_cache_lock:
+        hit = _verify_cache.get(key)
+        if hit and hit[0] > now and hit[1] == version:
+            return hit[2]
+
+    # Admin makmal ini (join berindeks) + superadmin; username = terus ke satu akaun,
+    # tanpa username dihadkan VERIFY_MAX_CANDIDATES (admin makmal dahulu)
+    query = """
+        SELECT * FROM admin_users
+        WHERE (is_superadmin = 1 OR id IN (
+            SELECT al.admin_id FROM admin_labs al JOIN labs l ON l.id = al.lab_id WHERE l.name = ?
+        ))
+    """
+    params = [lab_name]
+    if username:
+        query += " AND username = ?"
+        params.append(username)
+    params.append(1 if username else VERIFY_MAX_CANDIDATES)
+    candidates = conn.execute(query + " ORDER BY is_superadmin, id LIMIT ?", params).fetchall()
+
+    matched = None
+    for user in candidates:
+        if check_password(user['password_hash'], password):
+            matched = user['username']
+            break
+
+    ttl = VERIFY_CACHE_TTL if matched else VERIFY_CACHE_NEGATIVE_TTL
+    with _verify_cache_lock:
+        if len(_verify_cache) >= VERIFY_CACHE_MAX:
+            for k in [k for k, v in _verify_cache.items() if v[0] <= now]:
+                del _verify_cache[k]
+            if len(_verify_cache) >= VERIFY_CACHE_MAX:
+                _verify_cache.clear()
+        _verify_cache[key] = (now + ttl, version, matched)
+    return matched
+
+# ==================== RATE LIMITING ====================
+# Token bucket dalam memori (per worker process) untuk /api.php. Setiap action
+# ada bajet sendiri, dikunci mengikut PC (uuid), admin atau IP. Action mahal
+# (pengesahan password) juga berkongsi satu bucket global, jadi brute-force atau
+# client yang tersangkut dalam gelung retry kehabisan bajet sendiri dahulu —
+# check/admin_command hanya tertakluk kepada had per-client dan tidak pernah
+# berebut bajet dengan action password. Had berkesan = had x bilangan worker.
+
+def _env_limit(name, default):
+    """Had (token sesaat, burst) dari env dalam bentuk 'kadar,burst', cth. RATE_LIMIT_CHECK=1,10"""
+    value = os.environ.get(name, '').strip()
+    if not value:
+        return default
+    rate, burst = value.split(',')
+    return float(rate), int(burst)
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMITS = {
+    # action: (token sesaat, burst, kunci) — override: RATE_LIMIT_<ACTION>=kadar,burst
+    action: _env_limit(f'RATE_LIMIT_{action.upper()}', (rate, burst)) + (kind,)
+    for action, (rate, burst, kind) in {
+        'check': (1.0, 10, 'uuid'),
+        'ack': (2.0, 20, 'uuid'),
+        'register': (0.2, 5, 'uuid'),
+        'admin_command': (5.0, 30, 'admin'),
+        'admin_bulk_command': (1.0, 5, 'admin'),
+        'verify_admin': (0.2, 10, 'ip'),
+        'admin_login': (0.2, 10, 'ip'),
+    }.items()
+}
+RATE_LIMIT_DEFAULT = _env_limit('RATE_LIMIT_DEFAULT', (2.0, 20)) + ('ip',)
+# register (satu-satunya action uuid yang mencipta baris baru) juga dicaj pada
+# bucket IP — uuid dipilih client, jadi menukar uuid setiap request tidak memintas
+# had. check/ack tidak: satu makmal di belakang NAT berkongsi satu IP, dan uuid
+# palsu hanya mendapat 'Session not found'.
+UUID_IP_LIMITS = {'register': _env_limit('RATE_LIMIT_REGISTER_IP', (2.0, 100))}
+PASSWORD_ACTIONS = ('verify_admin', 'admin_login')
+PASSWORD_GLOBAL_LIMIT = _env_limit('RATE_LIMIT_PASSWORD_GLOBAL', (5.0, 20))  # semua client digabung
+RATE_LIMIT_MAX_KEYS = 10000
+BUSY_RETRY_AFTER = 5  # saat - Retry-After bila hashing pool penuh
+RATE_LIMIT_STATS = {'allowed': 0, 'limited': 0, 'limited_by_action': {}}
+
+class TokenBuckets:
+    """Token bucket per kunci, LRU terhad (bucket yang dibuang bermula semula penuh)"""
+
+    def __init__(self, max_keys):
+        self._max_keys = max_keys
+        self._buckets = OrderedDict()  # kunci -> (token, masa monotonic)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Ambil satu token. Return 0 jika dibenarkan, atau saat sehingga token seterusnya."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+_rate_buckets = TokenBuckets(RATE_LIMIT_MAX_KEYS)
+_rate_stats_lock = threading.Lock()
+
+# Hanya alamat yang ditambah oleh proxy sendiri dipercayai — entri kiri dalam
+# X-Forwarded-For dihantar oleh client dan boleh dipalsukan. Cloudflare menulis
+# ganti CF-Connecting-IP; set TRUST_CF_CONNECTING_IP=0 jika server boleh dicapai
+# tanpa melalui Cloudflare.
+TRUST_CF_CONNECTING_IP = os.environ.get('TRUST_CF_CONNECTING_IP', '1') == '1'
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '1'))  # proxy yang menambah X-Forwarded-For
+
+def client_ip():
+    """IP client sebenar (di belakang proxy PythonAnywhere / Cloudflare)"""
+    if TRUST_CF_CONNECTING_IP and request.headers.get('CF-Connecting-IP'):
+        return request.headers['CF-Connecting-IP'].strip()
+    forwarded = [h.strip() for h in request.headers.get('X-Forwarded-For', '').split(',') if h.strip()]
+    if forwarded and TRUSTED_PROXY_HOPS > 0:
+        # Hop paling kanan yang ditambah oleh proxy dipercayai
+        return forwarded[-min(TRUSTED_PROXY_HOPS, len(forwarded))]
+    return request.remote_addr
+
+def check_rate_limit(action):
+    """Return 0 jika request dibenarkan, atau nilai Retry-After (saat) jika melebihi had"""
+    if not RATE_LIMIT_ENABLED:
+        return 0
+    rate, burst, kind = RATE_LIMITS.get(action, RATE_LIMIT_DEFAULT)
+    if kind == 'uuid':
+        key = request.values.get('uuid') or client_ip()
+    elif kind == 'admin' and session.get('admin_id'):
+        key = f"admin:{session['admin_id']}"
+    else:
+        key = client_ip()
+
+    wait = _rate_buckets.take((action, key), rate, burst)
+    if not wait and kind == 'uuid' and action in UUID_IP_LIMITS:
+        wait = _rate_buckets.take((action, f"ip:{client_ip()}"), *UUID_IP_LIMITS[action])
+    if not wait and action in PASSWORD_ACTIONS:
+        wait = _rate_buckets.take(('password', '*'), *PASSWORD_GLOBAL_LIMIT)
+
+    with _rate_stats_lock:
+        if wait:
+            RATE_LIMIT_STATS['limited'] += 1
+            by_action = RATE_LIMIT_STATS['limited_by_action']
+            by_action[action] = by_action.get(action, 0) + 1
+        else:
+            RATE_LIMIT_STATS['allowed'] += 1
+    return math.ceil(wait) if wait else 0
 
 # ==================== API ENDPOINTS ====================
 
@@ -116,6 +1710,13 @@ def api():
     """API endpoint - compatible dengan URL lama"""
     action = request.args.get('action', '')
 
+    retry_after = check_rate_limit(action)
+    if retry_after:
+        body = {'error': 'Terlalu banyak permintaan. Sila cuba sebentar lagi.', 'retry_after': retry_after}
+        if action == 'verify_admin':
+            body['verified'] = False
+        return jsonify(body), 429, {'Retry-After': str(retry_after)}
+
     if action == 'register':
         # Dipanggil oleh PCClient apabila bermula
         uuid = request.form.get('uuid') or request.args.get('uuid', '')
@@ -124,48 +1725,115 @@ def api():
         lab_name = request.form.get('lab_name') or request.args.get('lab_name', '')
 
         # Dapatkan IP address dari request
-        ip_address = request.headers.get('X-Forwarded-For', request.remote_addr)
-        if ip_address and ',' in ip_address:
-            ip_address = ip_address.split(',')[0].strip()
+        ip_address = client_ip()
 
         if not uuid:
             return jsonify({'error': 'UUID required'})
 
         try:
             conn = get_db()
-            # Hapus sesi lama
-            conn.execute("DELETE FROM sessions WHERE pc_hostname = ?", (pc_name,))
-            # Daftar sesi baru dengan IP, MAC dan Lab Name
-            conn.execute("INSERT INTO sessions (session_uuid, pc_hostname, ip_address, mac_address, lab_name, last_seen) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
-                        (uuid, pc_name, ip_address, mac_address, lab_name))
+            # Register semula sesi yang sama (retry/backoff client) — idempotent:
+            # hanya segarkan IP/MAC/last_seen, jangan reset status atau batalkan arahan
+            if conn.execute("""
+                UPDATE pcs SET ip_address = ?, mac_address = ?, last_seen = CURRENT_TIMESTAMP
+                WHERE session_uuid = ? AND lab_name = ? AND pc_hostname = ?
+            """, (ip_address, mac_address, uuid, lab_name, pc_name)).rowcount:
+                conn.commit()
+                presence.touch(uuid)
+                return jsonify({'status': 'registered', 'poll': lab_poll_settings(conn, lab_name),
+                                'max_wait': LONGPOLL_MAX_WAIT})
+            # Arahan yang belum dihantar dikunci ikut PC (makmal + hostname), bukan sesi:
+            # PC yang relock / restart / register semula di tengah rollout gelombang
+            # membawa arahannya ke sesi baru. Yang sudah 'delivered' dibiarkan — sesi
+            # lama tidak akan ack, jadi sweep_commands menandanya failed/expired.
+            # (sesi lama dicari melalui baris pcs → idx_commands_session, tanpa imbas sejarah)
+            conn.execute("""
+                UPDATE commands SET session_uuid = ?
+                WHERE state = 'queued' AND session_uuid IN (
+                    SELECT session_uuid FROM pcs WHERE lab_name = ? AND pc_hostname = ? AND session_uuid != ?)
+            """, (uuid, lab_name, pc_name, uuid))
+            # PC yang dipindah ke makmal lain — arahan makmal lama tidak lagi sah
+            conn.execute("""
+                UPDATE commands SET state = 'cancelled'
+                WHERE state = 'queued' AND session_uuid IN (
+                    SELECT session_uuid FROM pcs WHERE pc_hostname = ? AND lab_name != ?)
+            """, (pc_name, lab_name))
+            # PC yang dipindah ke makmal lain — buang dari makmal lama
+            conn.execute("DELETE FROM pcs WHERE pc_hostname = ? AND lab_name != ?", (pc_name, lab_name))
+            # Sesi baru menggantikan status semasa PC (log unlock_events tidak disentuh)
+            conn.execute("""
+                INSERT INTO pcs (lab_name, pc_hostname, session_uuid, ip_address, mac_address, registered_at, last_seen)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                ON CONFLICT (lab_name, pc_hostname) DO UPDATE SET
+                    session_uuid = excluded.session_uuid,
+                    status = 'LOCKED',
+                    nama_penuh = NULL,
+                    no_id = NULL,
+                    no_telefon = NULL,
+                    ip_address = excluded.ip_address,
+                    mac_address = excluded.mac_address,
+                    unlock_time = NULL,
+                    registered_at = excluded.registered_at,
+                    last_seen = excluded.last_seen
+            """, (lab_name, pc_name, uuid, ip_address, mac_address))
+            if lab_name:
+                conn.execute("INSERT OR IGNORE INTO labs (name) VALUES (?)", (lab_name,))
             conn.commit()
-            conn.close()
+            presence.touch(uuid)
+            notify_pc_change()
             print(f"[API] Registered: {lab_name}/{pc_name} ({uuid[:8]}...) IP={ip_address} MAC={mac_address}")
-            return jsonify({'status': 'registered'})
+            return jsonify({'status': 'registered', 'poll': lab_poll_settings(conn, lab_name),
+                            'max_wait': LONGPOLL_MAX_WAIT})
         except Exception as e:
             return jsonify({'error': str(e)})
 
     elif action == 'check':
         # Dipanggil oleh PCClient berulang kali (Polling)
+        # wait=<saat>: long-poll — tahan sehingga status berubah dari `status` atau ada command
+        # acks=1: client akan ack setiap arahan (action=ack); tanpa ack arahan dihantar semula
         uuid = request.args.get('uuid', '')
+        wait = min(max(request.args.get('wait', 0, type=float), 0), LONGPOLL_MAX_WAIT)
+        since_status = request.args.get('status', '')
+        acks = request.args.get('acks') == '1'
 
         conn = get_db()
-        row = conn.execute("SELECT status, pending_command FROM sessions WHERE session_uuid = ?",
-                          (uuid,)).fetchone()
-        if row:
-            pending_cmd = row['pending_command']
-            # Clear pending_command selepas baca (one-shot delivery)
-            conn.execute("UPDATE sessions SET last_seen = CURRENT_TIMESTAMP, pending_command = NULL WHERE session_uuid = ?", (uuid,))
-            conn.commit()
-        conn.close()
-
-        if row:
-            result = {'status': row['status']}
-            if pending_cmd:
-                result['command'] = pending_cmd
-            return jsonify(result)
+        state = poll_pc_state(conn, uuid, acks)
+        if state:
+            record_heartbeat(uuid)
+            if wait > 0 and 'command' not in state and state['status'] == (since_status or state['status']):
+                if _longpoll_slots.acquire(blocking=False):
+                    try:
+                        state = wait_pc_state(conn, uuid, state['status'], wait, acks)
+                    finally:
+                        _longpoll_slots.release()
+                    if state:
+                        record_heartbeat(uuid)
+
+        if state:
+            state['max_wait'] = LONGPOLL_MAX_WAIT
+            return jsonify(state)
         else:
-            return jsonify({'error': 'Session not found'})
+            # code: client register semula sesi secara automatik (server restart/DB dibuang)
+            return jsonify({'error': 'Session not found', 'code': 'session_not_found'})
+
+    elif action == 'ack':
+        # Dipanggil oleh PCClient selepas menerima arahan (command_id dari action=check)
+        if request.method != 'POST':
+            return jsonify({'error': 'POST required'}), 405
+
+        uuid = request.form.get('uuid', '')
+        command_id = request.form.get('id', type=int)
+        if not uuid or not command_id:
+            return jsonify({'error': 'uuid and id required'}), 400
+
+        conn = get_db()
+        if ack_command(conn, uuid, command_id):
+            return jsonify({'status': 'acked'})
+        row = conn.execute("SELECT state FROM commands WHERE id = ? AND session_uuid = ?",
+                           (command_id, uuid)).fetchone()
+        if not row:
+            return jsonify({'error': 'Command not found'}), 404
+        return jsonify({'status': row['state']})  # ack berulang / arahan sudah tamat
 
     elif action == 'verify_admin':
         # Dipanggil oleh PCClient untuk sahkan password admin
@@ -174,23 +1842,17 @@ def api():
 
         password = request.form.get('password', '')
         lab_name = request.form.get('lab_name', '')
+        username = request.form.get('username', '').strip()  # pilihan - terus ke satu akaun
 
         if not password:
             return jsonify({'verified': False, 'error': 'Password required'})
 
-        conn = get_db()
-        users = conn.execute("SELECT * FROM admin_users").fetchall()
-        conn.close()
-
-        for user in users:
-            if check_password_hash(user['password_hash'], password):
-                # Superadmin boleh akses semua makmal
-                if user['is_superadmin']:
-                    return jsonify({'verified': True, 'admin': user['username']})
-                # Admin biasa — semak akses makmal
-                assigned = [l.strip() for l in (user['assigned_labs'] or '').split(',') if l.strip()]
-                if lab_name in assigned:
-                    return jsonify({'verified': True, 'admin': user['username']})
+        try:
+            matched = verify_admin_password(get_db(), lab_name, password, username)
+        except HashPoolBusy:
+            return jsonify({'verified': False, 'error': 'Server busy'}), 429, {'Retry-After': str(BUSY_RETRY_AFTER)}
+        if matched:
+            return jsonify({'verified': True, 'admin': matched})
 
         return jsonify({'verified': False, 'error': 'Password tidak sah atau tiada akses makmal ini'})
 
@@ -211,16 +1873,14 @@ def api():
             return jsonify({'error': 'uuid and command required'})
 
         # Whitelist validation
-        allowed_commands = ('SHUTDOWN', 'RESTART', 'LOCK', 'UNLOCK')
-        if command not in allowed_commands:
-            return jsonify({'error': f'Invalid command. Allowed: {", ".join(allowed_commands)}'})
+        if command not in PC_COMMANDS:
+            return jsonify({'error': f'Invalid command. Allowed: {", ".join(PC_COMMANDS)}'})
 
         # Lab isolation check for non-superadmin
         admin_labs = get_admin_labs(admin)
         if admin_labs is not None:
             conn = get_db()
-            pc = conn.execute("SELECT lab_name FROM sessions WHERE session_uuid = ?", (uuid,)).fetchone()
-            conn.close()
+            pc = conn.execute("SELECT lab_name FROM pcs WHERE session_uuid = ?", (uuid,)).fetchone()
             if not pc:
                 return jsonify({'error': 'PC not found'}), 404
             if pc['lab_name'] not in admin_labs:
@@ -228,85 +1888,113 @@ def api():
 
         try:
             conn = get_db()
-            if command == 'UNLOCK':
-                conn.execute("UPDATE sessions SET pending_command = ?, status = 'UNLOCKED' WHERE session_uuid = ?",
-                            (command, uuid))
-            elif command == 'LOCK':
-                conn.execute("UPDATE sessions SET pending_command = ?, status = 'LOCKED' WHERE session_uuid = ?",
-                            (command, uuid))
-            else:  # SHUTDOWN / RESTART
-                conn.execute("UPDATE sessions SET pending_command = ? WHERE session_uuid = ?",
-                            (command, uuid))
+            if not queue_pc_command(conn, command, [uuid], admin['username']):
+                return jsonify({'error': 'PC not found'}), 404
             conn.commit()
-            conn.close()
+            notify_pc_change()
             print(f"[ADMIN CMD] {command} → {uuid[:8]}... by {admin['username']}")
             return jsonify({'status': 'ok', 'message': f'{command} sent'})
         except Exception as e:
             return jsonify({'error': str(e)})
 
-    else:
-        return jsonify({'error': 'Invalid action'})
-
-@app.route('/unlock.php', methods=['GET', 'POST'])
-@app.route('/lab-system/unlock.php', methods=['GET', 'POST'])
-def unlock():
-    """Unlock page - dengan borang pendaftaran pengguna"""
-    import re
-    uuid = request.args.get('uuid', '')
-    message = ''
-    error = ''
+    elif action == 'admin_bulk_command':
+        # Arahan pukal: seluruh makmal (lab), senarai PC (uuid berulang) dan/atau tapisan status
+        if request.method != 'POST':
+            return jsonify({'error': 'POST required'}), 405
 
-    if not uuid:
-        return "Invalid Link (No UUID)", 400
+        # Auth check — sekali untuk semua PC
+        admin = get_current_admin()
+        if not admin:
+            return jsonify({'error': 'Sila log masuk terlebih dahulu'}), 401
 
-    conn = get_db()
+        command = request.form.get('command', '').upper()
+        lab_name = request.form.get('lab', '')
+        uuids = [u for u in request.form.getlist('uuid') if u]
+        status_filter = request.form.get('status', '').upper()
+
+        if command not in PC_COMMANDS:
+            return jsonify({'error': f'Invalid command. Allowed: {", ".join(PC_COMMANDS)}'})
+        if not lab_name and not uuids:
+            return jsonify({'error': 'lab or uuid required'}), 400
+        if len(uuids) > BULK_MAX_TARGETS:
+            return jsonify({'error': f'Maksimum {BULK_MAX_TARGETS} PC setiap arahan'}), 400
+        if status_filter and status_filter not in ('LOCKED', 'UNLOCKED'):
+            return jsonify({'error': 'status must be LOCKED or UNLOCKED'}), 400
+
+        # Pilihan gelombang: wave_size PC setiap wave_interval saat, jitter 0..N saat
+        wave_size = request.form.get('wave_size', 0, type=int)
+        wave_interval = request.form.get('wave_interval', 30, type=int)
+        jitter = request.form.get('jitter', 0, type=int)
+        if wave_size:
+            if command not in WAVE_COMMANDS:
+                return jsonify({'error': f'Gelombang hanya untuk {"/".join(WAVE_COMMANDS)}'}), 400
+            if wave_size < 0 or not 1 <= wave_interval <= WAVE_MAX_INTERVAL or not 0 <= jitter <= wave_interval:
+                return jsonify({'error': f'wave_interval 1-{WAVE_MAX_INTERVAL}s, jitter 0-wave_interval'}), 400
 
-    # Handle POST request (Unlock action)
-    if request.method == 'POST':
-        nama_penuh = request.form.get('nama_penuh', '').strip()
-        no_id = request.form.get('no_id', '').strip().upper()
-        no_telefon = request.form.get('no_telefon', '').strip()
+        admin_labs = get_admin_labs(admin)
+        if lab_name and admin_labs is not None and lab_name not in admin_labs:
+            return jsonify({'error': 'Akses ditolak - bukan makmal anda'}), 403
+
+        query = "SELECT session_uuid, lab_name, pc_hostname FROM pcs WHERE 1"
+        params = []
+        if lab_name:
+            query += " AND lab_name = ?"
+            params.append(lab_name)
+        if uuids:
+            query += f" AND session_uuid IN ({','.join(['?' for _ in uuids])})"
+            params.extend(uuids)
+        if status_filter:
+            query += " AND status = ?"
+            params.append(status_filter)
 
-        # Validation
-        if not nama_penuh or not no_id or not no_telefon:
-            error = "Sila isi semua maklumat."
-        elif len(nama_penuh) < 3:
-            error = "Nama penuh tidak sah."
-        elif not re.match(r'^[A-Z]{2}\d{6}$', no_id) and not re.match(r'^\d{5}$', no_id):
-            error = "Format No. ID tidak sah. Pelajar: AB123456, Staf: 01234"
-        elif not re.match(r'^01\d{8,9}$', no_telefon):
-            error = "Format No. Telefon tidak sah. Contoh: 0123456789"
-        else:
-            # Valid - update and unlock
-            conn.execute("""
-                UPDATE sessions
-                SET status = 'UNLOCKED',
-                    nama_penuh = ?,
-                    no_id = ?,
-                    no_telefon = ?,
-                    unlock_time = CURRENT_TIMESTAMP
-                WHERE session_uuid = ?
-            """, (nama_penuh, no_id, no_telefon, uuid))
+        try:
+            conn = get_db()
+            results = []
+            targets = []
+            for pc in conn.execute(query + " ORDER BY lab_name, pc_hostname", params).fetchall():
+                result = {'uuid': pc['session_uuid'], 'pc_name': pc['pc_hostname'], 'lab_name': pc['lab_name']}
+                if admin_labs is not None and pc['lab_name'] not in admin_labs:
+                    result['result'] = 'forbidden'
+                else:
+                    result['result'] = 'ok'
+                    targets.append(pc['session_uuid'])
+                results.append(result)
+            # uuid yang diminta tetapi tiada/tidak padan tapisan
+            matched = {r['uuid'] for r in results}
+            results.extend({'uuid': u, 'result': 'not_found'} for u in dict.fromkeys(uuids) if u not in matched)
+
+            # Satu transaksi untuk semua PC (gelombang: baki ditahan dalam baris gilir sehingga giliran)
+            batch_id, delays, waves = None, None, 1
+            if wave_size and len(targets) > wave_size:
+                waves = (len(targets) + wave_size - 1) // wave_size
+                batch_id = conn.execute("""
+                    INSERT INTO command_batches (lab_name, command, total, wave_size, wave_interval, jitter, created_by)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (lab_name or None, command, len(targets), wave_size, wave_interval, jitter,
+                      admin['username'])).lastrowid
+                delays = [(i // wave_size) * wave_interval + random.uniform(0, jitter) for i in range(len(targets))]
+            queue_pc_command(conn, command, targets, admin['username'], delays, batch_id)
             conn.commit()
-            message = "PC Berjaya Dibuka! Anda boleh menutup browser ini."
-            print(f"[UNLOCK] {nama_penuh} ({no_id}) - {uuid[:8]}...")
-
-    # Fetch info — renamed to pc_row to avoid shadowing Flask session
-    pc_row = conn.execute("SELECT pc_hostname, status, nama_penuh FROM sessions WHERE session_uuid = ?",
-                          (uuid,)).fetchone()
-    conn.close()
+            if targets:
+                notify_pc_change()
+            print(f"[ADMIN CMD] {command} → {len(targets)} PC (lab={lab_name or '-'}, status={status_filter or '-'}, waves={waves}) by {admin['username']}")
+            return jsonify({'status': 'ok', 'command': command, 'applied': len(targets), 'results': results,
+                            'batch_id': batch_id, 'waves': waves})
+        except Exception as e:
+            return jsonify({'error': str(e)})
 
-    if not pc_row:
-        return "Sesi tidak ditemui atau tamat tempoh.", 404
+    else:
+        return jsonify({'error': 'Invalid action'})
 
-    # HTML Template
-    html = '''
+# Halaman unlock (imbasan QR dari telefon) — dikompil sekali semasa import
+UNLOCK_HTML = '''
     <!DOCTYPE html>
     <html lang="ms">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Unlock Lab PC</title>
+        <link rel="icon" type="image/png" href="{{ logo_url(32) }}">
         <style>
             * { box-sizing: border-box; }
             body { font-family: 'Segoe UI', sans-serif; background: linear-gradient(135deg, #1a3a6e 0%, #2d5a9e 100%); display: flex; justify-content: center; align-items: center; min-height: 100vh; margin: 0; padding: 10px; }
@@ -330,7 +2018,10 @@ def unlock():
     </head>
     <body>
         <div class="card">
-            <img src="/static/logo.png" alt="LabSentinel" style="width: 120px; height: 120px; margin-bottom: 10px;">
+            <picture>
+                {% if logo_url(120, 'webp') %}<source type="image/webp" srcset="{{ logo_url(120, 'webp') }} 1x, {{ logo_url(240, 'webp') }} 2x">{% endif %}
+                <img src="{{ logo_url(120) }}" srcset="{{ logo_url(120) }} 1x, {{ logo_url(240) }} 2x" alt="LabSentinel" style="width: 120px; height: 120px; margin-bottom: 10px;">
+            </picture>
             <h1>Sistem Lab Sentinel</h1>
             <p class="subtitle">Sila isi maklumat untuk menggunakan komputer</p>
 
@@ -375,12 +2066,74 @@ def unlock():
     </body>
     </html>
     '''
+UNLOCK_TEMPLATE = app.jinja_env.from_string(UNLOCK_HTML)
 
-    return render_template_string(html, message=message, error=error, pc=dict(pc_row))
+@app.route('/unlock.php', methods=['GET', 'POST'])
+@app.route('/lab-system/unlock.php', methods=['GET', 'POST'])
+def unlock():
+    """Unlock page - dengan borang pendaftaran pengguna"""
+    import re
+    uuid = request.args.get('uuid', '')
+    message = ''
+    error = ''
 
-@app.route('/test.php')
-@app.route('/test')
-@app.route('/lab-system/test.php')
+    if not uuid:
+        return "Invalid Link (No UUID)", 400
+
+    conn = get_db()
+
+    # Handle POST request (Unlock action)
+    if request.method == 'POST':
+        nama_penuh = request.form.get('nama_penuh', '').strip()
+        no_id = request.form.get('no_id', '').strip().upper()
+        no_telefon = request.form.get('no_telefon', '').strip()
+
+        # Validation
+        if not nama_penuh or not no_id or not no_telefon:
+            error = "Sila isi semua maklumat."
+        elif len(nama_penuh) < 3:
+            error = "Nama penuh tidak sah."
+        elif not re.match(r'^[A-Z]{2}\d{6}$', no_id) and not re.match(r'^\d{5}$', no_id):
+            error = "Format No. ID tidak sah. Pelajar: AB123456, Staf: 01234"
+        elif not re.match(r'^01\d{8,9}$', no_telefon):
+            error = "Format No. Telefon tidak sah. Contoh: 0123456789"
+        else:
+            # Valid - update and unlock
+            cur = conn.execute("""
+                UPDATE pcs
+                SET status = 'UNLOCKED',
+                    nama_penuh = ?,
+                    no_id = ?,
+                    no_telefon = ?,
+                    unlock_time = CURRENT_TIMESTAMP
+                WHERE session_uuid = ?
+            """, (nama_penuh, no_id, no_telefon, uuid))
+            if cur.rowcount:
+                # Rekod ke log (append-only) dalam transaksi yang sama
+                conn.execute("""
+                    INSERT INTO unlock_events (session_uuid, lab_name, pc_hostname, nama_penuh, no_id, no_telefon,
+                                               ip_address, mac_address, unlock_time, created_at)
+                    SELECT session_uuid, lab_name, pc_hostname, nama_penuh, no_id, no_telefon,
+                           ip_address, mac_address, unlock_time, registered_at
+                    FROM pcs WHERE session_uuid = ?
+                """, (uuid,))
+            conn.commit()
+            notify_pc_change()
+            message = "PC Berjaya Dibuka! Anda boleh menutup browser ini."
+            print(f"[UNLOCK] {nama_penuh} ({no_id}) - {uuid[:8]}...")
+
+    # Fetch info — renamed to pc_row to avoid shadowing Flask session
+    pc_row = conn.execute("SELECT pc_hostname, status, nama_penuh FROM pcs WHERE session_uuid = ?",
+                          (uuid,)).fetchone()
+
+    if not pc_row:
+        return "Sesi tidak ditemui atau tamat tempoh.", 404
+
+    return render_page(UNLOCK_TEMPLATE, message=message, error=error, pc=dict(pc_row))
+
+@app.route('/test.php')
+@app.route('/test')
+@app.route('/lab-system/test.php')
 @app.route('/lab-system/test')
 def test():
     """Test endpoint"""
@@ -392,44 +2145,15 @@ def test():
 
 # ==================== AUTH ROUTES ====================
 
-@app.route('/admin/login', methods=['GET', 'POST'])
-@app.route('/lab-system/admin/login', methods=['GET', 'POST'])
-def admin_login():
-    """Login page untuk admin"""
-    error = ''
-
-    # Jika sudah login, redirect ke dashboard
-    if get_current_admin():
-        return redirect('/admin')
-
-    if request.method == 'POST':
-        username = request.form.get('username', '').strip()
-        password = request.form.get('password', '')
-
-        if not username or not password:
-            error = 'Sila isi username dan password.'
-        else:
-            conn = get_db()
-            user = conn.execute("SELECT * FROM admin_users WHERE username = ?", (username,)).fetchone()
-            conn.close()
-
-            if user and check_password_hash(user['password_hash'], password):
-                session['admin_id'] = user['id']
-                session['admin_username'] = user['username']
-                session['is_superadmin'] = bool(user['is_superadmin'])
-                session['assigned_labs'] = user['assigned_labs'] or ''
-                print(f"[AUTH] Login: {username}")
-                return redirect('/admin')
-            else:
-                error = 'Username atau password tidak sah.'
-
-    html = '''
+# Halaman login admin — dikompil sekali semasa import
+ADMIN_LOGIN_HTML = '''
     <!DOCTYPE html>
     <html lang="ms">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Admin Login - LabSentinel</title>
+        <link rel="icon" type="image/png" href="{{ logo_url(32) }}">
         <style>
             * { box-sizing: border-box; }
             body { font-family: 'Segoe UI', sans-serif; background: linear-gradient(135deg, #1a3a6e 0%, #2d5a9e 100%); display: flex; justify-content: center; align-items: center; min-height: 100vh; margin: 0; padding: 10px; }
@@ -448,7 +2172,10 @@ def admin_login():
     </head>
     <body>
         <div class="card">
-            <img src="/static/logo.png" alt="LabSentinel" style="width: 120px; height: 120px; margin-bottom: 10px;">
+            <picture>
+                {% if logo_url(120, 'webp') %}<source type="image/webp" srcset="{{ logo_url(120, 'webp') }} 1x, {{ logo_url(240, 'webp') }} 2x">{% endif %}
+                <img src="{{ logo_url(120) }}" srcset="{{ logo_url(120) }} 1x, {{ logo_url(240) }} 2x" alt="LabSentinel" style="width: 120px; height: 120px; margin-bottom: 10px;">
+            </picture>
             <h1>LabSentinel Admin</h1>
             <p class="subtitle">Sila log masuk untuk akses dashboard</p>
             {% if error %}
@@ -470,7 +2197,50 @@ def admin_login():
     </body>
     </html>
     '''
-    return render_template_string(html, error=error)
+ADMIN_LOGIN_TEMPLATE = app.jinja_env.from_string(ADMIN_LOGIN_HTML)
+
+@app.route('/admin/login', methods=['GET', 'POST'])
+@app.route('/lab-system/admin/login', methods=['GET', 'POST'])
+def admin_login():
+    """Login page untuk admin"""
+    error = ''
+    status = 200
+
+    # Jika sudah login, redirect ke dashboard
+    if get_current_admin():
+        return redirect('/admin')
+
+    if request.method == 'POST':
+        username = request.form.get('username', '').strip()
+        password = request.form.get('password', '')
+
+        retry_after = check_rate_limit('admin_login')
+        if retry_after:
+            error = f'Terlalu banyak cubaan log masuk. Sila cuba lagi dalam {retry_after} saat.'
+            return render_page(ADMIN_LOGIN_TEMPLATE, error=error), 429, {'Retry-After': str(retry_after)}
+        if not username or not password:
+            error = 'Sila isi username dan password.'
+        else:
+            conn = get_db()
+            user = conn.execute("SELECT * FROM admin_users WHERE username = ?", (username,)).fetchone()
+
+            try:
+                valid = user is not None and check_password(user['password_hash'], password)
+            except HashPoolBusy:
+                valid = False
+                status = 429
+            if valid:
+                session['admin_id'] = user['id']
+                session['admin_username'] = user['username']
+                session['is_superadmin'] = bool(user['is_superadmin'])
+                print(f"[AUTH] Login: {username}")
+                return redirect('/admin')
+            elif status == 429:
+                error = 'Server sibuk. Sila cuba sebentar lagi.'
+            else:
+                error = 'Username atau password tidak sah.'
+
+    return render_page(ADMIN_LOGIN_TEMPLATE, error=error), status
 
 @app.route('/admin/logout')
 @app.route('/lab-system/admin/logout')
@@ -483,121 +2253,15 @@ def admin_logout():
 
 # ==================== ADMIN DASHBOARD ====================
 
-@app.route('/admin')
-@app.route('/lab-system/admin')
-def admin():
-    """Admin page - dashboard PC mengikut makmal + log pengguna"""
-    # Auth check
-    admin_user = get_current_admin()
-    if not admin_user:
-        return redirect('/admin/login')
-
-    admin_labs = get_admin_labs(admin_user)
-
-    selected_lab = request.args.get('lab', '')
-    view = request.args.get('view', 'dashboard')
-
-    conn = get_db()
-
-    # Dapatkan senarai makmal unik untuk dropdown
-    labs = conn.execute("""
-        SELECT DISTINCT lab_name FROM sessions
-        WHERE lab_name IS NOT NULL AND lab_name != ''
-        ORDER BY lab_name
-    """).fetchall()
-    lab_list = [r['lab_name'] for r in labs]
-
-    # Filter lab list for non-superadmin
-    if admin_labs is not None:
-        lab_list = [l for l in lab_list if l in admin_labs]
-
-    # Dapatkan status terkini setiap PC (sesi paling baru per PC per makmal)
-    pc_status = conn.execute("""
-        SELECT s.session_uuid, s.pc_hostname, s.lab_name, s.status, s.nama_penuh, s.no_id, s.no_telefon,
-               s.ip_address, s.mac_address, s.unlock_time, s.created_at, s.last_seen
-        FROM sessions s
-        INNER JOIN (
-            SELECT pc_hostname, lab_name, MAX(id) as max_id
-            FROM sessions
-            WHERE lab_name IS NOT NULL AND lab_name != ''
-            GROUP BY pc_hostname, lab_name
-        ) latest ON s.id = latest.max_id
-        ORDER BY s.lab_name, s.pc_hostname
-    """).fetchall()
-
-    # Kira is_online untuk setiap PC (last_seen < 2 minit lalu = online)
-    now = datetime.utcnow()
-    online_threshold = timedelta(minutes=2)
-    pc_list = []
-    for pc in pc_status:
-        pc_dict = dict(pc)
-        if pc_dict.get('last_seen'):
-            try:
-                last_seen_dt = datetime.strptime(pc_dict['last_seen'], '%Y-%m-%d %H:%M:%S')
-                pc_dict['is_online'] = (now - last_seen_dt) < online_threshold
-            except (ValueError, TypeError):
-                pc_dict['is_online'] = False
-        else:
-            pc_dict['is_online'] = False
-        pc_list.append(pc_dict)
-
-    # Susun data mengikut makmal
-    lab_pcs = {}
-    for pc in pc_list:
-        lab = pc['lab_name']
-        if lab not in lab_pcs:
-            lab_pcs[lab] = []
-        lab_pcs[lab].append(pc)
-
-    # Filter lab_pcs for non-superadmin
-    if admin_labs is not None:
-        lab_pcs = {k: v for k, v in lab_pcs.items() if k in admin_labs}
-
-    # Validate selected_lab access
-    if selected_lab and admin_labs is not None and selected_lab not in admin_labs:
-        selected_lab = ''
-
-    # Query log rekod dengan filter
-    if selected_lab:
-        records = conn.execute("""
-            SELECT id, pc_hostname, lab_name, nama_penuh, no_id, no_telefon, ip_address, mac_address, status, unlock_time, created_at
-            FROM sessions
-            WHERE nama_penuh IS NOT NULL AND lab_name = ?
-            ORDER BY id DESC
-            LIMIT 100
-        """, (selected_lab,)).fetchall()
-    elif admin_labs is not None and admin_labs:
-        # Non-superadmin: only show assigned labs
-        placeholders = ','.join(['?' for _ in admin_labs])
-        records = conn.execute(f"""
-            SELECT id, pc_hostname, lab_name, nama_penuh, no_id, no_telefon, ip_address, mac_address, status, unlock_time, created_at
-            FROM sessions
-            WHERE nama_penuh IS NOT NULL AND lab_name IN ({placeholders})
-            ORDER BY id DESC
-            LIMIT 100
-        """, admin_labs).fetchall()
-    elif admin_labs is not None:
-        # Non-superadmin with no labs assigned
-        records = []
-    else:
-        # Superadmin: show all
-        records = conn.execute("""
-            SELECT id, pc_hostname, lab_name, nama_penuh, no_id, no_telefon, ip_address, mac_address, status, unlock_time, created_at
-            FROM sessions
-            WHERE nama_penuh IS NOT NULL
-            ORDER BY id DESC
-            LIMIT 100
-        """).fetchall()
-    conn.close()
-
-    html = '''
+# Dashboard admin + Log Pengguna — dikompil sekali semasa import
+ADMIN_HTML = '''
     <!DOCTYPE html>
     <html lang="ms">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <meta http-equiv="refresh" content="60">
         <title>Admin - LabSentinel Dashboard</title>
+        <link rel="icon" type="image/png" href="{{ logo_url(32) }}">
         <style>
             * { box-sizing: border-box; }
             body { font-family: 'Segoe UI', sans-serif; background: #f5f5f5; margin: 0; padding: 20px; }
@@ -630,6 +2294,8 @@ def admin():
             .filter-group { background: white; padding: 10px 16px; border-radius: 10px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); display: flex; align-items: center; gap: 8px; }
             .filter-group label { font-weight: 600; color: #333; font-size: 0.85rem; }
             .filter-group select { padding: 6px 10px; border: 2px solid #ddd; border-radius: 5px; font-size: 0.85rem; cursor: pointer; }
+            .filter-group input[type=date] { padding: 5px 8px; border: 2px solid #ddd; border-radius: 5px; font-size: 0.85rem; }
+            .pager { display: flex; justify-content: center; gap: 10px; margin: 20px 0; }
             .btn { color: white; padding: 8px 16px; border: none; border-radius: 5px; cursor: pointer; font-size: 0.85rem; text-decoration: none; display: inline-block; }
             .btn-green { background: #27ae60; }
             .btn-green:hover { background: #219a52; }
@@ -667,6 +2333,12 @@ def admin():
             .status-unlocked { color: #27ae60; font-weight: bold; }
             .status-locked { color: #e74c3c; font-weight: bold; }
             .lab-badge { background: #e8f4f8; color: #1a3a6e; padding: 2px 6px; border-radius: 4px; font-size: 0.75rem; font-weight: 600; }
+            .cmd-state-queued, .cmd-state-delivered { color: #eab308; font-weight: bold; }
+            .cmd-state-acked { color: #27ae60; font-weight: bold; }
+            .cmd-state-failed, .cmd-state-expired { color: #e74c3c; font-weight: bold; }
+            .cmd-state-cancelled { color: #9ca3af; font-weight: bold; }
+            .progress { display: inline-block; width: 80px; height: 8px; background: #eee; border-radius: 4px; overflow: hidden; vertical-align: middle; margin-right: 6px; }
+            .progress-bar { height: 100%; background: #27ae60; }
 
             /* Command Buttons */
             .cmd-btns { margin-top: 8px; display: flex; gap: 4px; justify-content: center; flex-wrap: wrap; }
@@ -676,6 +2348,9 @@ def admin():
             .cmd-btn.unlock { background: #22c55e; color: #fff; }
             .cmd-btn.restart { background: #f59e0b; color: #fff; }
             .cmd-btn.shutdown { background: #ef4444; color: #fff; }
+            .lab-bulk { display: flex; gap: 8px; align-items: center; flex-wrap: wrap; padding: 10px 25px; background: #f8f9fa; border-bottom: 1px solid #eee; font-size: 0.85rem; }
+            .lab-bulk select { padding: 5px 8px; border: 2px solid #ddd; border-radius: 5px; font-size: 0.85rem; }
+            .pc-select { vertical-align: middle; cursor: pointer; }
 
             /* Toast Notification */
             .toast { position: fixed; top: 20px; right: 20px; padding: 14px 24px; border-radius: 8px; color: white; font-weight: 600; font-size: 0.9rem; z-index: 9999; opacity: 0; transition: opacity 0.3s; pointer-events: none; }
@@ -701,11 +2376,9 @@ def admin():
                         <span class="badge-super">Superadmin</span>
                     {% else %}
                         <span class="badge-admin">Pentadbir Makmal</span>
-                        {% if admin_user.assigned_labs %}
-                            {% for lab in admin_user.assigned_labs.split(',') %}
-                                <span class="badge-lab">{{ lab.strip() }}</span>
-                            {% endfor %}
-                        {% endif %}
+                        {% for lab in admin_user.labs %}
+                            <span class="badge-lab">{{ lab }}</span>
+                        {% endfor %}
                     {% endif %}
                 </span>
                 <div class="bar-actions">
@@ -717,7 +2390,10 @@ def admin():
             </div>
 
             <div style="display: flex; align-items: center; gap: 12px;">
-                <img src="/static/logo.png" alt="LabSentinel" style="width: 60px; height: 60px;">
+                <picture>
+                    {% if logo_url(60, 'webp') %}<source type="image/webp" srcset="{{ logo_url(60, 'webp') }} 1x, {{ logo_url(120, 'webp') }} 2x">{% endif %}
+                    <img src="{{ logo_url(60) }}" srcset="{{ logo_url(60) }} 1x, {{ logo_url(120) }} 2x" alt="LabSentinel" style="width: 60px; height: 60px;">
+                </picture>
                 <div>
                     <h1 style="margin: 0;">LabSentinel Admin</h1>
                     {% if admin_user.is_superadmin %}
@@ -732,6 +2408,8 @@ def admin():
             <div class="tabs">
                 <a href="/admin?view=dashboard" class="tab {{ 'active' if view == 'dashboard' else '' }}">Dashboard PC</a>
                 <a href="/admin?view=log" class="tab {{ 'active' if view == 'log' else '' }}">Log Pengguna</a>
+                <a href="/admin?view=commands" class="tab {{ 'active' if view == 'commands' else '' }}">Arahan</a>
+                <a href="/admin/schedule" class="tab">Jadual</a>
             </div>
 
             {% if view == 'dashboard' %}
@@ -757,19 +2435,19 @@ def admin():
                 </div>
                 <div class="stat-card">
                     <h3>Jumlah PC</h3>
-                    <div class="number">{{ total_pcs }}</div>
+                    <div class="number" id="stat-total">{{ total_pcs }}</div>
                 </div>
                 <div class="stat-card">
                     <h3>Online</h3>
-                    <div class="number" style="color: #27ae60;">{{ online_pcs|length }}</div>
+                    <div class="number" id="stat-online" style="color: #27ae60;">{{ online_pcs|length }}</div>
                 </div>
                 <div class="stat-card">
                     <h3>Offline</h3>
-                    <div class="number" style="color: #9ca3af;">{{ total_pcs - online_pcs|length }}</div>
+                    <div class="number" id="stat-offline" style="color: #9ca3af;">{{ total_pcs - online_pcs|length }}</div>
                 </div>
                 <div class="stat-card">
                     <h3>Sedang Digunakan</h3>
-                    <div class="number" style="color: #eab308;">{{ unlocked_pcs|length }}</div>
+                    <div class="number" id="stat-active" style="color: #eab308;">{{ unlocked_pcs|length }}</div>
                 </div>
                 <a href="/admin?view=dashboard" class="btn btn-blue">Refresh</a>
             </div>
@@ -779,26 +2457,48 @@ def admin():
                 {% set lab_online = pcs|selectattr('is_online')|list|length %}
                 {% set lab_aktif = pcs|selectattr('is_online')|selectattr('status', 'equalto', 'UNLOCKED')|list|length %}
                 {% set lab_offline = pcs|length - lab_online %}
-                <div class="lab-section">
+                <div class="lab-section" data-lab="{{ lab_name }}">
                     <div class="lab-header">
                         <h2>{{ lab_name }}</h2>
                         <div class="lab-stats">
-                            <span>{{ lab_online }} Online</span>
-                            <span>{{ lab_aktif }} Aktif</span>
-                            <span>{{ lab_offline }} Offline</span>
+                            <span class="lab-online">{{ lab_online }} Online</span>
+                            <span class="lab-aktif">{{ lab_aktif }} Aktif</span>
+                            <span class="lab-offline">{{ lab_offline }} Offline</span>
                         </div>
                     </div>
+                    <div class="lab-bulk">
+                        <label><input type="checkbox" onchange="selectAllPcs(this)"> Pilih Semua</label>
+                        <select class="bulk-cmd">
+                            <option value="LOCK">Lock</option>
+                            <option value="UNLOCK">Unlock</option>
+                            <option value="RESTART">Restart</option>
+                            <option value="SHUTDOWN">Shutdown</option>
+                        </select>
+                        <select class="bulk-target">
+                            <option value="selected">PC dipilih</option>
+                            <option value="all">Semua PC makmal</option>
+                            <option value="UNLOCKED">Semua UNLOCKED</option>
+                            <option value="LOCKED">Semua LOCKED</option>
+                        </select>
+                        <select class="bulk-wave" title="Gelombang - RESTART/SHUTDOWN sahaja">
+                            <option value="">Serentak</option>
+                            <option value="5:30">5 PC / 30s</option>
+                            <option value="10:30">10 PC / 30s</option>
+                            <option value="10:60">10 PC / 60s</option>
+                        </select>
+                        <button class="btn btn-blue" onclick="bulkCommand(this)">Laksana</button>
+                    </div>
                     <div class="pc-grid">
                         {% for pc in pcs %}
                         {% if not pc.is_online %}
-                        <div class="pc-card offline">
-                            <div class="pc-name">{{ pc.pc_hostname }}</div>
+                        <div class="pc-card offline" data-pc="{{ pc.lab_name }}|{{ pc.pc_hostname }}">
+                            <div class="pc-name"><input type="checkbox" class="pc-select" value="{{ pc.session_uuid }}"> {{ pc.pc_hostname }}</div>
                             <div class="pc-status offline">OFFLINE</div>
                             <div class="pc-user" style="color: #aaa;">-</div>
                         </div>
                         {% elif pc.status == 'UNLOCKED' %}
-                        <div class="pc-card online-unlocked">
-                            <div class="pc-name">{{ pc.pc_hostname }}</div>
+                        <div class="pc-card online-unlocked" data-pc="{{ pc.lab_name }}|{{ pc.pc_hostname }}">
+                            <div class="pc-name"><input type="checkbox" class="pc-select" value="{{ pc.session_uuid }}"> {{ pc.pc_hostname }}</div>
                             <div class="pc-status online-unlocked">ONLINE · UNLOCKED</div>
                             {% if pc.nama_penuh %}
                             <div class="pc-user">{{ pc.nama_penuh }}</div>
@@ -808,20 +2508,20 @@ def admin():
                             <div class="pc-time">{{ pc.unlock_time }}</div>
                             {% endif %}
                             <div class="cmd-btns">
-                                <button class="cmd-btn lock" onclick="sendCommand('{{ pc.session_uuid }}', 'LOCK', '{{ pc.pc_hostname }}')">Lock</button>
-                                <button class="cmd-btn restart" onclick="sendCommand('{{ pc.session_uuid }}', 'RESTART', '{{ pc.pc_hostname }}')">Restart</button>
-                                <button class="cmd-btn shutdown" onclick="sendCommand('{{ pc.session_uuid }}', 'SHUTDOWN', '{{ pc.pc_hostname }}')">Shutdown</button>
+                                <button class="cmd-btn lock" data-uuid="{{ pc.session_uuid }}" data-pc-name="{{ pc.pc_hostname }}" data-cmd="LOCK" onclick="cmdClick(this)">Lock</button>
+                                <button class="cmd-btn restart" data-uuid="{{ pc.session_uuid }}" data-pc-name="{{ pc.pc_hostname }}" data-cmd="RESTART" onclick="cmdClick(this)">Restart</button>
+                                <button class="cmd-btn shutdown" data-uuid="{{ pc.session_uuid }}" data-pc-name="{{ pc.pc_hostname }}" data-cmd="SHUTDOWN" onclick="cmdClick(this)">Shutdown</button>
                             </div>
                         </div>
                         {% else %}
-                        <div class="pc-card online-locked">
-                            <div class="pc-name">{{ pc.pc_hostname }}</div>
+                        <div class="pc-card online-locked" data-pc="{{ pc.lab_name }}|{{ pc.pc_hostname }}">
+                            <div class="pc-name"><input type="checkbox" class="pc-select" value="{{ pc.session_uuid }}"> {{ pc.pc_hostname }}</div>
                             <div class="pc-status online-locked">ONLINE · LOCKED</div>
                             <div class="pc-user" style="color: #aaa;">Menunggu pengguna</div>
                             <div class="cmd-btns">
-                                <button class="cmd-btn unlock" onclick="sendCommand('{{ pc.session_uuid }}', 'UNLOCK', '{{ pc.pc_hostname }}')">Unlock</button>
-                                <button class="cmd-btn restart" onclick="sendCommand('{{ pc.session_uuid }}', 'RESTART', '{{ pc.pc_hostname }}')">Restart</button>
-                                <button class="cmd-btn shutdown" onclick="sendCommand('{{ pc.session_uuid }}', 'SHUTDOWN', '{{ pc.pc_hostname }}')">Shutdown</button>
+                                <button class="cmd-btn unlock" data-uuid="{{ pc.session_uuid }}" data-pc-name="{{ pc.pc_hostname }}" data-cmd="UNLOCK" onclick="cmdClick(this)">Unlock</button>
+                                <button class="cmd-btn restart" data-uuid="{{ pc.session_uuid }}" data-pc-name="{{ pc.pc_hostname }}" data-cmd="RESTART" onclick="cmdClick(this)">Restart</button>
+                                <button class="cmd-btn shutdown" data-uuid="{{ pc.session_uuid }}" data-pc-name="{{ pc.pc_hostname }}" data-cmd="SHUTDOWN" onclick="cmdClick(this)">Shutdown</button>
                             </div>
                         </div>
                         {% endif %}
@@ -831,7 +2531,7 @@ def admin():
                 {% endfor %}
             {% else %}
                 <div style="background: white; padding: 40px; border-radius: 12px; text-align: center; color: #888;">
-                    {% if not admin_user.is_superadmin and not admin_user.assigned_labs %}
+                    {% if not admin_user.is_superadmin and not admin_user.labs %}
                     <p style="font-size: 1.2rem;">Tiada makmal ditugaskan kepada anda. Sila hubungi Superadmin untuk tetapkan makmal seliaan.</p>
                     {% else %}
                     <p style="font-size: 1.2rem;">Tiada data makmal. Jalankan client pada PC makmal untuk mula merekod.</p>
@@ -839,27 +2539,150 @@ def admin():
                 </div>
             {% endif %}
 
+            {% elif view == 'commands' %}
+            <!-- ==================== COMMANDS VIEW ==================== -->
+
+            <div class="toolbar">
+                <div class="stat-card">
+                    <h3>Arahan Terkini</h3>
+                    <div class="number">{{ commands|length }}</div>
+                </div>
+                <div class="stat-card">
+                    <h3>Belum Selesai</h3>
+                    <div class="number" style="color: #eab308;">{{ command_stats.pending }}</div>
+                </div>
+                <div class="stat-card">
+                    <h3>Gagal / Tamat</h3>
+                    <div class="number" style="color: #e74c3c;">{{ command_stats.unacked }}</div>
+                </div>
+                <div class="stat-card">
+                    <h3>Purata Hantar</h3>
+                    <div class="number">{{ '%.1fs'|format(command_stats.avg_delivery) if command_stats.avg_delivery is not none else '-' }}</div>
+                </div>
+                <div class="stat-card">
+                    <h3>Maks Hantar</h3>
+                    <div class="number">{{ '%.1fs'|format(command_stats.max_delivery) if command_stats.max_delivery is not none else '-' }}</div>
+                </div>
+                <div class="stat-card">
+                    <h3>Purata Ack</h3>
+                    <div class="number">{{ '%.1fs'|format(command_stats.avg_ack) if command_stats.avg_ack is not none else '-' }}</div>
+                </div>
+
+                <form class="filter-group" method="get" action="/admin">
+                    <input type="hidden" name="view" value="commands">
+                    <label>Makmal:</label>
+                    <select name="lab" onchange="this.form.submit()">
+                        <option value="">Semua Makmal</option>
+                        {% for lab in lab_list %}
+                        <option value="{{ lab }}" {{ 'selected' if lab == selected_lab else '' }}>{{ lab }}</option>
+                        {% endfor %}
+                    </select>
+                </form>
+
+                <a href="/admin?view=commands{{ '&lab=' + selected_lab|urlencode if selected_lab else '' }}" class="btn btn-blue">Refresh</a>
+            </div>
+
+            {% if batches %}
+            <table style="margin-bottom: 20px;">
+                <thead>
+                    <tr>
+                        <th>Rollout</th>
+                        <th>Makmal</th>
+                        <th>Arahan</th>
+                        <th>Gelombang</th>
+                        <th>Kemajuan</th>
+                        <th>Menunggu</th>
+                        <th>Dalam Proses</th>
+                        <th>Gagal</th>
+                        <th>Dibatalkan</th>
+                        <th>Gelombang Seterusnya</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for b in batches %}
+                    <tr>
+                        <td>#{{ b.id }} <small style="color: #888;">{{ b.created_by }}</small></td>
+                        <td><span class="lab-badge">{{ b.lab_name or '-' }}</span></td>
+                        <td><strong>{{ b.command }}</strong></td>
+                        <td>{{ b.waves }} &times; {{ b.wave_size }} PC / {{ b.wave_interval }}s</td>
+                        <td>
+                            <div class="progress"><div class="progress-bar" style="width: {{ (100 * b.done / b.total)|round|int }}%;"></div></div>
+                            {{ b.done }}/{{ b.total }}
+                        </td>
+                        <td>{{ b.waiting }}</td>
+                        <td>{{ b.in_flight }}</td>
+                        <td class="{{ 'cmd-state-failed' if b.failed else '' }}">{{ b.failed }}</td>
+                        <td class="{{ 'cmd-state-cancelled' if b.cancelled else '' }}">{{ b.cancelled }}</td>
+                        <td>{{ b.next_wave_at|localtime if b.next_wave_at else 'Selesai' }}</td>
+                    </tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+            {% endif %}
+
+            <table>
+                <thead>
+                    <tr>
+                        <th>#</th>
+                        <th>Makmal</th>
+                        <th>PC</th>
+                        <th>Arahan</th>
+                        <th>Status</th>
+                        <th>Cubaan</th>
+                        <th>Oleh</th>
+                        <th>Masa Queue (UTC)</th>
+                        <th>Latency Hantar</th>
+                        <th>Latency Ack</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for c in commands %}
+                    <tr>
+                        <td>{{ c.id }}</td>
+                        <td><span class="lab-badge">{{ c.lab_name or '-' }}</span></td>
+                        <td>{{ c.pc_hostname }}</td>
+                        <td><strong>{{ c.command }}</strong></td>
+                        <td class="cmd-state-{{ c.state }}">{{ c.state|upper }}</td>
+                        <td>{{ c.attempts }}</td>
+                        <td>{{ c.queued_by or '-' }}</td>
+                        <td>{{ c.queued_at[:19] }}</td>
+                        <td>{{ '%.2fs'|format(c.delivery_secs) if c.delivery_secs is not none else '-' }}</td>
+                        <td>{{ '%.2fs'|format(c.ack_secs) if c.ack_secs is not none else '-' }}</td>
+                    </tr>
+                    {% else %}
+                    <tr><td colspan="10" style="text-align: center; color: #999;">Tiada arahan</td></tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+
             {% else %}
             <!-- ==================== LOG VIEW ==================== -->
 
             <div class="toolbar">
                 <div class="stat-card">
-                    <h3>Jumlah Rekod</h3>
+                    <h3>Rekod Halaman Ini</h3>
                     <div class="number">{{ records|length }}</div>
                 </div>
 
-                <div class="filter-group">
+                <form class="filter-group" method="get" action="/admin">
+                    <input type="hidden" name="view" value="log">
                     <label>Makmal:</label>
-                    <select onchange="window.location.href='/admin?view=log' + (this.value ? '&lab=' + encodeURIComponent(this.value) : '')">
+                    <select name="lab" onchange="this.form.submit()">
                         <option value="">Semua Makmal</option>
                         {% for lab in lab_list %}
                         <option value="{{ lab }}" {{ 'selected' if lab == selected_lab else '' }}>{{ lab }}</option>
                         {% endfor %}
                     </select>
-                </div>
+                    <label>Dari:</label>
+                    <input type="date" name="from" value="{{ log_filters['from'] }}">
+                    <label>Hingga:</label>
+                    <input type="date" name="to" value="{{ log_filters['to'] }}">
+                    <button type="submit" class="btn btn-blue">Tapis</button>
+                </form>
 
-                <a href="/admin/export{{ '?lab=' + selected_lab if selected_lab else '' }}" class="btn btn-green">Export CSV</a>
-                <a href="/admin?view=log{{ '&lab=' + selected_lab if selected_lab else '' }}" class="btn btn-blue">Refresh</a>
+                <a href="/admin/export{{ '?' + log_query if log_query else '' }}" class="btn btn-green">Export CSV</a>
+                <a href="/admin/export?gzip=1{{ '&' + log_query if log_query else '' }}" class="btn btn-green">Export CSV (.gz)</a>
+                <a href="/admin?view=log{{ '&' + log_query if log_query else '' }}" class="btn btn-blue">Refresh</a>
             </div>
 
             <table>
@@ -894,6 +2717,15 @@ def admin():
                     {% endfor %}
                 </tbody>
             </table>
+
+            <div class="pager">
+                {% if before %}
+                <a href="/admin?view=log{{ '&' + log_query if log_query else '' }}" class="btn btn-blue">&laquo; Terkini</a>
+                {% endif %}
+                {% if next_before %}
+                <a href="/admin?view=log{{ '&' + log_query if log_query else '' }}&before={{ next_before }}" class="btn btn-blue">Lebih Lama &raquo;</a>
+                {% endif %}
+            </div>
             {% endif %}
 
             <div id="toast" class="toast"></div>
@@ -906,230 +2738,933 @@ def admin():
                 setTimeout(function() { t.className = 'toast'; }, 3000);
             }
 
+            function cmdClick(btn) {
+                sendCommand(btn.getAttribute('data-uuid'), btn.getAttribute('data-cmd'), btn.getAttribute('data-pc-name'));
+            }
+
             function sendCommand(uuid, command, pcName) {
                 var labels = {SHUTDOWN: 'SHUTDOWN', LOCK: 'LOCK', UNLOCK: 'UNLOCK', RESTART: 'RESTART'};
                 if (!confirm('AMARAN: ' + (labels[command] || command) + ' ' + pcName + '?')) return;
 
-                var form = new FormData();
-                form.append('uuid', uuid);
-                form.append('command', command);
+                var form = new FormData();
+                form.append('uuid', uuid);
+                form.append('command', command);
+
+                fetch('/api.php?action=admin_command', {method: 'POST', body: form})
+                    .then(function(r) { return r.json(); })
+                    .then(function(data) {
+                        if (data.status === 'ok') {
+                            showToast(command + ' dihantar ke ' + pcName, 'success');
+                            if (!liveStream) { setTimeout(function() { location.reload(); }, 1500); }
+                        } else {
+                            showToast('Gagal: ' + (data.error || 'Unknown error'), 'error');
+                        }
+                    })
+                    .catch(function(e) { showToast('Ralat rangkaian: ' + e, 'error'); });
+            }
+
+            function selectAllPcs(box) {
+                box.closest('.lab-section').querySelectorAll('.pc-select').forEach(function(cb) { cb.checked = box.checked; });
+            }
+
+            function bulkCommand(btn) {
+                var sec = btn.closest('.lab-section');
+                var lab = sec.getAttribute('data-lab');
+                var command = sec.querySelector('.bulk-cmd').value;
+                var target = sec.querySelector('.bulk-target').value;
+
+                var form = new FormData();
+                form.append('command', command);
+                form.append('lab', lab);
+                var desc;
+                if (target === 'selected') {
+                    var picked = sec.querySelectorAll('.pc-select:checked');
+                    if (!picked.length) { showToast('Tiada PC dipilih', 'error'); return; }
+                    picked.forEach(function(cb) { form.append('uuid', cb.value); });
+                    desc = picked.length + ' PC dipilih';
+                } else {
+                    if (target !== 'all') { form.append('status', target); }
+                    desc = (target === 'all' ? 'SEMUA PC' : 'semua PC ' + target) + ' dalam ' + lab;
+                }
+                var wave = sec.querySelector('.bulk-wave').value;
+                if (wave && (command === 'RESTART' || command === 'SHUTDOWN')) {
+                    var size = wave.split(':')[0], interval = parseInt(wave.split(':')[1], 10);
+                    form.append('wave_size', size);
+                    form.append('wave_interval', interval);
+                    form.append('jitter', Math.round(interval / 3));
+                    desc += ' (' + size + ' PC setiap ' + interval + 's)';
+                }
+                if (!confirm('AMARAN: ' + command + ' ' + desc + '?')) return;
+
+                fetch('/api.php?action=admin_bulk_command', {method: 'POST', body: form})
+                    .then(function(r) { return r.json(); })
+                    .then(function(data) {
+                        if (data.status === 'ok') {
+                            var failed = data.results.length - data.applied;
+                            showToast(command + ' dihantar ke ' + data.applied + ' PC' + (data.waves > 1 ? ' dalam ' + data.waves + ' gelombang' : '') +
+                                      (failed ? ' (' + failed + ' gagal)' : ''),
+                                      failed ? 'error' : 'success');
+                            sec.querySelectorAll('.pc-select:checked').forEach(function(cb) { cb.checked = false; });
+                            if (!liveStream) { setTimeout(function() { location.reload(); }, 1500); }
+                        } else {
+                            showToast('Gagal: ' + (data.error || 'Unknown error'), 'error');
+                        }
+                    })
+                    .catch(function(e) { showToast('Ralat rangkaian: ' + e, 'error'); });
+            }
+
+            // ===== Live update (SSE /admin/stream) — patch kad PC tanpa reload =====
+            // Fallback: reload berkala bila SSE dimatikan, ditolak (503) atau tiada event sampai
+            var LIVE_STREAM_ENABLED = {{ 'true' if live_stream else 'false' }};
+            var LIVE_STALL_MS = {{ live_stall_ms }};
+            var FALLBACK_RELOAD_MS = 60000;
+            var liveStream = null, liveWatchdog = null, fallbackStarted = false;
+
+            function startReloadFallback() {
+                if (liveStream) { liveStream.close(); liveStream = null; }
+                clearTimeout(liveWatchdog);
+                if (fallbackStarted) return;
+                fallbackStarted = true;
+                setInterval(function() {
+                    // Jangan reload semasa admin sedang memilih PC untuk arahan pukal
+                    if (!document.querySelector('.pc-select:checked')) location.reload();
+                }, FALLBACK_RELOAD_MS);
+            }
+
+            function armLiveWatchdog() {
+                clearTimeout(liveWatchdog);
+                liveWatchdog = setTimeout(startReloadFallback, LIVE_STALL_MS);
+            }
+
+            function esc(s) {
+                return String(s == null ? '' : s).replace(/[&<>"']/g, function(c) {
+                    return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+                });
+            }
+
+            function cmdButton(pc, cls, cmd, label) {
+                return '<button class="cmd-btn ' + cls + '" data-uuid="' + esc(pc.session_uuid) + '" data-pc-name="' + esc(pc.pc_hostname) +
+                       '" data-cmd="' + cmd + '" onclick="cmdClick(this)">' + label + '</button>';
+            }
+
+            function renderCard(card, pc) {
+                var sel = card.querySelector('.pc-select');
+                var html = '<div class="pc-name"><input type="checkbox" class="pc-select" value="' + esc(pc.session_uuid) + '"' +
+                           (sel && sel.checked ? ' checked' : '') + '> ' + esc(pc.pc_hostname) + '</div>';
+                if (!pc.is_online) {
+                    card.className = 'pc-card offline';
+                    html += '<div class="pc-status offline">OFFLINE</div><div class="pc-user" style="color: #aaa;">-</div>';
+                } else if (pc.status === 'UNLOCKED') {
+                    card.className = 'pc-card online-unlocked';
+                    html += '<div class="pc-status online-unlocked">ONLINE · UNLOCKED</div>';
+                    if (pc.nama_penuh) {
+                        html += '<div class="pc-user">' + esc(pc.nama_penuh) + '</div><div class="pc-id">' + esc(pc.no_id) + '</div>';
+                    }
+                    if (pc.unlock_time) { html += '<div class="pc-time">' + esc(pc.unlock_time) + '</div>'; }
+                    html += '<div class="cmd-btns">' + cmdButton(pc, 'lock', 'LOCK', 'Lock') + cmdButton(pc, 'restart', 'RESTART', 'Restart') +
+                            cmdButton(pc, 'shutdown', 'SHUTDOWN', 'Shutdown') + '</div>';
+                } else {
+                    card.className = 'pc-card online-locked';
+                    html += '<div class="pc-status online-locked">ONLINE · LOCKED</div><div class="pc-user" style="color: #aaa;">Menunggu pengguna</div>';
+                    html += '<div class="cmd-btns">' + cmdButton(pc, 'unlock', 'UNLOCK', 'Unlock') + cmdButton(pc, 'restart', 'RESTART', 'Restart') +
+                            cmdButton(pc, 'shutdown', 'SHUTDOWN', 'Shutdown') + '</div>';
+                }
+                card.innerHTML = html;
+            }
+
+            function recountStats() {
+                var total = 0, online = 0, active = 0;
+                document.querySelectorAll('.lab-section').forEach(function(sec) {
+                    var n = sec.querySelectorAll('.pc-card').length;
+                    var on = sec.querySelectorAll('.pc-card.online-locked, .pc-card.online-unlocked').length;
+                    var ak = sec.querySelectorAll('.pc-card.online-unlocked').length;
+                    sec.querySelector('.lab-online').textContent = on + ' Online';
+                    sec.querySelector('.lab-aktif').textContent = ak + ' Aktif';
+                    sec.querySelector('.lab-offline').textContent = (n - on) + ' Offline';
+                    total += n; online += on; active += ak;
+                });
+                document.getElementById('stat-total').textContent = total;
+                document.getElementById('stat-online').textContent = online;
+                document.getElementById('stat-offline').textContent = total - online;
+                document.getElementById('stat-active').textContent = active;
+            }
+
+            function startLiveStream() {
+                if (!document.getElementById('stat-total')) return;  // Bukan tab dashboard
+                if (!LIVE_STREAM_ENABLED || !window.EventSource) {
+                    startReloadFallback();  // SSE dimatikan / pelayar lama
+                    return;
+                }
+                liveStream = new EventSource('/admin/stream');
+                armLiveWatchdog();
+                liveStream.onerror = function() {
+                    // CLOSED = jawapan bukan 200 (mati/penuh/sesi tamat); CONNECTING = sambung semula biasa
+                    if (liveStream && liveStream.readyState === EventSource.CLOSED) startReloadFallback();
+                };
+                liveStream.addEventListener('ping', armLiveWatchdog);
+                liveStream.addEventListener('pcs', function(e) {
+                    armLiveWatchdog();
+                    var delta = JSON.parse(e.data);
+                    if (delta.removed.length) { location.reload(); return; }
+                    for (var i = 0; i < delta.changed.length; i++) {
+                        var pc = delta.changed[i];
+                        var card = document.querySelector('.pc-card[data-pc="' + CSS.escape(pc.lab_name + '|' + pc.pc_hostname) + '"]');
+                        if (!card) { location.reload(); return; }  // PC baru — render semula halaman
+                        renderCard(card, pc);
+                    }
+                    recountStats();
+                });
+            }
+            startLiveStream();
+            </script>
+        </div>
+    </body>
+    </html>
+    '''
+ADMIN_TEMPLATE = app.jinja_env.from_string(ADMIN_HTML)
+
+@app.route('/admin')
+@app.route('/lab-system/admin')
+def admin():
+    """Admin page - dashboard PC mengikut makmal + log pengguna"""
+    # Auth check
+    admin_user = get_current_admin()
+    if not admin_user:
+        return redirect('/admin/login')
+
+    admin_labs = get_admin_labs(admin_user)
+
+    selected_lab = request.args.get('lab', '')
+    view = request.args.get('view', 'dashboard')
+
+    conn = get_db()
+
+    # Lab isolation sebagai JOIN (kosong untuk superadmin)
+    scope_join, scope_params = admin_lab_scope(admin_user, 'p.lab_name')
+
+    # Senarai makmal untuk dropdown
+    if admin_labs is None:
+        lab_list = [r['name'] for r in conn.execute("SELECT name FROM labs ORDER BY name").fetchall()]
+    else:
+        lab_list = admin_labs
+
+    # Dapatkan status terkini setiap PC (satu baris per PC - scan primary key)
+    pc_status = conn.execute(f"""
+        SELECT p.session_uuid, p.pc_hostname, p.lab_name, p.status, p.nama_penuh, p.no_id, p.no_telefon,
+               p.ip_address, p.mac_address, p.unlock_time, p.registered_at AS created_at, p.last_seen
+        FROM pcs p
+        {scope_join}
+        WHERE p.lab_name != ''
+        ORDER BY p.lab_name, p.pc_hostname
+    """, scope_params).fetchall()
+
+    # is_online dari presence registry (heartbeat < ONLINE_THRESHOLD saat lalu)
+    presence.sync(conn)
+    pc_list = []
+    for pc in pc_status:
+        pc_dict = dict(pc)
+        pc_dict['is_online'] = presence.is_online(pc_dict['session_uuid'])
+        pc_list.append(pc_dict)
+
+    # Susun data mengikut makmal
+    lab_pcs = {}
+    for pc in pc_list:
+        lab = pc['lab_name']
+        if lab not in lab_pcs:
+            lab_pcs[lab] = []
+        lab_pcs[lab].append(pc)
+
+    # Validate selected_lab access
+    if selected_lab and admin_labs is not None and selected_lab not in admin_labs:
+        selected_lab = ''
+
+    # Query log rekod dengan filter — keyset pagination (before=<id>) + julat tarikh
+    date_from = parse_log_date(request.args.get('from', ''))
+    date_to = parse_log_date(request.args.get('to', ''))
+    before = request.args.get('before', type=int)
+    where, params = unlock_event_filter(admin_labs, selected_lab, date_from, date_to)
+    order = unlock_event_order(date_from, date_to)
+    if before and (date_from or date_to):
+        # Keyset ikut turutan (unlock_time, id) — unlock_time baris kursor dicari melalui PK
+        where += " AND (e.unlock_time, e.id) < ((SELECT unlock_time FROM unlock_events WHERE id = ?), ?)"
+        params.extend([before, before])
+    elif before:
+        where += (" AND " if where else "WHERE ") + "e.id < ?"
+        params.append(before)
+    records = conn.execute(f"""
+        SELECT e.id, e.pc_hostname, e.lab_name, e.nama_penuh, e.no_id, e.no_telefon, e.ip_address, e.mac_address,
+               COALESCE(p.status, 'LOCKED') AS status, e.unlock_time, e.created_at
+        FROM unlock_events e
+        LEFT JOIN pcs p ON p.session_uuid = e.session_uuid
+        {where}
+        ORDER BY {order}
+        LIMIT ?
+    """, params + [LOG_PAGE_SIZE + 1]).fetchall()
+    next_before = records[LOG_PAGE_SIZE - 1]['id'] if len(records) > LOG_PAGE_SIZE else None
+    records = records[:LOG_PAGE_SIZE]
+
+    # Query string filter semasa — untuk export & pautan halaman
+    log_filters = {'lab': selected_lab,
+                   'from': date_from.strftime('%Y-%m-%d') if date_from else '',
+                   'to': date_to.strftime('%Y-%m-%d') if date_to else ''}
+    log_query = urlencode({k: v for k, v in log_filters.items() if v})
+
+    # Sejarah arahan terkini + latency penghantaran/ack (tab Arahan)
+    commands, command_stats, batches = [], {}, []
+    if view == 'commands':
+        cmd_join, cmd_params = admin_lab_scope(admin_user, 'c.lab_name')
+        cmd_where = "WHERE c.lab_name = ?" if selected_lab else ""
+        commands = [dict(r) for r in conn.execute(f"""
+            SELECT c.id, c.lab_name, c.pc_hostname, c.command, c.state, c.attempts, c.queued_by,
+                   c.queued_at, c.delivered_at, c.acked_at,
+                   (julianday(c.delivered_at) - julianday(c.queued_at)) * 86400 AS delivery_secs,
+                   (julianday(c.acked_at) - julianday(c.delivered_at)) * 86400 AS ack_secs
+            FROM commands c
+            {cmd_join}
+            {cmd_where}
+            ORDER BY c.id DESC
+            LIMIT ?
+        """, cmd_params + ([selected_lab] if selected_lab else []) + [COMMAND_PAGE_SIZE]).fetchall()]
+        delivery = [c['delivery_secs'] for c in commands if c['delivery_secs'] is not None]
+        acked = [c['ack_secs'] for c in commands if c['ack_secs'] is not None]
+        # Kemajuan gelombang (rollout) terkini dalam skop admin
+        batches = [dict(r) for r in conn.execute(f"""
+            SELECT b.id, b.lab_name, b.command, b.total, b.wave_size, b.wave_interval, b.created_by, b.created_at,
+                   SUM(c.state = 'queued' AND c.not_before > strftime('%Y-%m-%d %H:%M:%f', 'now')) AS waiting,
+                   SUM(c.state = 'acked' OR (c.state = 'delivered' AND c.ack_required = 0)) AS done,
+                   SUM(c.state IN ('failed', 'expired')) AS failed,
+                   SUM(c.state = 'cancelled') AS cancelled,
+                   MIN(CASE WHEN c.state = 'queued' AND c.not_before > strftime('%Y-%m-%d %H:%M:%f', 'now')
+                            THEN c.not_before END) AS next_wave_at
+            FROM command_batches b
+            JOIN commands c ON c.batch_id = b.id
+            {cmd_join}
+            GROUP BY b.id
+            ORDER BY b.id DESC
+            LIMIT 10
+        """, cmd_params).fetchall()]
+        for b in batches:
+            b['in_flight'] = b['total'] - b['waiting'] - b['done'] - b['failed'] - b['cancelled']
+            b['waves'] = (b['total'] + b['wave_size'] - 1) // b['wave_size']
+        command_stats = {
+            'pending': sum(1 for c in commands if c['state'] in ('queued', 'delivered')),
+            'unacked': sum(1 for c in commands if c['state'] in ('failed', 'expired')),
+            'avg_delivery': sum(delivery) / len(delivery) if delivery else None,
+            'max_delivery': max(delivery) if delivery else None,
+            'avg_ack': sum(acked) / len(acked) if acked else None,
+        }
+
+    return render_page(ADMIN_TEMPLATE, records=[dict(r) for r in records], lab_list=lab_list, selected_lab=selected_lab, lab_pcs=lab_pcs, view=view, admin_user=admin_user,
+                       log_filters=log_filters, log_query=log_query, before=before, next_before=next_before,
+                       commands=commands, command_stats=command_stats, batches=batches,
+                       live_stream=SSE_ENABLED, live_stall_ms=(2 * SSE_KEEPALIVE + 5) * 1000)
+
+# ==================== ADMIN LIVE STREAM (SSE) ====================
+# /admin/stream hantar delta status PC (event "pcs") kepada dashboard. Stream
+# hanya membuat query bila PRAGMA data_version berubah (ada commit dari
+# connection lain) atau presence berubah, jadi dashboard yang idle hampir
+# tiada kos. Setiap stream menahan satu thread worker, maka bilangan stream
+# dihadkan dan setiap stream ditamatkan selepas SSE_MAX_DURATION saat
+# (EventSource akan sambung semula secara automatik).
+#
+# Pilihan (SSE_ENABLED=0 = mati): dengan 3 worker WSGI segerak, satu dashboard
+# terbuka sudah memegang satu worker. Bila mati / penuh / host buffer stream,
+# dashboard kembali ke reload berkala.
+
+SSE_ENABLED = os.environ.get('SSE_ENABLED', '0') == '1'
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', '8'))  # per worker
+SSE_MAX_DURATION = 300  # saat
+SSE_KEEPALIVE = 15  # saat
+SSE_PRESENCE_INTERVAL = 5  # saat - semak semula online/offline walaupun DB tidak berubah
+
+_sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+def dashboard_snapshot(conn, admin_labs):
+    """Status semasa PC dalam skop admin: {'lab|pc': {...}}"""
+    query = """
+        SELECT session_uuid, pc_hostname, lab_name, status, nama_penuh, no_id, unlock_time
+        FROM pcs
+        WHERE lab_name != ''
+    """
+    params = []
+    if admin_labs is not None:
+        if not admin_labs:
+            return {}
+        query += f" AND lab_name IN ({','.join(['?' for _ in admin_labs])})"
+        params = admin_labs
+    presence.sync(conn)
+    snapshot = {}
+    for r in conn.execute(query, params).fetchall():
+        pc = dict(r)
+        pc['is_online'] = presence.is_online(pc['session_uuid'])
+        snapshot[f"{pc['lab_name']}|{pc['pc_hostname']}"] = pc
+    return snapshot
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/admin/stream')
+@app.route('/lab-system/admin/stream')
+def admin_stream():
+    """Server-Sent Events: delta status PC untuk dashboard admin"""
+    admin_user = get_current_admin()
+    if not admin_user:
+        return jsonify({'error': 'Sila log masuk terlebih dahulu'}), 401
+    if not SSE_ENABLED:
+        return jsonify({'error': 'Live stream dimatikan'}), 404
+    admin_labs = get_admin_labs(admin_user)
+
+    if not _sse_slots.acquire(blocking=False):
+        # Penuh — jawapan bukan 200 menutup EventSource; dashboard beralih ke reload berkala
+        return jsonify({'error': 'Terlalu banyak live stream'}), 503
+
+    def generate():
+        conn = get_db()
+        last = dashboard_snapshot(conn, admin_labs)
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        yield "retry: 3000\n\n"
+        yield _sse_event('ping', {})  # Tanda stream sampai — host yang buffer tidak akan hantar ini
+
+        started = last_check = last_send = time.monotonic()
+        seq = _pc_change_seq
+        while time.monotonic() - started < SSE_MAX_DURATION:
+            seq = wait_for_pc_change(seq, 1.0)
+            now = time.monotonic()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != data_version or now - last_check >= SSE_PRESENCE_INTERVAL:
+                data_version = version
+                last_check = now
+                current = dashboard_snapshot(conn, admin_labs)
+                changed = [pc for key, pc in current.items() if last.get(key) != pc]
+                removed = [key for key in last if key not in current]
+                last = current
+                if changed or removed:
+                    last_send = now
+                    yield _sse_event('pcs', {'changed': changed, 'removed': removed})
+            if now - last_send >= SSE_KEEPALIVE:
+                last_send = now
+                yield _sse_event('ping', {})  # Event (bukan komen) supaya watchdog dashboard nampak
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Lepaskan slot bila response ditutup — termasuk bila client putus sebelum
+    # generator bermula (blok finally dalam generate() tidak akan dijalankan)
+    response.call_on_close(_sse_slots.release)
+    return response
+
+# ==================== ADMIN EXPORT ====================
+
+EXPORT_CHUNK_ROWS = 500  # baris per chunk CSV yang distrim
+
+@app.route('/admin/export')
+@app.route('/lab-system/admin/export')
+def admin_export():
+    """Export rekod ke CSV (dengan filter makmal + lab isolation)"""
+    # Auth check
+    admin_user = get_current_admin()
+    if not admin_user:
+        return redirect('/admin/login')
+
+    admin_labs = get_admin_labs(admin_user)
+    selected_lab = request.args.get('lab', '')
+
+    # Validate selected_lab access
+    if selected_lab and admin_labs is not None and selected_lab not in admin_labs:
+        selected_lab = ''
+
+    # Filter makmal + julat tarikh — sama seperti Log Pengguna
+    conn = get_db()
+    date_from = parse_log_date(request.args.get('from', ''))
+    date_to = parse_log_date(request.args.get('to', ''))
+    where, params = unlock_event_filter(admin_labs, selected_lab, date_from, date_to)
+    order = unlock_event_order(date_from, date_to)
+    use_gzip = request.args.get('gzip') == '1'
+
+    def generate():
+        # Cursor dibaca berperingkat — memori tetap walaupun rekod bertahun-tahun
+        cursor = conn.execute(f"""
+            SELECT e.id, e.pc_hostname, e.lab_name, e.nama_penuh, e.no_id, e.no_telefon, e.ip_address, e.mac_address,
+                   COALESCE(p.status, 'LOCKED') AS status, e.unlock_time, e.created_at
+            FROM unlock_events e
+            LEFT JOIN pcs p ON p.session_uuid = e.session_uuid
+            {where}
+            ORDER BY {order}
+        """, params)
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator='\n')
+        writer.writerow(['ID', 'Makmal', 'PC', 'Nama Penuh', 'No ID', 'No Telefon', 'IP Address',
+                         'MAC Address', 'Status', 'Masa Unlock', 'Masa Daftar'])
+        gz = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None  # wbits=31 = format gzip
+        try:
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                for r in rows:
+                    writer.writerow([r['id'], r['lab_name'] or '', r['pc_hostname'], r['nama_penuh'], r['no_id'],
+                                     r['no_telefon'], r['ip_address'] or '', r['mac_address'] or '', r['status'],
+                                     r['unlock_time'] or '', r['created_at']])
+                chunk = buf.getvalue().encode('utf-8')
+                buf.seek(0)
+                buf.truncate()
+                if gz:
+                    chunk = gz.compress(chunk)
+                if chunk:
+                    yield chunk
+                if not rows:
+                    break
+            if gz:
+                yield gz.flush()
+        finally:
+            cursor.close()
+
+    filename = f"rekod_{selected_lab.replace(' ', '_')}.csv" if selected_lab else "rekod_semua_makmal.csv"
+    if use_gzip:
+        filename += '.gz'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/gzip' if use_gzip else 'text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+# ==================== ADMIN METRICS ====================
+
+@app.route('/admin/metrics')
+@app.route('/lab-system/admin/metrics')
+def admin_metrics():
+    """Statistik dalaman server (per worker process) dalam format JSON"""
+    if not get_current_admin():
+        return jsonify({'error': 'Sila log masuk terlebih dahulu'}), 401
+
+    with _db_stats_lock:
+        db_stats = dict(DB_STATS)
+    db_stats['pooled'] = _db_pool.qsize()
+    db_stats['pool_size'] = DB_POOL_SIZE
+
+    with _heartbeat_lock:
+        heartbeat_stats = dict(HEARTBEAT_STATS)
+        heartbeat_stats['buffer_depth'] = len(_heartbeat_buffer)
+    heartbeat_stats['flush_interval'] = HEARTBEAT_FLUSH_INTERVAL
+
+    with _channel_stats_lock:
+        channel_stats = dict(CHANNEL_STATS)
+    channel_stats['enabled'] = Sock is not None
+
+    with _admin_cache_lock:
+        admin_cache_stats = dict(ADMIN_CACHE_STATS, size=len(_admin_cache))
+
+    with _hash_stats_lock:
+        hash_stats = dict(HASH_STATS)
+    hash_stats['workers'] = HASH_POOL_WORKERS if _hash_pool is not None and _hash_pool_pid == os.getpid() else 0
+    hash_stats['queue_max'] = HASH_QUEUE_MAX
+
+    with _rate_stats_lock:
+        rate_limit_stats = dict(RATE_LIMIT_STATS, limited_by_action=dict(RATE_LIMIT_STATS['limited_by_action']))
+    rate_limit_stats['enabled'] = RATE_LIMIT_ENABLED
+    rate_limit_stats['tracked_keys'] = len(_rate_buckets)
+
+    with _scheduler_stats_lock:
+        scheduler_stats = dict(SCHEDULER_STATS, enabled=SCHEDULER_ENABLED, timezone=str(LAB_TZ))
+
+    with _command_stats_lock:
+        command_stats = dict(COMMAND_STATS)
+    # Kedalaman baris gilir (global, dari DB) — guna index separa idx_commands_open
+    open_counts = dict(get_db().execute(
+        "SELECT state, COUNT(*) FROM commands WHERE state IN ('queued', 'delivered') GROUP BY state").fetchall())
+    command_stats['open'] = {'queued': open_counts.get('queued', 0), 'delivered': open_counts.get('delivered', 0)}
+
+    return jsonify({
+        'pid': os.getpid(),
+        'db': db_stats,
+        'heartbeat': heartbeat_stats,
+        'channel': channel_stats,
+        'hash': hash_stats,
+        'admin_cache': admin_cache_stats,
+        'commands': command_stats,
+        'rate_limit': rate_limit_stats,
+        'scheduler': scheduler_stats,
+        'presence': {'tracked': len(presence), 'online': len(presence.online_uuids()),
+                     'threshold': ONLINE_THRESHOLD},
+    })
+
+# ==================== ADMIN SCHEDULE ====================
+
+JOB_WEEKDAYS = (('1', 'Isnin'), ('2', 'Selasa'), ('3', 'Rabu'), ('4', 'Khamis'), ('5', 'Jumaat'), ('6', 'Sabtu'), ('0', 'Ahad'))
+
+def parse_job_schedule(form):
+    """(cron, next_run UTC) dari borang jadual. ValueError jika tidak sah."""
+    mode = form.get('mode', 'once')
+    now = datetime.utcnow()
+    if mode == 'once':
+        try:
+            run_at = datetime.strptime(form.get('run_at', ''), '%Y-%m-%dT%H:%M')
+        except ValueError:
+            raise ValueError('Tarikh/masa tidak sah.')
+        next_run = local_to_utc(run_at)
+        if next_run <= now.strftime('%Y-%m-%d %H:%M:%S'):
+            raise ValueError('Masa jadual sudah berlalu.')
+        return None, next_run
+    if mode == 'weekly':
+        try:
+            at = datetime.strptime(form.get('time', ''), '%H:%M')
+        except ValueError:
+            raise ValueError('Masa tidak sah.')
+        days = form.getlist('days')
+        if not days:
+            raise ValueError('Pilih sekurang-kurangnya satu hari.')
+        cron = f"{at.minute} {at.hour} * * {','.join(days)}"
+    elif mode == 'cron':
+        cron = ' '.join(form.get('cron', '').split())
+        if not cron:
+            raise ValueError('Ungkapan cron diperlukan.')
+    else:
+        raise ValueError('Jenis jadual tidak sah.')
+    next_run = job_next_run(cron, now)
+    if not next_run:
+        # Job aktif tanpa next_run tidak akan pernah dijalankan oleh scheduler
+        raise ValueError('Jadual tidak mempunyai masa seterusnya.')
+    return cron, next_run
+
+# Halaman arahan berjadual — dikompil sekali semasa import
+ADMIN_SCHEDULE_HTML = '''
+    <!DOCTYPE html>
+    <html lang="ms">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Arahan Berjadual - LabSentinel</title>
+        <link rel="icon" type="image/png" href="{{ logo_url(32) }}">
+        <style>
+            * { box-sizing: border-box; }
+            body { font-family: 'Segoe UI', sans-serif; background: #f5f5f5; margin: 0; padding: 20px; }
+            .container { max-width: 1000px; margin: 0 auto; }
+            h1 { color: #1a3a6e; margin-bottom: 5px; }
+            .subtitle { color: #666; margin-bottom: 20px; font-size: 0.9rem; }
+
+            /* Admin Bar */
+            .admin-bar { display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px; padding: 12px 20px; background: white; border-radius: 10px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); }
+            .admin-bar .bar-actions { display: flex; gap: 10px; align-items: center; }
+
+            /* Section */
+            .section { background: white; border-radius: 12px; box-shadow: 0 2px 8px rgba(0,0,0,0.1); margin-bottom: 20px; overflow: hidden; }
+            .section-header { background: linear-gradient(135deg, #1a3a6e 0%, #2d5a9e 100%); color: white; padding: 15px 25px; }
+            .section-header h2 { margin: 0; font-size: 1.1rem; }
+            .section-body { padding: 20px; }
+
+            /* Table */
+            table { width: 100%; border-collapse: collapse; }
+            th, td { padding: 10px 12px; text-align: left; border-bottom: 1px solid #eee; font-size: 0.85rem; }
+            th { background: #f8f9fa; color: #333; font-weight: 600; }
+            tr:hover { background: #f8f9fa; }
+            tr.disabled td { color: #aaa; }
+
+            /* Forms */
+            .form-row { display: flex; gap: 15px; flex-wrap: wrap; }
+            .form-group { margin-bottom: 15px; flex: 1; min-width: 200px; }
+            .form-group label { display: block; margin-bottom: 5px; font-weight: 600; color: #333; font-size: 0.85rem; }
+            .form-group input, .form-group select { width: 100%; padding: 10px; border: 2px solid #ddd; border-radius: 8px; font-size: 0.9rem; }
+            .form-group input:focus, .form-group select:focus { outline: none; border-color: #1a3a6e; }
+            .form-group small { color: #888; font-size: 0.75rem; }
+            .checkbox-group { display: flex; flex-wrap: wrap; gap: 10px; padding: 8px 0; }
+            .checkbox-label { display: flex; align-items: center; gap: 5px; font-size: 0.85rem; color: #555; cursor: pointer; background: #f0f0f0; padding: 6px 12px; border-radius: 6px; }
+            .checkbox-label:hover { background: #e0e0e0; }
+            .mode-fields { display: none; }
+            .mode-fields.active { display: block; }
+
+            /* Buttons */
+            .btn { color: white; padding: 8px 16px; border: none; border-radius: 5px; cursor: pointer; font-size: 0.85rem; text-decoration: none; display: inline-block; font-weight: 600; }
+            .btn-green { background: #27ae60; }
+            .btn-green:hover { background: #219a52; }
+            .btn-blue { background: #3498db; }
+            .btn-blue:hover { background: #2980b9; }
+            .btn-red { background: #ef4444; }
+            .btn-red:hover { background: #dc2626; }
+            .btn-gray { background: #9ca3af; }
+            .btn-small { padding: 5px 10px; font-size: 0.75rem; }
+
+            /* Alerts */
+            .alert { padding: 12px 20px; border-radius: 8px; margin-bottom: 15px; font-size: 0.9rem; }
+            .alert-success { background: #dcfce7; color: #16a34a; }
+            .alert-error { background: #fdeaea; color: #e74c3c; }
+
+            .badge-lab { background: #e8f4f8; color: #1a3a6e; padding: 2px 8px; border-radius: 4px; font-size: 0.75rem; font-weight: 600; }
+
+            @media (max-width: 768px) {
+                .form-row { flex-direction: column; }
+                .form-group { min-width: 100%; }
+                .admin-bar { flex-direction: column; gap: 10px; text-align: center; }
+            }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <!-- Admin Bar -->
+            <div class="admin-bar">
+                <span style="color: #555; font-size: 0.9rem;">Arahan Berjadual ({{ timezone_name }})</span>
+                <div class="bar-actions">
+                    <a href="/admin" class="btn btn-blue">Dashboard</a>
+                    <a href="/admin/logout" class="btn btn-red">Logout</a>
+                </div>
+            </div>
+
+            <div style="display: flex; align-items: center; gap: 12px;">
+                <picture>
+                    {% if logo_url(60, 'webp') %}<source type="image/webp" srcset="{{ logo_url(60, 'webp') }} 1x, {{ logo_url(120, 'webp') }} 2x">{% endif %}
+                    <img src="{{ logo_url(60) }}" srcset="{{ logo_url(60) }} 1x, {{ logo_url(120) }} 2x" alt="LabSentinel" style="width: 60px; height: 60px;">
+                </picture>
+                <div>
+                    <h1 style="margin: 0;">Arahan Berjadual</h1>
+                    <p class="subtitle" style="margin: 0;">LOCK / SHUTDOWN makmal secara automatik pada masa tetap</p>
+                </div>
+            </div>
+
+            {% if msg %}
+            <div class="alert alert-success">{{ msg }}</div>
+            {% endif %}
+            {% if error %}
+            <div class="alert alert-error">{{ error }}</div>
+            {% endif %}
+
+            <!-- Senarai Jadual -->
+            <div class="section">
+                <div class="section-header">
+                    <h2>Senarai Jadual</h2>
+                </div>
+                <div class="section-body">
+                    <table>
+                        <thead>
+                            <tr>
+                                <th>Nama</th>
+                                <th>Makmal</th>
+                                <th>Arahan</th>
+                                <th>Jadual</th>
+                                <th>Seterusnya</th>
+                                <th>Terakhir</th>
+                                <th>Tindakan</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            {% for j in jobs %}
+                            <tr class="{{ '' if j.enabled else 'disabled' }}">
+                                <td><strong>{{ j.name or ('#' ~ j.id) }}</strong></td>
+                                <td><span class="badge-lab">{{ j.lab_name }}</span></td>
+                                <td>{{ j.command }}{% if j.status_filter %} <small>(PC {{ j.status_filter }})</small>{% endif %}</td>
+                                <td>{% if j.cron %}<code>{{ j.cron }}</code>{% else %}Sekali{% endif %}</td>
+                                <td>{{ j.next_run|localtime if j.enabled else 'Dihentikan' }}</td>
+                                <td style="font-size: 0.8rem;">{{ j.last_run|localtime }}{% if j.last_result %}<br><span style="color: #888;">{{ j.last_result }}</span>{% endif %}</td>
+                                <td>
+                                    <form method="POST" style="display:inline">
+                                        <input type="hidden" name="form_action" value="toggle_job">
+                                        <input type="hidden" name="job_id" value="{{ j.id }}">
+                                        <button type="submit" class="btn btn-small {{ 'btn-gray' if j.enabled else 'btn-green' }}">{{ 'Henti' if j.enabled else 'Aktifkan' }}</button>
+                                    </form>
+                                    <form method="POST" style="display:inline" onsubmit="return confirm('Padam jadual ini?')">
+                                        <input type="hidden" name="form_action" value="delete_job">
+                                        <input type="hidden" name="job_id" value="{{ j.id }}">
+                                        <button type="submit" class="btn btn-red btn-small">Padam</button>
+                                    </form>
+                                </td>
+                            </tr>
+                            {% else %}
+                            <tr><td colspan="7" style="text-align: center; color: #999;">Tiada jadual</td></tr>
+                            {% endfor %}
+                        </tbody>
+                    </table>
+                </div>
+            </div>
+
+            <!-- Tambah Jadual -->
+            <div class="section">
+                <div class="section-header">
+                    <h2>Tambah Jadual</h2>
+                </div>
+                <div class="section-body">
+                    <form method="POST">
+                        <input type="hidden" name="form_action" value="add_job">
+                        <div class="form-row">
+                            <div class="form-group">
+                                <label>Nama (pilihan)</label>
+                                <input type="text" name="name" placeholder="Contoh: Tutup makmal petang">
+                            </div>
+                            <div class="form-group">
+                                <label>Makmal</label>
+                                <select name="lab" required>
+                                    {% for lab in lab_list %}
+                                    <option value="{{ lab }}">{{ lab }}</option>
+                                    {% endfor %}
+                                </select>
+                            </div>
+                        </div>
+                        <div class="form-row">
+                            <div class="form-group">
+                                <label>Arahan</label>
+                                <select name="command">
+                                    {% for cmd in commands %}
+                                    <option value="{{ cmd }}">{{ cmd }}</option>
+                                    {% endfor %}
+                                </select>
+                            </div>
+                            <div class="form-group">
+                                <label>Sasaran</label>
+                                <select name="status">
+                                    <option value="">Semua PC</option>
+                                    <option value="UNLOCKED">PC UNLOCKED sahaja</option>
+                                    <option value="LOCKED">PC LOCKED sahaja</option>
+                                </select>
+                            </div>
+                            <div class="form-group">
+                                <label>Jenis</label>
+                                <select name="mode" onchange="showMode(this.value)">
+                                    <option value="once">Sekali</option>
+                                    <option value="weekly">Mingguan</option>
+                                    <option value="cron">Cron (lanjutan)</option>
+                                </select>
+                            </div>
+                        </div>
+
+                        <div class="mode-fields active" id="mode-once">
+                            <div class="form-group">
+                                <label>Tarikh & Masa</label>
+                                <input type="datetime-local" name="run_at">
+                            </div>
+                        </div>
+                        <div class="mode-fields" id="mode-weekly">
+                            <div class="form-group">
+                                <label>Masa</label>
+                                <input type="time" name="time" value="18:00">
+                            </div>
+                            <div class="form-group">
+                                <label>Hari</label>
+                                <div class="checkbox-group">
+                                    {% for value, label in weekdays %}
+                                    <label class="checkbox-label">
+                                        <input type="checkbox" name="days" value="{{ value }}" {{ 'checked' if value not in ('6', '0') else '' }}> {{ label }}
+                                    </label>
+                                    {% endfor %}
+                                </div>
+                            </div>
+                        </div>
+                        <div class="mode-fields" id="mode-cron">
+                            <div class="form-group">
+                                <label>Ungkapan Cron</label>
+                                <input type="text" name="cron" placeholder="55 17 * * 1-5">
+                                <small>minit jam hari bulan hari-minggu (0 = Ahad) — masa {{ timezone_name }}</small>
+                            </div>
+                        </div>
 
-                fetch('/api.php?action=admin_command', {method: 'POST', body: form})
-                    .then(function(r) { return r.json(); })
-                    .then(function(data) {
-                        if (data.status === 'ok') {
-                            showToast(command + ' dihantar ke ' + pcName, 'success');
-                            setTimeout(function() { location.reload(); }, 1500);
-                        } else {
-                            showToast('Gagal: ' + (data.error || 'Unknown error'), 'error');
-                        }
-                    })
-                    .catch(function(e) { showToast('Ralat rangkaian: ' + e, 'error'); });
-            }
-            </script>
+                        <button type="submit" class="btn btn-green">Tambah Jadual</button>
+                    </form>
+                </div>
+            </div>
         </div>
+
+        <script>
+        function showMode(mode) {
+            document.querySelectorAll('.mode-fields').forEach(function(el) {
+                el.classList.toggle('active', el.id === 'mode-' + mode);
+            });
+        }
+        </script>
     </body>
     </html>
     '''
-    return render_template_string(html, records=[dict(r) for r in records], lab_list=lab_list, selected_lab=selected_lab, lab_pcs=lab_pcs, view=view, admin_user=admin_user)
+ADMIN_SCHEDULE_TEMPLATE = app.jinja_env.from_string(ADMIN_SCHEDULE_HTML)
 
-# ==================== ADMIN EXPORT ====================
-
-@app.route('/admin/export')
-@app.route('/lab-system/admin/export')
-def admin_export():
-    """Export rekod ke CSV (dengan filter makmal + lab isolation)"""
-    # Auth check
+@app.route('/admin/schedule', methods=['GET', 'POST'])
+@app.route('/lab-system/admin/schedule', methods=['GET', 'POST'])
+def admin_schedule():
+    """Halaman arahan berjadual — admin urus jadual makmal sendiri"""
     admin_user = get_current_admin()
     if not admin_user:
         return redirect('/admin/login')
 
     admin_labs = get_admin_labs(admin_user)
-    selected_lab = request.args.get('lab', '')
-
-    # Validate selected_lab access
-    if selected_lab and admin_labs is not None and selected_lab not in admin_labs:
-        selected_lab = ''
-
-    conn = get_db()
-    if selected_lab:
-        records = conn.execute("""
-            SELECT id, pc_hostname, lab_name, nama_penuh, no_id, no_telefon, ip_address, mac_address, status, unlock_time, created_at
-            FROM sessions
-            WHERE nama_penuh IS NOT NULL AND lab_name = ?
-            ORDER BY id DESC
-        """, (selected_lab,)).fetchall()
-    elif admin_labs is not None and admin_labs:
-        placeholders = ','.join(['?' for _ in admin_labs])
-        records = conn.execute(f"""
-            SELECT id, pc_hostname, lab_name, nama_penuh, no_id, no_telefon, ip_address, mac_address, status, unlock_time, created_at
-            FROM sessions
-            WHERE nama_penuh IS NOT NULL AND lab_name IN ({placeholders})
-            ORDER BY id DESC
-        """, admin_labs).fetchall()
-    elif admin_labs is not None:
-        records = []
-    else:
-        records = conn.execute("""
-            SELECT id, pc_hostname, lab_name, nama_penuh, no_id, no_telefon, ip_address, mac_address, status, unlock_time, created_at
-            FROM sessions
-            WHERE nama_penuh IS NOT NULL
-            ORDER BY id DESC
-        """).fetchall()
-    conn.close()
-
-    # Generate CSV
-    csv_content = "ID,Makmal,PC,Nama Penuh,No ID,No Telefon,IP Address,MAC Address,Status,Masa Unlock,Masa Daftar\n"
-    for r in records:
-        csv_content += f"{r['id']},{r['lab_name'] or ''},{r['pc_hostname']},{r['nama_penuh']},{r['no_id']},{r['no_telefon']},{r['ip_address'] or ''},{r['mac_address'] or ''},{r['status']},{r['unlock_time'] or ''},{r['created_at']}\n"
-
-    filename = f"rekod_{selected_lab.replace(' ', '_')}.csv" if selected_lab else "rekod_semua_makmal.csv"
-    return Response(
-        csv_content,
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename={filename}'}
-    )
-
-# ==================== ADMIN USER MANAGEMENT ====================
-
-@app.route('/admin/users', methods=['GET', 'POST'])
-@app.route('/lab-system/admin/users', methods=['GET', 'POST'])
-def admin_users():
-    """Halaman urus akaun pentadbir — superadmin sahaja"""
-    admin_user = get_current_admin()
-    if not admin_user:
-        return redirect('/admin/login')
-    if not admin_user['is_superadmin']:
-        return redirect('/admin')
-
     msg = request.args.get('msg', '')
     error = ''
 
     conn = get_db()
 
+    if admin_labs is None:
+        lab_list = [r['name'] for r in conn.execute("SELECT name FROM labs ORDER BY name").fetchall()]
+    else:
+        lab_list = admin_labs
+
     # Handle POST actions
     if request.method == 'POST':
         form_action = request.form.get('form_action', '')
 
-        if form_action == 'add_admin':
-            username = request.form.get('username', '').strip()
-            password = request.form.get('password', '')
-            labs = request.form.getlist('labs')
-            is_superadmin = 1 if request.form.get('is_superadmin') else 0
-            assigned_labs = ','.join(labs)
-
-            if not username or not password:
-                error = 'Username dan password diperlukan.'
-            elif len(password) < 3:
-                error = 'Password terlalu pendek (minimum 3 aksara).'
+        if form_action == 'add_job':
+            lab_name = request.form.get('lab', '')
+            command = request.form.get('command', '').upper()
+            status_filter = request.form.get('status', '').upper() or None
+
+            if lab_name not in lab_list:
+                error = 'Makmal tidak sah atau bukan makmal anda.'
+            elif command not in PC_COMMANDS:
+                error = 'Arahan tidak sah.'
+            elif status_filter not in (None, 'LOCKED', 'UNLOCKED'):
+                error = 'Sasaran tidak sah.'
             else:
                 try:
-                    conn.execute(
-                        "INSERT INTO admin_users (username, password_hash, assigned_labs, is_superadmin) VALUES (?, ?, ?, ?)",
-                        (username, generate_password_hash(password), assigned_labs, is_superadmin)
-                    )
+                    cron, next_run = parse_job_schedule(request.form)
+                except ValueError as e:
+                    error = str(e)
+                else:
+                    conn.execute("""
+                        INSERT INTO scheduled_jobs (name, lab_name, command, status_filter, cron, next_run, created_by)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (request.form.get('name', '').strip() or None, lab_name, command, status_filter,
+                          cron, next_run, admin_user['username']))
                     conn.commit()
-                    conn.close()
-                    print(f"[ADMIN] New admin created: {username} by {admin_user['username']}")
-                    return redirect('/admin/users?msg=Admin+berjaya+ditambah')
-                except sqlite3.IntegrityError:
-                    error = f'Username "{username}" sudah wujud.'
-
-        elif form_action == 'delete_admin':
-            user_id = request.form.get('user_id', '')
-            if user_id and int(user_id) != admin_user['id']:
-                target = conn.execute("SELECT username FROM admin_users WHERE id = ?", (user_id,)).fetchone()
-                conn.execute("DELETE FROM admin_users WHERE id = ?", (user_id,))
-                conn.commit()
-                conn.close()
-                if target:
-                    print(f"[ADMIN] Admin deleted: {target['username']} by {admin_user['username']}")
-                return redirect('/admin/users?msg=Admin+berjaya+dipadam')
-            else:
-                error = 'Tidak boleh padam akaun sendiri.'
-
-        elif form_action == 'change_password':
-            user_id = request.form.get('user_id', '')
-            new_password = request.form.get('new_password', '')
-            if not new_password or len(new_password) < 3:
-                error = 'Password baru terlalu pendek (minimum 3 aksara).'
-            elif user_id:
-                conn.execute(
-                    "UPDATE admin_users SET password_hash = ? WHERE id = ?",
-                    (generate_password_hash(new_password), user_id)
-                )
+                    print(f"[SCHEDULER] Job added: {command} {lab_name} ({cron or next_run}) by {admin_user['username']}")
+                    return redirect('/admin/schedule?msg=Jadual+berjaya+ditambah')
+
+        elif form_action in ('delete_job', 'toggle_job'):
+            job = conn.execute("SELECT * FROM scheduled_jobs WHERE id = ?",
+                               (request.form.get('job_id', type=int),)).fetchone()
+            if not job or (admin_labs is not None and job['lab_name'] not in admin_labs):
+                error = 'Jadual tidak dijumpai.'
+            elif form_action == 'delete_job':
+                conn.execute("DELETE FROM scheduled_jobs WHERE id = ?", (job['id'],))
                 conn.commit()
-                conn.close()
-                print(f"[ADMIN] Password changed for user_id={user_id} by {admin_user['username']}")
-                return redirect('/admin/users?msg=Password+berjaya+ditukar')
-
-        elif form_action == 'edit_labs':
-            user_id = request.form.get('user_id', '')
-            labs = request.form.getlist('labs')
-            assigned_labs = ','.join(labs)
-            if user_id:
-                conn.execute(
-                    "UPDATE admin_users SET assigned_labs = ? WHERE id = ?",
-                    (assigned_labs, user_id)
-                )
-                conn.commit()
-                conn.close()
-                print(f"[ADMIN] Labs updated for user_id={user_id} by {admin_user['username']}")
-                return redirect('/admin/users?msg=Makmal+berjaya+dikemaskini')
-
-        elif form_action == 'delete_lab':
-            lab_name = request.form.get('lab_name', '').strip()
-            if lab_name:
-                # Padam semua sesi makmal ini
-                conn.execute("DELETE FROM sessions WHERE lab_name = ?", (lab_name,))
-                # Buang makmal dari assigned_labs setiap admin
-                admins = conn.execute("SELECT id, assigned_labs FROM admin_users WHERE assigned_labs LIKE ?",
-                                      (f'%{lab_name}%',)).fetchall()
-                for adm in admins:
-                    cleaned = [l.strip() for l in adm['assigned_labs'].split(',') if l.strip() and l.strip() != lab_name]
-                    conn.execute("UPDATE admin_users SET assigned_labs = ? WHERE id = ?",
-                                (','.join(cleaned), adm['id']))
+                print(f"[SCHEDULER] Job #{job['id']} deleted by {admin_user['username']}")
+                return redirect('/admin/schedule?msg=Jadual+berjaya+dipadam')
+            elif job['enabled']:
+                conn.execute("UPDATE scheduled_jobs SET enabled = 0 WHERE id = ?", (job['id'],))
                 conn.commit()
-                conn.close()
-                print(f"[ADMIN] Lab deleted: {lab_name} by {admin_user['username']}")
-                return redirect('/admin/users?msg=Makmal+berjaya+dibuang')
+                return redirect('/admin/schedule?msg=Jadual+dihentikan')
             else:
-                error = 'Nama makmal diperlukan.'
+                now = datetime.utcnow()
+                # Berulang: kira semula dari sekarang; sekali: hanya jika masanya belum berlalu
+                next_run = job_next_run(job['cron'], now) if job['cron'] else job['next_run']
+                if not next_run or next_run <= now.strftime('%Y-%m-%d %H:%M:%S'):
+                    error = 'Jadual sekali yang sudah berlalu tidak boleh diaktifkan semula.'
+                else:
+                    conn.execute("UPDATE scheduled_jobs SET enabled = 1, next_run = ? WHERE id = ?",
+                                 (next_run, job['id']))
+                    conn.commit()
+                    return redirect('/admin/schedule?msg=Jadual+diaktifkan')
 
-    # Fetch all admin users
-    if not conn._check_same_thread if hasattr(conn, '_check_same_thread') else False:
-        conn = get_db()
-    try:
-        users = conn.execute("SELECT * FROM admin_users ORDER BY id").fetchall()
-    except Exception:
-        conn = get_db()
-        users = conn.execute("SELECT * FROM admin_users ORDER BY id").fetchall()
-    users = [dict(u) for u in users]
-
-    # Fetch all available labs
-    all_labs = conn.execute("""
-        SELECT DISTINCT lab_name FROM sessions
-        WHERE lab_name IS NOT NULL AND lab_name != ''
-        ORDER BY lab_name
-    """).fetchall()
-    all_labs = [r['lab_name'] for r in all_labs]
+    # Jadual dalam skop admin
+    scope_join, scope_params = admin_lab_scope(admin_user, 'j.lab_name')
+    jobs = conn.execute(f"""
+        SELECT j.* FROM scheduled_jobs j
+        {scope_join}
+        ORDER BY j.enabled DESC, j.next_run, j.id
+    """, scope_params).fetchall()
 
-    # Fetch lab stats untuk paparan Urus Makmal
-    lab_stats = {}
-    for lab in all_labs:
-        pc_count = conn.execute("SELECT COUNT(DISTINCT pc_hostname) FROM sessions WHERE lab_name = ?", (lab,)).fetchone()[0]
-        record_count = conn.execute("SELECT COUNT(*) FROM sessions WHERE lab_name = ? AND nama_penuh IS NOT NULL", (lab,)).fetchone()[0]
-        lab_stats[lab] = {'pc_count': pc_count, 'record_count': record_count}
+    return render_page(ADMIN_SCHEDULE_TEMPLATE, jobs=[dict(j) for j in jobs], lab_list=lab_list, commands=PC_COMMANDS,
+                       weekdays=JOB_WEEKDAYS, timezone_name=str(LAB_TZ), msg=msg, error=error)
 
-    conn.close()
+# ==================== ADMIN USER MANAGEMENT ====================
 
-    html = '''
+# Halaman urus admin (superadmin) — dikompil sekali semasa import
+ADMIN_USERS_HTML = '''
     <!DOCTYPE html>
     <html lang="ms">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Urus Admin - LabSentinel</title>
+        <link rel="icon" type="image/png" href="{{ logo_url(32) }}">
         <style>
             * { box-sizing: border-box; }
             body { font-family: 'Segoe UI', sans-serif; background: #f5f5f5; margin: 0; padding: 20px; }
@@ -1173,6 +3708,8 @@ def admin_users():
             .btn-red { background: #ef4444; }
             .btn-red:hover { background: #dc2626; }
             .btn-small { padding: 5px 10px; font-size: 0.75rem; }
+            .poll-input { width: 90px; padding: 6px 8px; border: 2px solid #ddd; border-radius: 6px; font-size: 0.85rem; }
+            .poll-input:focus { outline: none; border-color: #1a3a6e; }
 
             /* Alerts */
             .alert { padding: 12px 20px; border-radius: 8px; margin-bottom: 15px; font-size: 0.9rem; }
@@ -1203,7 +3740,10 @@ def admin_users():
             </div>
 
             <div style="display: flex; align-items: center; gap: 12px;">
-                <img src="/static/logo.png" alt="LabSentinel" style="width: 60px; height: 60px;">
+                <picture>
+                    {% if logo_url(60, 'webp') %}<source type="image/webp" srcset="{{ logo_url(60, 'webp') }} 1x, {{ logo_url(120, 'webp') }} 2x">{% endif %}
+                    <img src="{{ logo_url(60) }}" srcset="{{ logo_url(60) }} 1x, {{ logo_url(120) }} 2x" alt="LabSentinel" style="width: 60px; height: 60px;">
+                </picture>
                 <div>
                     <h1 style="margin: 0;">Pengurusan Admin</h1>
                     <p class="subtitle" style="margin: 0;">Tambah, padam dan urus akaun pentadbir makmal</p>
@@ -1240,9 +3780,9 @@ def admin_users():
                                 <td>
                                     {% if u.is_superadmin %}
                                         <span class="badge badge-super">Semua Makmal</span>
-                                    {% elif u.assigned_labs %}
-                                        {% for lab in u.assigned_labs.split(',') %}
-                                            <span class="badge badge-lab">{{ lab.strip() }}</span>
+                                    {% elif u.labs %}
+                                        {% for lab in u.labs %}
+                                            <span class="badge badge-lab">{{ lab }}</span>
                                         {% endfor %}
                                     {% else %}
                                         <span style="color: #aaa;">Tiada</span>
@@ -1349,7 +3889,7 @@ def admin_users():
                             <label>Pilih Admin</label>
                             <select name="user_id" id="edit-labs-select" onchange="updateLabCheckboxes()" required>
                                 {% for u in users %}
-                                <option value="{{ u.id }}" data-labs="{{ u.assigned_labs }}">{{ u.username }}</option>
+                                <option value="{{ u.id }}" data-labs="{{ u.labs|tojson|forceescape }}">{{ u.username }}</option>
                                 {% endfor %}
                             </select>
                         </div>
@@ -1411,13 +3951,55 @@ def admin_users():
                     {% endif %}
                 </div>
             </div>
+
+            <!-- Kadar Polling Client -->
+            <div class="section">
+                <div class="section-header" style="background: linear-gradient(135deg, #0369a1 0%, #0ea5e9 100%);">
+                    <h2>Kadar Polling Client</h2>
+                </div>
+                <div class="section-body">
+                    {% if all_labs %}
+                    <p style="color: #888; font-size: 0.85rem; margin-bottom: 15px;">Jarak antara poll client (saat) bagi setiap makmal. Kosongkan untuk guna lalai client (QR 2s, sesi aktif 15s, backoff offline maksimum 60s). Berkuat kuasa pada poll seterusnya tanpa deploy semula client.</p>
+                    <table>
+                        <thead>
+                            <tr>
+                                <th>Nama Makmal</th>
+                                <th>QR Dipaparkan</th>
+                                <th>Sesi Aktif</th>
+                                <th>Offline (maks)</th>
+                                <th>Tindakan</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            {% for lab in all_labs %}
+                            {% set form_id = 'poll-' ~ loop.index %}
+                            <tr>
+                                <td><strong>{{ lab }}</strong></td>
+                                {% for key, column, low, high in poll_settings %}
+                                <td><input type="number" class="poll-input" form="{{ form_id }}" name="{{ key }}" min="{{ low / 1000 }}" max="{{ high / 1000 }}" step="0.5" value="{{ lab_poll[lab].get(key, '') }}" placeholder="lalai"></td>
+                                {% endfor %}
+                                <td>
+                                    <form method="POST" id="{{ form_id }}" style="display:inline">
+                                        <input type="hidden" name="form_action" value="lab_polling">
+                                        <input type="hidden" name="lab_name" value="{{ lab }}">
+                                        <button type="submit" class="btn btn-blue btn-small">Simpan</button>
+                                    </form>
+                                </td>
+                            </tr>
+                            {% endfor %}
+                        </tbody>
+                    </table>
+                    {% else %}
+                    <p style="color: #aaa; font-size: 0.85rem;">Tiada makmal didaftarkan lagi.</p>
+                    {% endif %}
+                </div>
+            </div>
         </div>
 
         <script>
         function updateLabCheckboxes() {
             var sel = document.getElementById('edit-labs-select');
-            var labs = sel.options[sel.selectedIndex].getAttribute('data-labs') || '';
-            var labArr = labs.split(',').map(function(l) { return l.trim(); });
+            var labArr = JSON.parse(sel.options[sel.selectedIndex].getAttribute('data-labs') || '[]');
             var checkboxes = document.querySelectorAll('#edit-labs-checkboxes input[type=checkbox]');
             checkboxes.forEach(function(cb) {
                 cb.checked = labArr.indexOf(cb.value) !== -1;
@@ -1431,7 +4013,177 @@ def admin_users():
     </body>
     </html>
     '''
-    return render_template_string(html, users=users, all_labs=all_labs, lab_stats=lab_stats, current_admin_id=admin_user['id'], msg=msg, error=error)
+ADMIN_USERS_TEMPLATE = app.jinja_env.from_string(ADMIN_USERS_HTML)
+
+@app.route('/admin/users', methods=['GET', 'POST'])
+@app.route('/lab-system/admin/users', methods=['GET', 'POST'])
+def admin_users():
+    """Halaman urus akaun pentadbir — superadmin sahaja"""
+    admin_user = get_current_admin()
+    if not admin_user:
+        return redirect('/admin/login')
+    if not admin_user['is_superadmin']:
+        return redirect('/admin')
+
+    msg = request.args.get('msg', '')
+    error = ''
+    status = 200
+
+    conn = get_db()
+
+    # Handle POST actions
+    if request.method == 'POST':
+        form_action = request.form.get('form_action', '')
+
+        if form_action == 'add_admin':
+            username = request.form.get('username', '').strip()
+            password = request.form.get('password', '')
+            labs = request.form.getlist('labs')
+            is_superadmin = 1 if request.form.get('is_superadmin') else 0
+
+            if not username or not password:
+                error = 'Username dan password diperlukan.'
+            elif len(password) < 3:
+                error = 'Password terlalu pendek (minimum 3 aksara).'
+            else:
+                try:
+                    cur = conn.execute(
+                        "INSERT INTO admin_users (username, password_hash, is_superadmin) VALUES (?, ?, ?)",
+                        (username, hash_password(password), is_superadmin)
+                    )
+                    set_admin_labs(conn, cur.lastrowid, labs)
+                    conn.commit()
+                    clear_admin_caches()
+                    print(f"[ADMIN] New admin created: {username} by {admin_user['username']}")
+                    return redirect('/admin/users?msg=Admin+berjaya+ditambah')
+                except sqlite3.IntegrityError:
+                    error = f'Username "{username}" sudah wujud.'
+                except HashPoolBusy:
+                    error = 'Server sibuk. Sila cuba sebentar lagi.'
+                    status = 429
+
+        elif form_action == 'delete_admin':
+            user_id = request.form.get('user_id', '')
+            if user_id and int(user_id) != admin_user['id']:
+                target = conn.execute("SELECT username FROM admin_users WHERE id = ?", (user_id,)).fetchone()
+                conn.execute("DELETE FROM admin_labs WHERE admin_id = ?", (user_id,))
+                conn.execute("DELETE FROM admin_users WHERE id = ?", (user_id,))
+                conn.commit()
+                clear_admin_caches()
+                if target:
+                    print(f"[ADMIN] Admin deleted: {target['username']} by {admin_user['username']}")
+                return redirect('/admin/users?msg=Admin+berjaya+dipadam')
+            else:
+                error = 'Tidak boleh padam akaun sendiri.'
+
+        elif form_action == 'change_password':
+            user_id = request.form.get('user_id', '')
+            new_password = request.form.get('new_password', '')
+            if not new_password or len(new_password) < 3:
+                error = 'Password baru terlalu pendek (minimum 3 aksara).'
+            elif user_id:
+                try:
+                    new_hash = hash_password(new_password)
+                except HashPoolBusy:
+                    error = 'Server sibuk. Sila cuba sebentar lagi.'
+                    status = 429
+                else:
+                    conn.execute(
+                        "UPDATE admin_users SET password_hash = ? WHERE id = ?",
+                        (new_hash, user_id)
+                    )
+                    conn.commit()
+                    clear_admin_caches()
+                    print(f"[ADMIN] Password changed for user_id={user_id} by {admin_user['username']}")
+                    return redirect('/admin/users?msg=Password+berjaya+ditukar')
+
+        elif form_action == 'edit_labs':
+            user_id = request.form.get('user_id', '')
+            labs = request.form.getlist('labs')
+            if user_id:
+                set_admin_labs(conn, user_id, labs)
+                conn.commit()
+                clear_admin_caches()
+                print(f"[ADMIN] Labs updated for user_id={user_id} by {admin_user['username']}")
+                return redirect('/admin/users?msg=Makmal+berjaya+dikemaskini')
+
+        elif form_action == 'delete_lab':
+            lab_name = request.form.get('lab_name', '').strip()
+            if lab_name:
+                # Batalkan arahan yang belum selesai dan padam jadual makmal ini —
+                # dalam transaksi yang sama supaya scheduler/PC tidak nampak makmal separuh dipadam
+                conn.execute("""
+                    UPDATE commands SET state = 'cancelled'
+                    WHERE lab_name = ? AND state IN ('queued', 'delivered')
+                """, (lab_name,))
+                conn.execute("DELETE FROM scheduled_jobs WHERE lab_name = ?", (lab_name,))
+                # Padam semua PC dan rekod pengguna makmal ini
+                conn.execute("DELETE FROM pcs WHERE lab_name = ?", (lab_name,))
+                conn.execute("DELETE FROM unlock_events WHERE lab_name = ?", (lab_name,))
+                # Buang makmal dan tugasan admin (idx_admin_labs_lab)
+                conn.execute("DELETE FROM admin_labs WHERE lab_id IN (SELECT id FROM labs WHERE name = ?)", (lab_name,))
+                conn.execute("DELETE FROM labs WHERE name = ?", (lab_name,))
+                conn.commit()
+                clear_admin_caches()
+                print(f"[ADMIN] Lab deleted: {lab_name} by {admin_user['username']}")
+                return redirect('/admin/users?msg=Makmal+berjaya+dibuang')
+            else:
+                error = 'Nama makmal diperlukan.'
+
+        elif form_action == 'lab_polling':
+            lab_name = request.form.get('lab_name', '').strip()
+            values = []
+            for key, column, low, high in LAB_POLL_SETTINGS:
+                raw = request.form.get(key, '').strip()
+                if not raw:
+                    values.append(None)  # Kosong = lalai client
+                    continue
+                try:
+                    ms = int(round(float(raw) * 1000))
+                except (ValueError, OverflowError):
+                    ms = None
+                if ms is None or not low <= ms <= high:
+                    error = f'Kadar polling tidak sah: mesti antara {low / 1000:g} dan {high / 1000:g} saat.'
+                    break
+                values.append(ms)
+            if not lab_name:
+                error = 'Nama makmal diperlukan.'
+            if not error:
+                conn.execute("""
+                    UPDATE labs SET poll_locked_ms = ?, poll_unlocked_ms = ?, poll_offline_max_ms = ?
+                    WHERE name = ?
+                """, (*values, lab_name))
+                conn.commit()
+                print(f"[ADMIN] Polling updated for {lab_name}: {values} by {admin_user['username']}")
+                return redirect('/admin/users?msg=Kadar+polling+berjaya+dikemaskini')
+
+    # Fetch all admin users + makmal masing-masing
+    users = conn.execute("SELECT * FROM admin_users ORDER BY id").fetchall()
+    users = [dict(u, labs=[]) for u in users]
+    users_by_id = {u['id']: u for u in users}
+    for r in conn.execute("""
+        SELECT al.admin_id, l.name FROM admin_labs al
+        JOIN labs l ON l.id = al.lab_id
+        ORDER BY l.name
+    """):
+        if r['admin_id'] in users_by_id:
+            users_by_id[r['admin_id']]['labs'].append(r['name'])
+
+    # Senarai makmal + statistik (lab_stats dikemas kini oleh trigger — satu query, tiada scan log)
+    stats_rows = conn.execute("""
+        SELECT l.name, COALESCE(s.pc_count, 0) AS pc_count, COALESCE(s.record_count, 0) AS record_count,
+               l.poll_locked_ms, l.poll_unlocked_ms, l.poll_offline_max_ms
+        FROM labs l
+        LEFT JOIN lab_stats s ON s.lab_name = l.name
+        ORDER BY l.name
+    """).fetchall()
+    all_labs = [r['name'] for r in stats_rows]
+    lab_stats = {r['name']: {'pc_count': r['pc_count'], 'record_count': r['record_count']} for r in stats_rows}
+    # Override polling dalam saat untuk borang (ms disimpan dalam DB)
+    lab_poll = {r['name']: {key: f"{ms / 1000:g}" for key, ms in lab_poll_overrides(r).items()} for r in stats_rows}
+
+    return render_page(ADMIN_USERS_TEMPLATE, users=users, all_labs=all_labs, lab_stats=lab_stats, lab_poll=lab_poll,
+                       poll_settings=LAB_POLL_SETTINGS, current_admin_id=admin_user['id'], msg=msg, error=error), status
 
 # ==================== HOMEPAGE ====================
 
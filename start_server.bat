@@ -23,6 +23,18 @@ if errorlevel 1 (
     echo [INFO] Memasang Flask...
     pip install flask
 )
+:: Pilihan: WebSocket control channel untuk client
+pip show flask-sock >nul 2>&1
+if errorlevel 1 (
+    echo [INFO] Memasang flask-sock ^(pilihan - WebSocket control channel^)...
+    pip install flask-sock
+)
+:: Pilihan: saiz semula logo (varian kecil untuk telefon)
+pip show pillow >nul 2>&1
+if errorlevel 1 (
+    echo [INFO] Memasang Pillow ^(pilihan - logo dioptimumkan^)...
+    pip install pillow
+)
 
 echo.
 echo [INFO] Memulakan LabSentinel Server...